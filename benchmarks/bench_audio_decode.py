@@ -0,0 +1,77 @@
+"""对比逐片段解码与一次解码后切片的耗时
+
+用法: python benchmarks/bench_audio_decode.py [--segment-seconds 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import librosa
+from audio_io import decode_audio, segment_view, SAMPLE_RATE
+
+DEFAULT_FILES = ["test1min音频.MP3", "test3min音频.MP3"]
+
+
+def make_segments(duration, segment_seconds):
+    """按固定时长切分，模拟 Whisper 输出的片段"""
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        segments.append((start, end))
+        start = end
+    return segments
+
+
+def run_old_path(audio_path, segments):
+    """旧路径: 每个片段调用一次 librosa.load"""
+    total = 0
+    for start, end in segments:
+        y, _ = librosa.load(audio_path, sr=SAMPLE_RATE, offset=start, duration=end - start)
+        total += len(y)
+    return total
+
+
+def run_new_path(audio_path, segments):
+    """新路径: 解码一次，片段为共享缓冲区的视图"""
+    audio = decode_audio(audio_path)
+    total = 0
+    for start, end in segments:
+        total += len(segment_view(audio, start, end))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频解码基准测试")
+    parser.add_argument("files", nargs="*", help="音频文件，默认使用内置测试音频")
+    parser.add_argument("--segment-seconds", type=float, default=3.0, help="模拟片段时长")
+    args = parser.parse_args()
+
+    files = args.files or [str(CORE_DIR / name) for name in DEFAULT_FILES]
+    # 预热 librosa 的重采样等懒加载组件，避免首次调用的开销计入结果
+    librosa.load(files[0], sr=SAMPLE_RATE, duration=1.0)
+
+    for audio_path in files:
+        duration = len(decode_audio(audio_path)) / SAMPLE_RATE
+        segments = make_segments(duration, args.segment_seconds)
+
+        start = time.perf_counter()
+        old_samples = run_old_path(audio_path, segments)
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_samples = run_new_path(audio_path, segments)
+        new_time = time.perf_counter() - start
+
+        print(f"{Path(audio_path).name}: {duration:.1f} 秒, {len(segments)} 个片段")
+        print(f"  逐片段解码: {old_time:.2f} 秒 ({old_samples} 采样点)")
+        print(f"  一次解码:   {new_time:.2f} 秒 ({new_samples} 采样点)")
+        print(f"  加速比:     {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
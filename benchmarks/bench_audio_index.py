@@ -0,0 +1,88 @@
+"""波形索引的生成耗时、文件大小和峰值包络的正确性
+
+用法: python benchmarks/bench_audio_index.py [--minutes 60]
+
+用 ffmpeg 合成一段长录音（带周期性静音的噪声），分别编码为 WAV 和 VBR MP3，生成索引并报告：
+  peaks    从已解码的音频累积峰值的耗时（转录流程中音频已经解码，只有这一部分是额外开销）
+  reuse    音频未变化时再次生成索引的耗时（直接复用已有索引）
+  size     索引文件大小
+并检查读回的每一级峰值都包住了对应桶内的采样值（量化时最小值向下、最大值向上取整）。
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from audio_io import decode_audio, SAMPLE_RATE
+from audio_index import PeaksBuilder, AudioIndex, write_audio_index
+
+
+def make_long_audio(path, minutes, codec_args):
+    """噪声每 7 秒有 0.8 秒降到 1%，模拟说话间隙"""
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"anoisesrc=d={minutes * 60}:a=0.1:r=44100:seed=1",
+        "-af", "volume='if(lt(mod(t,7),0.8),0.01,1)':eval=frame",
+        "-ac", "2", *codec_args, str(path)
+    ], check=True)
+
+
+def envelope_violations(index, audio):
+    """各级峰值没有包住桶内采样值的桶数"""
+    scale = 2 ** (index.bits - 1) - 1
+    violations = 0
+    for size, mins, maxs in index.levels:
+        padded = np.pad(audio, (0, -len(audio) % size), mode="edge").reshape(-1, size)
+        violations += int(np.sum(mins / scale > padded.min(axis=1) + 1e-6))
+        violations += int(np.sum(maxs / scale < padded.max(axis=1) - 1e-6))
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="波形索引基准测试")
+    parser.add_argument("--minutes", type=float, default=60, help="合成录音的时长（分钟）")
+    args = parser.parse_args()
+
+    formats = {"wav": ["-acodec", "pcm_s16le"], "mp3": ["-acodec", "libmp3lame", "-q:a", "4"]}
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, codec_args in formats.items():
+            audio_path = Path(temp_dir) / f"long.{name}"
+            make_long_audio(audio_path, args.minutes, codec_args)
+            audio = decode_audio(str(audio_path))
+            duration = len(audio) / SAMPLE_RATE
+
+            start = time.perf_counter()
+            builder = PeaksBuilder()
+            builder.add(audio)
+            builder.finish()
+            peaks_seconds = time.perf_counter() - start
+
+            path = write_audio_index(str(audio_path), audio=audio)
+            start = time.perf_counter()
+            write_audio_index(str(audio_path))
+            reuse_seconds = time.perf_counter() - start
+
+            index = AudioIndex.read(path)
+            index_size = Path(path).stat().st_size
+            print(f"{name}: {duration / 60:.0f} 分钟 ({audio_path.stat().st_size / 1024 / 1024:.0f} MB)")
+            print(f"  peaks {peaks_seconds:.3f} 秒  reuse {reuse_seconds:.3f} 秒  size {index_size / 1024:.0f} KB")
+
+            violations = envelope_violations(index, audio)
+            ok = violations == 0 and index.samples == len(audio)
+            failed |= not ok
+            print(f"  {'✓' if ok else '✗'} {len(index.levels)} 级峰值，未包住采样值的桶 {violations} 个")
+            audio_path.unlink()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
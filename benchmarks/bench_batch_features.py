@@ -0,0 +1,131 @@
+"""对比逐片段特征提取与批量特征提取的耗时和数值一致性
+
+用法: python benchmarks/bench_batch_features.py [音频文件 ...]
+
+一致性检查分两部分:
+1. block_seconds=0 时每个片段单独计算 STFT，应与逐片段实现在浮点误差内完全一致；
+2. 实际使用的整段模式（默认 block_seconds）：片段首尾各约 2 帧（n_fft/2 个采样点）的窗口
+   能看到相邻音频，逐片段实现在这里是零填充，所以两者不完全相同。偏差以各特征在片段间的
+   标准差为尺度：聚类使用的列（MFCC 均值、音高、频谱质心）不超过 CLUSTER_TOLERANCE，
+   其余列不超过 OTHER_TOLERANCE（1 秒左右的短片段只有约 30 帧，边缘帧对 MFCC 逐帧标准差影响最大），
+   且两种特征的聚类结果 ARI 不低于 MIN_AGREEMENT。
+检查失败时以非零状态码退出。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.metrics import adjusted_rand_score
+from audio_io import decode_audio, SAMPLE_RATE
+from batch_features import extract_batch_features, FEATURE_NAMES, CLUSTER_FEATURE_COUNT
+from speaker_recognizer import SpeakerRecognizer
+
+DEFAULT_FILES = ["test1min音频.MP3", "test3min音频.MP3"]
+# 单片段模式允许的最大相对误差（float32 舍入）
+EXACT_TOLERANCE = 1e-3
+# 整段模式与原实现的最大偏差（个标准差）：内置音频上聚类列约 0.24，mfcc_std 列约 0.75
+CLUSTER_TOLERANCE = 0.3
+OTHER_TOLERANCE = 1.0
+# 整段模式与原实现聚类结果的最低一致性 (ARI)
+MIN_AGREEMENT = 0.9
+
+
+def make_segments(duration, seed=0):
+    """生成 1~8 秒长短不一的片段，模拟 Whisper 输出"""
+    rng = np.random.default_rng(seed)
+    starts, ends = [], []
+    start = 0.0
+    while start < duration - 0.5:
+        end = min(start + rng.uniform(1.0, 8.0), duration)
+        starts.append(start)
+        ends.append(end)
+        start = end
+    return starts, ends
+
+
+def per_segment_features(recognizer, audio, starts, ends):
+    """原实现: 每个片段单独调用 extract_features"""
+    rows = []
+    for start, end in zip(starts, ends):
+        features = recognizer.extract_features(None, start, end, audio=audio)
+        rows.append(features['mfccs'] + [
+            features['pitch'],
+            features['spectral_centroid'],
+            features['rms_energy'],
+            features['zero_crossing_rate']
+        ] + features['mfcc_std'])
+    return np.array(rows)
+
+
+def cluster(matrix, num_speakers=2):
+    return AgglomerativeClustering(n_clusters=num_speakers, linkage='average').fit_predict(
+        matrix[:, :CLUSTER_FEATURE_COUNT]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量特征提取基准测试")
+    parser.add_argument("files", nargs="*", help="音频文件，默认使用内置测试音频")
+    args = parser.parse_args()
+
+    files = args.files or [str(CORE_DIR / name) for name in DEFAULT_FILES]
+    recognizer = SpeakerRecognizer()
+    failed = False
+
+    # 预热 librosa/numba 的懒加载组件，避免首次调用的开销计入结果
+    warmup = decode_audio(files[0])
+    recognizer.extract_features(None, 0.0, 1.0, audio=warmup)
+    extract_batch_features(warmup, [0.0], [1.0])
+
+    for audio_path in files:
+        audio = decode_audio(audio_path)
+        starts, ends = make_segments(len(audio) / SAMPLE_RATE)
+
+        start = time.perf_counter()
+        reference = per_segment_features(recognizer, audio, starts, ends)
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = extract_batch_features(audio, starts, ends)
+        new_time = time.perf_counter() - start
+
+        isolated = extract_batch_features(audio, starts, ends, block_seconds=0)
+        exact_error = np.max(np.abs(isolated - reference) / (np.abs(reference) + 1e-6))
+        # 整段模式的偏差以各特征在片段间的标准差为尺度
+        batch_error = np.abs(batch - reference).max(axis=0) / (reference.std(axis=0) + 1e-9)
+        agreement = adjusted_rand_score(cluster(reference), cluster(batch))
+
+        print(f"{Path(audio_path).name}: {len(starts)} 个片段")
+        print(f"  逐片段提取: {old_time:.2f} 秒")
+        print(f"  批量提取:   {new_time:.2f} 秒 ({old_time / new_time:.1f}x)")
+        print(f"  单片段模式最大相对误差: {exact_error:.2e}")
+        for name, columns, tolerance in (
+            ("聚类列", slice(0, CLUSTER_FEATURE_COUNT), CLUSTER_TOLERANCE),
+            ("其余列", slice(CLUSTER_FEATURE_COUNT, None), OTHER_TOLERANCE)
+        ):
+            errors = batch_error[columns]
+            worst = int(np.argmax(errors)) + columns.start
+            over = batch_error[worst] > tolerance
+            failed |= over
+            print(f"  整段模式{name}最大偏差: {batch_error[worst]:.3f} 个标准差 ({FEATURE_NAMES[worst]}，"
+                  f"上限 {tolerance}){'  ✗ 超过上限' if over else ''}")
+        print(f"  聚类结果一致性 (ARI): {agreement:.3f}")
+
+        if exact_error > EXACT_TOLERANCE:
+            print("  ✗ 单片段模式与原实现不一致")
+            failed = True
+        if agreement < MIN_AGREEMENT:
+            print(f"  ✗ 整段模式的聚类结果与原实现不一致（ARI 低于 {MIN_AGREEMENT}）")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
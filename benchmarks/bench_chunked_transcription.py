@@ -0,0 +1,72 @@
+"""对比整段转录与分块并行转录的耗时
+
+用法: python benchmarks/bench_chunked_transcription.py [音频文件 ...] [--model tiny] [--workers 4]
+      [--chunk-seconds 60] [--output 结果.json]
+
+需要本地已有对应的 Whisper 模型。两种方式都会先加载一次模型再计时，
+结果中的 speedup 为整段转录耗时 / 分块转录耗时。
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+from audio_io import decode_audio, SAMPLE_RATE
+from whisper_transcriber import WhisperTranscriber
+
+DEFAULT_FILES = ["test1min音频.MP3", "test3min音频.MP3"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分块并行转录基准测试")
+    parser.add_argument("files", nargs="*", help="音频文件，默认使用内置测试音频")
+    parser.add_argument("--model", default="tiny", help="Whisper 模型大小")
+    parser.add_argument("--workers", type=int, default=None, help="分块转录进程数")
+    parser.add_argument("--chunk-seconds", type=float, default=60, help="分块目标时长")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    files = args.files or [str(CORE_DIR / name) for name in DEFAULT_FILES]
+    transcriber = WhisperTranscriber()
+    transcriber.load_model(args.model)
+    results = []
+
+    for audio_path in files:
+        duration = len(decode_audio(audio_path)) / SAMPLE_RATE
+
+        start = time.perf_counter()
+        sequential = transcriber.transcribe(audio_path, args.model)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunked = transcriber.transcribe_chunked(audio_path, args.model, args.workers, args.chunk_seconds)
+        chunked_time = time.perf_counter() - start
+
+        result = {
+            "file": Path(audio_path).name,
+            "duration": round(duration, 2),
+            "model": args.model,
+            "sequential_seconds": round(sequential_time, 3),
+            "chunked_seconds": round(chunked_time, 3),
+            "speedup": round(sequential_time / chunked_time, 2),
+            "sequential_segments": len(sequential),
+            "chunked_segments": len(chunked)
+        }
+        results.append(result)
+        print(f"{result['file']}: {duration:.1f} 秒音频")
+        print(f"  整段转录: {sequential_time:.1f} 秒 ({len(sequential)} 个片段)")
+        print(f"  分块转录: {chunked_time:.1f} 秒 ({len(chunked)} 个片段)")
+        print(f"  加速比:   {result['speedup']}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""对比逐段多次替换的旧版文本清理与单次正则扫描的批量清理
+
+用法: python benchmarks/bench_clean_text.py [--segments 10000] [--repeat 5]
+
+合成的转录文本中混有重复的语气词、连续标点、多余空白和半角逗号。
+旧版实现照搬原来的 WhisperTranscriber.clean_text（8 次 str.replace + 2 次 re.sub，逐段调用）。
+除耗时外还检查新版的输出：不再有连续重复的语气词和标点、没有半角逗号，且再清理一次结果不变。
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+from text_cleanup import clean_text, clean_texts, REPEATED_PARTICLES
+
+WORDS = ["我们", "今天", "讨论", "一下", "这个", "问题", "其实", "就是", "意识", "信息", "物质", "然后", "所以"]
+NOISE = ["的的", "了了了", "吗吗", "呢呢呢呢", "啊啊", "哦哦哦", "，，", "。。", "，。", ",", " , ", "  ", "！？"]
+
+
+def legacy_clean_text(text):
+    """原来的实现"""
+    corrections = {
+        '的的': '的',
+        '了了': '了',
+        '吗吗': '吗',
+        '呢呢': '呢',
+        '嘛嘛': '嘛',
+        '啊啊': '啊',
+        '哦哦': '哦',
+        '额额': '额',
+    }
+
+    for wrong, right in corrections.items():
+        text = text.replace(wrong, right)
+
+    text = re.sub(r'([，。！？；：])\s*([，。！？；：])', r'\1', text)
+    text = re.sub(r'\s+', ' ', text)
+
+    return text.strip()
+
+
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(4, 12)):
+            parts.append(rng.choice(WORDS))
+            if rng.random() < 0.4:
+                parts.append(rng.choice(NOISE))
+        texts.append(" " + "".join(parts) + " ")
+    return texts
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def check(cleaned):
+    repeated = re.compile(rf"([{REPEATED_PARTICLES}])\1|[，。！？；：]\s*[，。！？；：]|,|\s\s")
+    bad = [text for text in cleaned if repeated.search(text) or text != text.strip()]
+    unstable = [text for text in cleaned if clean_text(text) != text]
+    return bad, unstable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本清理基准测试")
+    parser.add_argument("--segments", type=int, default=10000, help="合成片段数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.segments)
+    legacy_time, legacy = best_time(lambda: [legacy_clean_text(text) for text in texts], args.repeat)
+    per_segment_time, per_segment = best_time(lambda: [clean_text(text) for text in texts], args.repeat)
+    batch_time, batch = best_time(lambda: clean_texts(texts), args.repeat)
+
+    print(f"{args.segments} 个片段, 共 {sum(len(text) for text in texts)} 个字符")
+    print(f"  旧版逐段清理:     {legacy_time * 1000:8.1f} ms")
+    print(f"  单次正则逐段清理: {per_segment_time * 1000:8.1f} ms ({legacy_time / per_segment_time:.1f}x)")
+    print(f"  单次正则批量清理: {batch_time * 1000:8.1f} ms ({legacy_time / batch_time:.1f}x)")
+
+    legacy_bad, _ = check(legacy)
+    bad, unstable = check(batch)
+    print(f"  旧版残留的重复语气词/标点/半角逗号: {len(legacy_bad)} 个片段")
+    print(f"  新版残留: {len(bad)} 个片段, 再次清理会改变的: {len(unstable)} 个片段")
+    if batch != per_segment:
+        print("✗ 批量清理与逐段清理结果不一致")
+        sys.exit(1)
+    if bad or unstable:
+        print("✗ 新版清理结果不符合预期，例如:", (bad or unstable)[:3])
+        sys.exit(1)
+    print("✓ 新版清理结果正确")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""说话人聚类后端在不同片段数下的耗时、内存和聚类质量
+
+用法: python benchmarks/bench_clustering.py [--sizes 100 300 1000 3000 10000] [--speakers 4]
+
+使用合成特征：每个说话人有自己的 MFCC 均值、音高和频谱质心，片段间加入与真实数据
+量级相近的抖动（频谱质心的抖动达到数百 Hz）。对每种片段数报告:
+- 原实现（未标准化的 AgglomerativeClustering，指定说话人数）
+- 层次聚类和 mini-batch k-means 两个后端（标准化，自动估计说话人数）
+的耗时、峰值内存（tracemalloc）、与真实标签的 ARI 以及估计出的说话人数。
+层次聚类需要 O(n²) 内存，超过 --max-agglomerative 的片段数时跳过。
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.metrics import adjusted_rand_score
+from batch_features import CLUSTER_FEATURE_COUNT
+from speaker_clustering import cluster_speakers
+
+
+def make_features(num_segments, num_speakers, seed=0):
+    """生成合成的片段特征矩阵（列顺序与 batch_features 一致）和真实标签"""
+    rng = np.random.default_rng(seed)
+    mfcc_means = rng.normal(0, 8, (num_speakers, 13)) + np.linspace(-300, 20, 13)
+    pitch_means = rng.uniform(100, 280, num_speakers)
+    centroid_means = rng.uniform(1200, 2200, num_speakers)
+
+    # 说话人轮流发言，每轮 1~6 个片段
+    labels = []
+    while len(labels) < num_segments:
+        labels.extend([int(rng.integers(num_speakers))] * int(rng.integers(1, 7)))
+    labels = np.array(labels[:num_segments])
+
+    features = np.empty((num_segments, CLUSTER_FEATURE_COUNT), dtype=np.float64)
+    features[:, :13] = mfcc_means[labels] + rng.normal(0, 4, (num_segments, 13))
+    features[:, 13] = pitch_means[labels] + rng.normal(0, 25, num_segments)
+    features[:, 14] = centroid_means[labels] + rng.normal(0, 400, num_segments)
+    return features, labels
+
+
+def measure(func):
+    """返回 (结果, 耗时秒数, 峰值内存 MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="说话人聚类基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000, 10000], help="片段数")
+    parser.add_argument("--speakers", type=int, default=4, help="合成数据的说话人数")
+    parser.add_argument("--max-agglomerative", type=int, default=5000, help="层次聚类允许的最大片段数")
+    args = parser.parse_args()
+
+    print(f"{'片段数':>8} {'方法':<16} {'耗时(秒)':>10} {'峰值内存(MB)':>14} {'ARI':>7} {'说话人数':>8}")
+    for size in args.sizes:
+        features, truth = make_features(size, args.speakers)
+        runs = []
+
+        if size <= args.max_agglomerative:
+            runs.append(("原实现", lambda: (
+                AgglomerativeClustering(n_clusters=args.speakers, linkage="average").fit_predict(features),
+                {"numSpeakers": args.speakers}
+            )))
+            runs.append(("agglomerative", lambda: cluster_speakers(features, method="agglomerative")))
+        runs.append(("kmeans", lambda: cluster_speakers(features, method="kmeans")))
+
+        for name, run in runs:
+            (labels, estimate), elapsed, peak = measure(run)
+            ari = adjusted_rand_score(truth, labels)
+            print(f"{size:>8} {name:<16} {elapsed:>10.3f} {peak:>14.1f} {ari:>7.3f} {estimate['numSpeakers']:>8}")
+
+
+if __name__ == "__main__":
+    main()
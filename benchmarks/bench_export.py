@@ -0,0 +1,204 @@
+"""转录导出的耗时、峰值内存和过滤的正确性
+用法: python benchmarks/bench_export.py [--segments 50000] [--speakers 4]
+
+合成 --segments 个片段的转录（每段 2~8 秒、20~60 个汉字，说话人随机切换），对每种导出格式报告：
+  time     导出到临时文件的耗时和吞吐（片段/秒）
+  peak     导出过程中 Python 分配的峰值内存（tracemalloc，不含片段存储本身）
+  size     导出文件大小
+作为对照，naive 先把按说话人分组的结果用 json.dumps(indent=2) 拼成一个完整字符串再写入（原来的保存方式）。
+另外用 1 分钟的测试音频运行 recognize_speakers.py --format jsonl --export jsonl 和独立的导出命令，
+检查导出文件不会覆盖同名格式的识别结果；含未知说话人（标签 -1）的结果按三种格式写入后能原样读回。
+峰值内存超过 --max-peak-mb 或过滤/格式检查不通过时以非零状态码退出。
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from segment_store import SegmentStore, OUTPUT_FORMATS, OUTPUT_SUFFIXES
+from transcript_search import read_result
+from transcript_export import EXPORT_FORMATS, export_transcript, select_segments
+
+TEST_AUDIO = CORE_DIR / "test1min音频.MP3"
+REFERENCE_SEGMENTS = CORE_DIR / "音频文件_segments.json"
+
+CHARACTERS = "我们这个时代把很多的物质东西都化掉了就像天天在跟你说它是什么原理要怎么用声音是世界的钥匙"
+
+
+def make_store(count, speakers, seed=0):
+    rng = np.random.default_rng(seed)
+    durations = rng.uniform(2, 8, count)
+    gaps = rng.uniform(0, 1, count)
+    starts = np.cumsum(durations + gaps) - durations
+    lengths = rng.integers(20, 60, count)
+    picks = rng.integers(0, len(CHARACTERS), lengths.sum())
+    # 说话人每段有 30% 的概率切换
+    switches = np.cumsum(rng.random(count) < 0.3)
+    labels = (switches + rng.integers(0, speakers)) % speakers
+
+    store = SegmentStore()
+    position = 0
+    for start, duration, length in zip(starts.tolist(), durations.tolist(), lengths.tolist()):
+        text = "".join(CHARACTERS[i] for i in picks[position:position + length])
+        store.append(start, start + duration, text)
+        position += length
+    store.set_labels(labels)
+    return store
+
+
+def measure(function):
+    """返回 (耗时, 峰值 MB)；tracemalloc 会明显拖慢分配，计时和统计内存分两次运行"""
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def naive_export(store, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"segments": store.groups()}, ensure_ascii=False, indent=2))
+
+
+def check_exports(store, temp_dir):
+    """检查过滤结果与逐个片段判断的结果一致，以及各格式的片段数、时间戳"""
+    failures = []
+    starts, ends, labels = store.starts, store.ends, store.labels
+    middle = float(starts[len(store) // 2])
+    # (名称, 过滤参数, 期望的说话人序号)
+    cases = [
+        ("range", dict(start=middle, end=middle + 600), None),
+        ("speaker", dict(speakers=["说话人2"]), {1}),
+        ("range+speaker", dict(start=middle, end=middle + 3600, speakers=[0, "说话人3"]), {0, 2})
+    ]
+    for name, options, allowed in cases:
+        expected = [
+            i for i in range(len(store))
+            if ends[i] > options.get("start", -np.inf) and starts[i] < options.get("end", np.inf)
+            and (allowed is None or labels[i] in allowed)
+        ]
+        selected = select_segments(store, **options).tolist()
+        if selected != expected:
+            failures.append(f"{name}: 过滤得到 {len(selected)} 个片段，应为 {len(expected)}")
+
+        path = Path(temp_dir) / f"check_{name}.srt"
+        count = export_transcript(store, str(path), "srt", rebase=True, **options)
+        blocks = path.read_text(encoding="utf-8").strip().split("\n\n")
+        if count != len(expected) or len(blocks) != len(expected):
+            failures.append(f"{name}: srt 有 {len(blocks)} 条字幕，应为 {len(expected)}")
+        if blocks and not blocks[0].startswith("1\n00:00:00,000 --> ") and "start" in options:
+            failures.append(f"{name}: --rebase 后第一条字幕应从 0 开始: {blocks[0][:40]}")
+
+    path = Path(temp_dir) / "check.jsonl"
+    export_transcript(store, str(path), "jsonl")
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    if [row["text"] for row in rows] != store.texts:
+        failures.append("jsonl: 文本与片段不一致")
+
+    path = Path(temp_dir) / "check.txt"
+    export_transcript(store, str(path), "txt")
+    paragraphs = path.read_text(encoding="utf-8").strip().split("\n\n")
+    expected_paragraphs = 1 + int(np.count_nonzero(np.diff(labels)))
+    if len(paragraphs) != expected_paragraphs:
+        failures.append(f"txt: {len(paragraphs)} 段，应为 {expected_paragraphs}")
+    return failures
+
+
+def check_result_files(temp_dir):
+    """识别结果为 jsonl 时导出 jsonl，两个文件都应保留各自的格式"""
+    failures = []
+    audio_path = Path(temp_dir) / "会议.MP3"
+    shutil.copy(TEST_AUDIO, audio_path)
+    result = Path(temp_dir) / "会议_说话人识别结果.jsonl"
+    exported = Path(temp_dir) / "会议_转录导出.jsonl"
+
+    def run(*args):
+        return subprocess.run([sys.executable, *map(str, args)], cwd=CORE_DIR, capture_output=True, text=True)
+
+    run("recognize_speakers.py", audio_path, REFERENCE_SEGMENTS, "--format", "jsonl", "--export", "jsonl", "--no-cache")
+    if not result.exists() or json.loads(result.read_text(encoding="utf-8").splitlines()[0]).get("format") != "tingyin-segments":
+        failures.append(f"recognize_speakers --export jsonl: 识别结果 {result.name} 缺失或被覆盖")
+    if not exported.exists() or "speaker" not in json.loads(exported.read_text(encoding="utf-8").splitlines()[0]):
+        failures.append(f"recognize_speakers --export jsonl: 导出文件 {exported.name} 缺失")
+
+    # 独立的导出命令：默认路径不与结果重名，显式指定结果文件名时拒绝
+    exported.unlink(missing_ok=True)
+    before = result.read_bytes() if result.exists() else None
+    run("transcript_export.py", result, "--format", "jsonl")
+    if not exported.exists():
+        failures.append(f"transcript_export: 默认导出路径应为 {exported.name}")
+    refused = run("transcript_export.py", result, "--format", "jsonl", "--output", result)
+    if refused.returncode == 0 or (result.read_bytes() if result.exists() else None) != before:
+        failures.append("transcript_export: 应拒绝写入识别结果文件")
+    return failures
+
+
+def check_unknown_speakers(store, temp_dir):
+    """部分片段的标签为 -1 时，三种结果格式写入后读回的标签与原来一致"""
+    failures = []
+    labels = store.labels.copy()
+    labels[::7] = -1
+    store.set_labels(labels)
+    for fmt in OUTPUT_FORMATS:
+        path = str(Path(temp_dir) / f"未知_说话人识别结果{OUTPUT_SUFFIXES[fmt]}")
+        store.write(path, fmt)
+        try:
+            loaded, _ = read_result(path)
+        except ValueError as e:
+            failures.append(f"{fmt}: 含未知说话人的结果无法读回: {e}")
+            continue
+        if not np.array_equal(loaded.labels, labels) or loaded.texts != store.texts:
+            failures.append(f"{fmt}: 读回的标签或文本与写入的不一致")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="转录导出基准测试")
+    parser.add_argument("--segments", type=int, default=50000, help="片段数")
+    parser.add_argument("--speakers", type=int, default=4, help="说话人数")
+    parser.add_argument("--max-peak-mb", type=float, default=8.0, help="流式导出允许的峰值内存 (MB)")
+    args = parser.parse_args()
+
+    store = make_store(args.segments, args.speakers)
+    hours = store.ends[-1] / 3600
+    print(f"{len(store)} 个片段，{hours:.1f} 小时，{args.speakers} 个说话人\n")
+    print(f"  {'格式':<8} {'耗时(秒)':>10} {'片段/秒':>10} {'峰值(MB)':>10} {'大小(MB)':>10}")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rows = [("naive", lambda path: naive_export(store, path), ".json")]
+        rows += [(fmt, lambda path, fmt=fmt: export_transcript(store, path, fmt, title="bench"), "." + fmt)
+                 for fmt in EXPORT_FORMATS]
+        for name, function, suffix in rows:
+            path = str(Path(temp_dir) / f"export{suffix}")
+            seconds, peak = measure(lambda: function(path))
+            size = Path(path).stat().st_size / 1024 / 1024
+            over = name != "naive" and peak > args.max_peak_mb
+            failed |= over
+            print(f"  {name:<8} {seconds:>10.3f} {len(store) / seconds:>10.0f} {peak:>10.1f} {size:>10.1f}"
+                  f"{'  ✗ 超过峰值内存上限' if over else ''}")
+
+        failures = check_exports(store, temp_dir) + check_result_files(temp_dir)
+        failures += check_unknown_speakers(make_store(2000, args.speakers, seed=1), temp_dir)
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures or failed:
+        sys.exit(1)
+    print("\n✓ 过滤和格式检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""实时转录的延迟和在线说话人分配检查（离线，默认不需要 Whisper 模型权重）
+
+用法:
+    python benchmarks/bench_live.py                        # 按实时速度回放内置测试音频
+    python benchmarks/bench_live.py --speed 4 --seconds 90 # 4 倍速回放前 90 秒
+    python benchmarks/bench_live.py --model tiny           # 使用真实模型（需要已下载的权重）
+
+默认用替身转录器回放 音频文件_segments.json：每次转录返回与当前窗口重叠的参考片段，
+还没说完的最后一个片段只返回已经说出的那部分文字（按时长比例截断），
+因此临时片段、确认策略、回看窗口裁剪、说话人特征和在线分配都走真实代码路径；
+--rtf 让替身每次转录按窗口时长 × RTF 占用 CPU，模拟推理耗时。
+报告临时片段和最终片段延迟的 p50/p95，并把在线分配的说话人标签与同一批片段、同一份特征离线聚类
+（说话人数相同）的结果比较一致率。临时片段或最终片段延迟 p95 达到 --max-latency 秒，
+或一致率低于 --min-agreement 时以非零状态码退出。
+
+另外报告与整段音频提取特征后离线聚类的一致率，只报告不检查：piptrack 的峰值阈值相对于整个 STFT 块的最大幅度，
+实时转录只能在十几秒的回看窗口内提取特征，音高和频谱质心与文件转录（60 秒的块）不同，
+参考片段长达 5–15 秒、整段只有约 20 个片段，两类说话人的划分对这种差别很敏感（内置音频上约 62%）。
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from audio_io import decode_audio, SAMPLE_RATE
+from batch_features import extract_batch_features, CLUSTER_FEATURE_COUNT
+from speaker_clustering import cluster_speakers
+from whisper_transcriber import WhisperTranscriber
+from live_transcriber import LiveTranscriber, replay_source, STEP_SECONDS, MAX_WINDOW_SECONDS, DEFAULT_LIVE_PROFILE
+
+REFERENCE_AUDIO = CORE_DIR / "test3min音频.MP3"
+REFERENCE_SEGMENTS = CORE_DIR / "音频文件_segments.json"
+
+
+class ReplayLiveTranscriber(LiveTranscriber):
+    """替身：按窗口回放参考片段，未说完的片段返回部分文字"""
+
+    def __init__(self, segments, rtf=0.0, **kwargs):
+        super().__init__(WhisperTranscriber(profile=DEFAULT_LIVE_PROFILE), **kwargs)
+        self.segments = segments
+        self.rtf = rtf
+
+    def transcribe_window(self, audio, offset_seconds):
+        window_end = offset_seconds + len(audio) / SAMPLE_RATE
+        if self.rtf:
+            time.sleep(len(audio) / SAMPLE_RATE * self.rtf)
+        segments = []
+        for segment in self.segments:
+            if (segment["start"] + segment["end"]) / 2 < offset_seconds or segment["start"] >= window_end:
+                continue
+            text = segment["text"]
+            if segment["end"] > window_end:
+                spoken = (window_end - segment["start"]) / (segment["end"] - segment["start"])
+                text = text[:int(len(text) * spoken)]
+            if text:
+                segments.append({"start": max(segment["start"], offset_seconds),
+                                 "end": min(segment["end"], window_end), "text": text})
+        return segments
+
+
+def label_agreement(online, offline):
+    """两组标签在最佳一一对应下的一致率"""
+    from scipy.optimize import linear_sum_assignment
+    online, offline = np.asarray(online), np.asarray(offline)
+    size = max(online.max(), offline.max()) + 1
+    confusion = np.zeros((size, size), dtype=np.int64)
+    np.add.at(confusion, (online, offline), 1)
+    rows, columns = linear_sum_assignment(-confusion)
+    return confusion[rows, columns].sum() / len(online)
+
+
+def take(source, seconds):
+    """只取来源的前 seconds 秒（0 表示全部）"""
+    received = 0
+    for block in source:
+        yield block
+        received += len(block)
+        if seconds and received >= seconds * SAMPLE_RATE:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实时转录基准测试")
+    parser.add_argument("--audio", default=str(REFERENCE_AUDIO), help="回放的音频文件")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--seconds", type=float, default=0, help="只回放前多少秒，0 表示全部")
+    parser.add_argument("--model", help="使用真实 Whisper 模型（例如 tiny），不指定时使用替身")
+    parser.add_argument("--rtf", type=float, default=0.0, help="替身每次转录的耗时 = 窗口时长 × RTF")
+    parser.add_argument("--step", type=float, default=STEP_SECONDS, help="每积累多少秒新音频转录一次")
+    parser.add_argument("--max-window", type=float, default=MAX_WINDOW_SECONDS, help="回看窗口上限（秒）")
+    parser.add_argument("--max-latency", type=float, default=2.0, help="临时片段和最终片段延迟 p95 上限（秒）")
+    parser.add_argument("--min-agreement", type=float, default=0.9, help="在线分配与离线聚类的说话人一致率下限")
+    args = parser.parse_args()
+
+    events = {"provisional": 0, "segment": 0}
+
+    def on_event(event, **payload):
+        events[event] += 1
+
+    options = dict(on_event=on_event, step_seconds=args.step, max_window_seconds=args.max_window)
+    if args.model:
+        transcriber = WhisperTranscriber(profile=DEFAULT_LIVE_PROFILE)
+        transcriber.load_model(args.model)
+        live = LiveTranscriber(transcriber, **options)
+    else:
+        with open(REFERENCE_SEGMENTS, "r", encoding="utf-8") as f:
+            live = ReplayLiveTranscriber(json.load(f)["segments"], args.rtf, **options)
+
+    store = live.run(take(replay_source(args.audio, args.speed), args.seconds))
+    summary = live.latency_summary()
+    print(f"临时片段事件 {events['provisional']} 次，最终片段 {events['segment']} 个")
+    print(f"  每次转录耗时 {summary['decodeSeconds']}")
+    print(f"  临时片段延迟 {summary['provisionalLatency']}")
+    print(f"  最终片段延迟 {summary['finalLatency']}")
+
+    failures = []
+    for name, key in (("临时片段", "provisionalLatency"), ("最终片段", "finalLatency")):
+        p95 = (summary[key] or {}).get("p95", 0)
+        if p95 >= args.max_latency:
+            failures.append(f"{name}延迟 p95 {p95:.2f} 秒，超过 {args.max_latency:g} 秒")
+
+    if len(store) >= 2:
+        num_speakers = max(summary["numSpeakers"], 1)
+        # 在线分配使用的同一份特征离线聚类：只比较分配策略
+        offline, _ = cluster_speakers(np.array(live.features), num_speakers)
+        agreement = label_agreement(store.labels, offline)
+        # 整段音频提取特征后离线聚类：还包含特征提取范围不同带来的差别，只报告
+        audio = decode_audio(args.audio)
+        features = extract_batch_features(audio, store.starts, store.ends)[:, :CLUSTER_FEATURE_COUNT]
+        whole, _ = cluster_speakers(features, num_speakers)
+        print(f"  在线说话人 {summary['numSpeakers']} 个，与离线聚类的一致率 {agreement:.1%}"
+              f"（与整段音频特征的离线聚类 {label_agreement(store.labels, whole):.1%}）")
+        if agreement < args.min_agreement:
+            failures.append(f"在线分配与离线聚类的一致率 {agreement:.1%}，低于 {args.min_agreement:.0%}")
+
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        sys.exit(1)
+    print(f"✓ 延迟 p95 低于 {args.max_latency:g} 秒，说话人一致率不低于 {args.min_agreement:.0%}")
+
+
+if __name__ == "__main__":
+    main()
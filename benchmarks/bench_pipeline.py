@@ -0,0 +1,221 @@
+"""完整流水线的分阶段基准测试（离线，不需要 Whisper 模型权重）
+
+用法:
+    python benchmarks/bench_pipeline.py                      # 运行并与基线比较（基线存在时）
+    python benchmarks/bench_pipeline.py --save-baseline      # 运行并保存为新的基线
+    python benchmarks/bench_pipeline.py --threshold 0.3 --repeat 5
+
+转录阶段使用回放 音频文件_segments.json 的替身模型：它通过 whisper 内部的进度条接口
+逐窗口交出片段，因此流式回调、解码、特征提取、聚类、结果整理和保存都走真实代码路径。
+片段截取到音频时长以内。--replay-rtf 让替身模型每个窗口用 PyTorch 矩阵乘法占用 CPU
+（窗口时长 × RTF 秒），模拟真实推理的耗时和 CPU 竞争，用来观察特征提取与转录重叠的效果；
+--no-overlap 关闭重叠，转录结束后才提取特征。
+
+每个阶段的耗时取 --repeat 次运行的中位数，来自流水线输出的 METRIC 指标；
+吞吐量为 音频秒数 / 墙钟秒数，峰值内存为阶段结束时进程的峰值常驻内存。
+结果写入 --output（JSON）。某个阶段比基线慢超过 --threshold（相对）且超过
+--min-delta 秒（绝对，过滤计时噪声）时以非零状态码退出。
+"""
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import tempfile
+import shutil
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(CORE_DIR))
+
+import metrics
+from audio_io import decode_audio, SAMPLE_RATE
+from whisper_transcriber import WhisperTranscriber
+from speaker_recognizer import SpeakerRecognizer
+from transcribe import run_job
+
+DEFAULT_FILES = ["test1min音频.MP3", "test3min音频.MP3"]
+REFERENCE_SEGMENTS = CORE_DIR / "音频文件_segments.json"
+# 参与比较的阶段
+STAGES = ["decode", "transcribe", "features", "clustering", "format", "audio_index", "save_result", "job"]
+
+
+class ReplayModel:
+    """替身模型：按 30 秒窗口回放参考片段，并像 whisper 一样更新进度条"""
+
+    def __init__(self, segments, rtf=0.0):
+        self.segments = segments
+        self.rtf = rtf
+
+    def busy(self, seconds):
+        """用多线程的矩阵乘法占用 CPU 指定的墙钟时长"""
+        import torch
+        matrix = torch.rand(512, 512)
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            torch.mm(matrix, matrix)
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        replay = [
+            dict(segment, end=min(segment["end"], duration))
+            for segment in self.segments if segment["start"] < duration
+        ]
+        whisper_module = importlib.import_module("whisper.transcribe")
+        n_frames = int(duration * 100)
+        all_segments = []
+        with whisper_module.tqdm.tqdm(total=n_frames, unit="frames", disable=True) as pbar:
+            window = 30.0
+            while replay:
+                # 局部变量名与 whisper 一致，流式回调从调用方帧中读取 all_segments
+                while replay and replay[0]["start"] < window:
+                    all_segments.append(replay.pop(0))
+                self.busy(30.0 * self.rtf)
+                pbar.update(3000)
+                window += 30.0
+        return {"segments": all_segments, "text": "".join(s["text"] for s in all_segments)}
+
+
+class ReplayTranscriber(WhisperTranscriber):
+    def __init__(self, segments, rtf=0.0):
+        super().__init__()
+        self.replay_model = ReplayModel(segments, rtf)
+
+    def load_model(self, model_size):
+        self.model = self.replay_model
+        return self.model
+
+
+def run_once(audio_path, segments, num_workers, num_speakers, rtf=0.0, overlap=True):
+    """运行一次完整流水线，返回 {阶段: 指标}"""
+    records = {}
+    metrics.set_sink(lambda record: records.setdefault(record["stage"], record))
+    try:
+        with metrics.stage("job"):
+            run_job(
+                ReplayTranscriber(segments, rtf),
+                SpeakerRecognizer(num_workers=num_workers),
+                audio_path,
+                num_speakers,
+                overlap_features=overlap
+            )
+    finally:
+        metrics.set_sink(None)
+    return records
+
+
+def summarize(runs, audio_seconds):
+    summary = {}
+    for stage in STAGES:
+        samples = [run[stage] for run in runs if stage in run]
+        if not samples:
+            continue
+        wall = statistics.median(sample["wall"] for sample in samples)
+        summary[stage] = {
+            "wall": wall,
+            "cpu": statistics.median(sample["cpu"] for sample in samples),
+            "peakRssMb": max(sample["peakRssMb"] or 0 for sample in samples),
+            "throughput": audio_seconds / wall if wall > 0 else None
+        }
+    return summary
+
+
+def compare(results, baseline, threshold, min_delta):
+    """返回回归列表: (文件, 阶段, 基线耗时, 当前耗时)"""
+    regressions = []
+    for name, current in results["files"].items():
+        reference = baseline.get("files", {}).get(name)
+        if reference is None:
+            continue
+        for stage, stats in current["stages"].items():
+            base = reference["stages"].get(stage)
+            if base is None:
+                continue
+            delta = stats["wall"] - base["wall"]
+            if delta > min_delta and stats["wall"] > base["wall"] * (1 + threshold):
+                regressions.append((name, stage, base["wall"], stats["wall"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流水线分阶段基准测试")
+    parser.add_argument("files", nargs="*", help="音频文件，默认使用内置测试音频")
+    parser.add_argument("--repeat", type=int, default=5, help="每个文件运行次数，取中位数")
+    parser.add_argument("--workers", type=int, default=1, help="特征提取进程数")
+    parser.add_argument("--num-speakers", type=int, default=2, help="说话人数量，0 表示自动估计")
+    parser.add_argument("--replay-rtf", type=float, default=0.0, help="替身模型模拟的实时率，0 表示立即返回")
+    parser.add_argument("--no-overlap", action="store_true", help="转录结束后才提取特征")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "pipeline_latest.json"), help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=str(RESULTS_DIR / "pipeline_baseline.json"), help="基线 JSON 路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允许的相对变慢比例")
+    parser.add_argument("--min-delta", type=float, default=0.1, help="小于该秒数的变慢视为噪声")
+    args = parser.parse_args()
+
+    with open(REFERENCE_SEGMENTS, "r", encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    files = args.files or [str(CORE_DIR / name) for name in DEFAULT_FILES]
+
+    # 结果文件会写在音频旁边，复制到临时目录运行，避免污染仓库
+    work_dir = Path(tempfile.mkdtemp(prefix="tingyin_bench_"))
+    results = {"createdAt": time.time(), "repeat": args.repeat, "workers": args.workers,
+               "replayRtf": args.replay_rtf, "overlap": not args.no_overlap, "files": {}}
+    try:
+        # 预热 librosa/numba 的懒加载组件，避免首次调用的开销计入结果
+        warmup = work_dir / ("warmup" + Path(files[0]).suffix)
+        shutil.copy(files[0], warmup)
+        run_once(str(warmup), segments[:5], args.workers, args.num_speakers or None)
+
+        for audio_path in files:
+            name = Path(audio_path).name
+            local_path = work_dir / name
+            shutil.copy(audio_path, local_path)
+            audio_seconds = len(decode_audio(str(local_path))) / SAMPLE_RATE
+
+            runs = [
+                run_once(str(local_path), segments, args.workers, args.num_speakers or None,
+                         args.replay_rtf, not args.no_overlap)
+                for _ in range(args.repeat)
+            ]
+            stages = summarize(runs, audio_seconds)
+            results["files"][name] = {"audioSeconds": audio_seconds, "stages": stages}
+
+            print(f"\n{name}: {audio_seconds:.1f} 秒音频")
+            print(f"  {'阶段':<12} {'耗时(秒)':>10} {'CPU(秒)':>10} {'吞吐(音频秒/秒)':>16} {'峰值内存(MB)':>14}")
+            for stage, stats in stages.items():
+                throughput = f"{stats['throughput']:.1f}" if stats["throughput"] else "-"
+                print(f"  {stage:<12} {stats['wall']:>10.3f} {stats['cpu']:>10.3f} {throughput:>16} "
+                      f"{stats['peakRssMb']:>14.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已保存到: {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已保存到: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print("没有基线，跳过回归检查（使用 --save-baseline 保存）")
+        return
+
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")),
+                          args.threshold, args.min_delta)
+    if regressions:
+        print("\n✗ 性能回归:")
+        for name, stage, before, after in regressions:
+            print(f"  {name} {stage}: {before:.3f}s -> {after:.3f}s (+{(after / before - 1) * 100:.0f}%)")
+        sys.exit(1)
+    print("✓ 所有阶段均未超过回归阈值")
+
+
+if __name__ == "__main__":
+    main()
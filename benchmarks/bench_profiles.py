@@ -0,0 +1,113 @@
+"""对比各解码档位的速度和准确度
+
+用法: python benchmarks/bench_profiles.py [音频文件 ...] [--model small] [--profiles fast balanced accurate]
+      [--reference 参考文本.txt] [--output 结果.json]
+
+需要本地已有对应的 Whisper 模型。每个档位先加载一次模型（fast 档位加载量化版本）再计时，
+实时率 RTF = 转录耗时 / 音频时长，越小越快。
+字错率 CER 以 --reference 给出的人工校对文本为参考（与音频按顺序一一对应）；
+未提供时以 accurate 档位的输出为参考，只反映与 beam search 结果的差异。
+比较前去掉标点和空白。
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+from audio_io import decode_audio, SAMPLE_RATE
+from whisper_transcriber import WhisperTranscriber
+from decoding_profiles import DECODING_PROFILES
+
+DEFAULT_FILES = ["test1min音频.MP3", "test3min音频.MP3"]
+PUNCTUATION = re.compile(r"[\s，。！？；：、,.!?;:\"'“”‘’（）()《》]+")
+
+
+def normalize(text):
+    return PUNCTUATION.sub("", text)
+
+
+def character_error_rate(hypothesis, reference):
+    """按字计算的编辑距离 / 参考文本长度"""
+    hypothesis = normalize(hypothesis)
+    reference = normalize(reference)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char))
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解码档位基准测试")
+    parser.add_argument("files", nargs="*", help="音频文件，默认使用内置测试音频")
+    parser.add_argument("--model", default="small", help="Whisper 模型大小")
+    parser.add_argument("--profiles", nargs="+", choices=list(DECODING_PROFILES), default=list(DECODING_PROFILES),
+                        help="参与比较的档位")
+    parser.add_argument("--reference", nargs="*", default=None, help="人工校对的参考文本文件，与音频一一对应")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    files = args.files or [str(CORE_DIR / name) for name in DEFAULT_FILES]
+    references = None
+    if args.reference:
+        if len(args.reference) != len(files):
+            parser.error("--reference 的数量必须与音频文件数量一致")
+        references = [Path(path).read_text(encoding="utf-8") for path in args.reference]
+
+    audios = [decode_audio(path) for path in files]
+    texts = {}
+    results = []
+    for profile in args.profiles:
+        transcriber = WhisperTranscriber(profile=profile)
+        transcriber.load_model(args.model)
+        for index, (audio_path, audio) in enumerate(zip(files, audios)):
+            start = time.perf_counter()
+            segments = transcriber.transcribe(audio_path, args.model, audio=audio)
+            elapsed = time.perf_counter() - start
+            duration = len(audio) / SAMPLE_RATE
+            texts[(profile, index)] = "".join(segment["text"] for segment in segments)
+            results.append((index, {
+                "file": Path(audio_path).name,
+                "profile": profile,
+                "model": args.model,
+                "quantized": transcriber.quantize,
+                "duration": round(duration, 2),
+                "seconds": round(elapsed, 3),
+                "rtf": round(elapsed / duration, 4) if duration > 0 else None,
+                "segments": len(segments)
+            }))
+
+    for index, result in results:
+        if references is not None:
+            reference = references[index]
+        elif "accurate" in args.profiles:
+            reference = texts[("accurate", index)]
+        else:
+            reference = None
+        text = texts[(result["profile"], index)]
+        result["cer"] = round(character_error_rate(text, reference), 4) if reference is not None else None
+    results = [result for _, result in results]
+
+    print(f"\n{'文件':<20} {'档位':<10} {'耗时(秒)':>10} {'RTF':>8} {'CER':>8} {'片段数':>8}")
+    for result in results:
+        cer = f"{result['cer']:.3f}" if result["cer"] is not None else "-"
+        print(f"{result['file']:<20} {result['profile']:<10} {result['seconds']:>10.1f} "
+              f"{result['rtf']:>8.3f} {cer:>8} {result['segments']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
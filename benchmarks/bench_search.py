@@ -0,0 +1,174 @@
+"""全文索引的导入耗时、查询延迟和结果的正确性
+用法: python benchmarks/bench_search.py [--hours 1000] [--queries 200]
+
+用 音频文件_segments.json 中的真实文本按分句随机拼接，合成 --hours 个一小时的识别结果
+（每段 2~8 秒、1~3 个分句，4 个说话人），逐个写入索引（与任务完成时的写入方式相同），报告：
+  add      每个一小时结果写入索引的耗时（中位数 / p95）
+  query    随机取 2~4 字的子串、单字和多词查询的延迟（中位数 / p95 / 最大），默认排序和 --rank 排序
+  filter   加上说话人和时间范围过滤的查询延迟
+  ingest   从结果文件增量导入：首次导入、文件未变化时跳过、修改后重新导入
+并抽查若干查询：返回的每个片段都包含查询文字，某个文件内的全部匹配与逐段子串查找的结果一致。
+查询 p95 超过 --max-p95-ms 或检查不通过时以非零状态码退出。
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+import numpy as np
+from segment_store import SegmentStore
+from transcript_search import TranscriptIndex
+
+REFERENCE_SEGMENTS = CORE_DIR / "音频文件_segments.json"
+SEGMENTS_PER_HOUR = 720
+
+
+def load_clauses():
+    with open(REFERENCE_SEGMENTS, "r", encoding="utf-8") as f:
+        texts = [segment["text"] for segment in json.load(f)["segments"]]
+    return [clause for text in texts for clause in re.split(r"(?<=[,，。?？!！])", text) if clause.strip()]
+
+
+def make_store(clauses, rng):
+    durations = rng.uniform(2, 8, SEGMENTS_PER_HOUR)
+    starts = np.cumsum(durations + 0.2) - durations
+    picks = rng.integers(0, len(clauses), (SEGMENTS_PER_HOUR, 3))
+    counts = rng.integers(1, 4, SEGMENTS_PER_HOUR)
+    store = SegmentStore()
+    for start, duration, pick, count in zip(starts.tolist(), durations.tolist(), picks, counts):
+        store.append(start, start + duration, "".join(clauses[i] for i in pick[:count]))
+    store.set_labels((np.cumsum(rng.random(SEGMENTS_PER_HOUR) < 0.3) + rng.integers(0, 4)) % 4)
+    return store
+
+
+def make_queries(clauses, count, rng):
+    """随机子串（2~4 个汉字）、单字和两个词的组合"""
+    cjk = [re.sub(r"[^\u4e00-\u9fff]", "", clause) for clause in clauses]
+    cjk = [text for text in cjk if len(text) >= 4]
+    queries = []
+    for i in range(count):
+        text = cjk[rng.integers(len(cjk))]
+        length = [1, 2, 3, 4][i % 4]
+        position = rng.integers(0, len(text) - length + 1)
+        queries.append(text[position:position + length])
+    return queries + [f"{queries[i]} {queries[i + 1]}" for i in range(1, min(count, 40), 4)]
+
+
+def latency(index, queries, **options):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, **options)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), float(np.percentile(samples, 95)), max(samples)
+
+
+def check_results(index, first_store, first_path, queries):
+    failures = []
+    for query in queries:
+        terms = query.split()
+        for result in index.search(query, limit=50):
+            if not all(term in result["text"] for term in terms):
+                failures.append(f"{query}: 结果不包含查询文字: {result['text'][:30]}")
+                break
+        # 逐段子串查找第一个文件，与该文件内的全部匹配比较
+        expected = sorted(
+            (round(start, 6), text) for start, text in zip(first_store.starts.tolist(), first_store.texts)
+            if all(term in text for term in terms)
+        )
+        found = sorted(
+            (round(result["start"], 6), result["text"])
+            for result in index.search(query, path=first_path, limit=10 ** 6)
+        )
+        if found != expected:
+            failures.append(f"{query}: 文件内匹配 {len(found)} 个，逐段查找 {len(expected)} 个")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文索引基准测试")
+    parser.add_argument("--hours", type=int, default=1000, help="合成的一小时识别结果个数")
+    parser.add_argument("--queries", type=int, default=200, help="查询个数")
+    parser.add_argument("--checks", type=int, default=20, help="抽查正确性的查询个数")
+    parser.add_argument("--max-p95-ms", type=float, default=50.0, help="允许的查询 p95 延迟（毫秒）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clauses = load_clauses()
+    queries = make_queries(clauses, args.queries, rng)
+    failed = False
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = TranscriptIndex(Path(temp_dir) / "transcripts.sqlite")
+        add_samples = []
+        first_store, first_path = None, None
+        for i in range(args.hours):
+            store = make_store(clauses, rng)
+            path = str(Path(temp_dir) / f"录音{i:05d}_说话人识别结果.json")
+            start = time.perf_counter()
+            index.add(path, store, names={0: "张三"} if i % 10 == 0 else None)
+            add_samples.append(time.perf_counter() - start)
+            if i == 0:
+                first_store, first_path = store, path
+        start = time.perf_counter()
+        index.optimize()
+        optimize_seconds = time.perf_counter() - start
+        stats = index.stats()
+        print(f"{stats['files']} 个结果，{stats['segments']} 个片段，{stats['hours']:.0f} 小时，"
+              f"索引 {stats['sizeMb']:.0f} MB")
+        print(f"  add     每个结果 中位数 {statistics.median(add_samples) * 1000:.1f} 毫秒  "
+              f"p95 {np.percentile(add_samples, 95) * 1000:.1f} 毫秒  合计 {sum(add_samples):.1f} 秒  "
+              f"optimize {optimize_seconds:.1f} 秒")
+
+        rows = [
+            ("query", {}),
+            ("rank", {"rank": True}),
+            ("speaker", {"speaker": "说话人2"}),
+            ("name", {"speaker": "张三"}),
+            ("range", {"start": 600, "end": 1200})
+        ]
+        for name, options in rows:
+            median, p95, worst = latency(index, queries, **options)
+            over = name != "rank" and p95 > args.max_p95_ms
+            failed |= over
+            print(f"  {name:<7} 中位数 {median:.2f} 毫秒  p95 {p95:.2f} 毫秒  最大 {worst:.2f} 毫秒"
+                  f"{'  ✗ 超过 p95 上限' if over else ''}")
+
+        failures = check_results(index, first_store, first_path, queries[:args.checks])
+        index.close()
+
+        # 从结果文件增量导入
+        result_dir = Path(temp_dir) / "results"
+        result_dir.mkdir()
+        for i in range(20):
+            make_store(clauses, rng).write(str(result_dir / f"会议{i:02d}_说话人识别结果.json"))
+        with TranscriptIndex(Path(temp_dir) / "ingest.sqlite") as ingest_index:
+            for label in ("首次导入", "未变化", "修改一个后"):
+                if label == "修改一个后":
+                    changed = result_dir / "会议00_说话人识别结果.json"
+                    make_store(clauses, rng).write(str(changed))
+                    os.utime(changed, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+                start = time.perf_counter()
+                files, segments, skipped = ingest_index.ingest_paths([result_dir])
+                print(f"  ingest  {label}: 导入 {files} 个（{segments} 个片段），跳过 {skipped} 个，"
+                      f"{(time.perf_counter() - start) * 1000:.0f} 毫秒")
+            if ingest_index.stats()["segments"] != 20 * SEGMENTS_PER_HOUR:
+                failures.append("ingest: 重新导入后片段数不一致")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures or failed:
+        sys.exit(1)
+    print("\n✓ 查询结果检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""各命令行入口的冷启动耗时
+
+用法:
+    python benchmarks/bench_startup.py                   # 运行并与基线比较（基线存在时）
+    python benchmarks/bench_startup.py --save-baseline   # 运行并保存为新的基线
+    python benchmarks/bench_startup.py --repeat 10 --threshold 0.5
+
+每个入口用 python -X importtime 在子进程中运行不需要音频的路径（缺少参数的提示、--help、
+列出空声纹库），记录进程的墙钟时间和 importtime 报告的模块导入总耗时（各取 --repeat 次的最小值），
+并列出导入最慢的几个顶层模块。某个入口比基线慢超过 --threshold（相对）且超过 --min-delta 秒时
+以非零状态码退出。
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 入口名称 -> 命令行参数（在 src/core 下运行）
+ENTRY_POINTS = {
+    "transcribe": ["transcribe.py"],
+    "transcribe --help": ["transcribe.py", "--help"],
+    "recognize_speakers --help": ["recognize_speakers.py", "--help"],
+    "batch_transcribe --help": ["batch_transcribe.py", "--help"],
+    "speaker_profiles list": ["speaker_profiles.py", "--profiles", "{empty_profiles}", "list"],
+    "live_transcriber --help": ["live_transcriber.py", "--help"],
+    "transcript_search --help": ["transcript_search.py", "--help"],
+}
+# importtime 的每一行: "import time: 自身(us) | 累计(us) | 模块名"，模块名前的缩进表示嵌套层级
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr):
+    """返回 (导入总耗时秒数, [(顶层模块, 累计秒数)])"""
+    top_level = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            top_level.append((match.group(4), int(match.group(2)) / 1e6))
+    return sum(seconds for _, seconds in top_level), top_level
+
+
+def run_entry(args, empty_profiles):
+    command = [sys.executable, "-X", "importtime"] + [arg.format(empty_profiles=empty_profiles) for arg in args]
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=CORE_DIR, capture_output=True, text=True,
+                             env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    wall = time.perf_counter() - start
+    imports, top_level = parse_importtime(process.stderr)
+    return {"wall": wall, "imports": imports, "returncode": process.returncode, "topLevel": top_level}
+
+
+def compare(results, baseline, threshold, min_delta):
+    """返回回归列表: (入口, 基线耗时, 当前耗时)"""
+    regressions = []
+    for name, current in results["entries"].items():
+        reference = baseline.get("entries", {}).get(name)
+        if reference is None:
+            continue
+        delta = current["wall"] - reference["wall"]
+        if delta > min_delta and current["wall"] > reference["wall"] * (1 + threshold):
+            regressions.append((name, reference["wall"], current["wall"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行入口冷启动基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口运行次数，取最小值")
+    parser.add_argument("--top", type=int, default=3, help="列出导入最慢的顶层模块数")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "startup_latest.json"), help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=str(RESULTS_DIR / "startup_baseline.json"), help="基线 JSON 路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.5, help="允许的相对变慢比例")
+    parser.add_argument("--min-delta", type=float, default=0.2, help="小于该秒数的变慢视为噪声")
+    args = parser.parse_args()
+
+    results = {"createdAt": time.time(), "repeat": args.repeat, "python": sys.version.split()[0], "entries": {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        empty_profiles = str(Path(temp_dir) / "profiles.npz")
+        print(f"{'入口':<28} {'墙钟(秒)':>10} {'导入(秒)':>10}  最慢的顶层模块")
+        for name, entry_args in ENTRY_POINTS.items():
+            runs = [run_entry(entry_args, empty_profiles) for _ in range(args.repeat)]
+            fastest = min(runs, key=lambda run: run["wall"])
+            top = sorted(fastest["topLevel"], key=lambda item: -item[1])[:args.top]
+            results["entries"][name] = {
+                "wall": round(fastest["wall"], 4),
+                "imports": round(min(run["imports"] for run in runs), 4),
+                "returncode": fastest["returncode"],
+                "slowestImports": {module: round(seconds, 4) for module, seconds in top}
+            }
+            slowest = ", ".join(f"{module} {seconds:.2f}s" for module, seconds in top)
+            print(f"{name:<28} {fastest['wall']:>10.3f} {results['entries'][name]['imports']:>10.3f}  {slowest}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已保存到: {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已保存到: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print("没有基线，跳过回归检查（使用 --save-baseline 保存）")
+        return
+
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")),
+                          args.threshold, args.min_delta)
+    if regressions:
+        print("\n✗ 启动变慢:")
+        for name, before, after in regressions:
+            print(f"  {name}: {before:.3f}s -> {after:.3f}s (+{(after / before - 1) * 100:.0f}%)")
+        sys.exit(1)
+    print("✓ 所有入口均未超过回归阈值")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""流式解码的峰值内存检查
+
+用法: python benchmarks/bench_streaming_memory.py [--minutes 20 120] [--budget-mb 300]
+
+用 ffmpeg 合成几段不同时长的长录音（带周期性静音的噪声，16kHz WAV），
+每种处理方式在独立的子进程中运行并读取该进程的峰值常驻内存（ru_maxrss）：
+  idle            只导入模块，作为基线
+  full            整段解码后批量提取特征（原来的方式）
+  stream-features 流式解码并提取特征
+  stream-chunks   流式解码并按静音切分转录分块（不运行 Whisper，只检查切分和分块音频的内存）
+检查两项：流式方式的峰值内存比基线多出的部分不超过 --budget-mb，
+且最长与最短录音的流式峰值内存相差不超过 --growth-mb（即内存占用与录音时长无关）。
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent / "src" / "core"
+sys.path.insert(0, str(CORE_DIR))
+
+MODES = ["idle", "full", "stream-features", "stream-chunks"]
+STREAMING_MODES = ["stream-features", "stream-chunks"]
+# 合成片段：每 4 秒一个 3.5 秒的片段
+SEGMENT_STEP = 4.0
+SEGMENT_LENGTH = 3.5
+
+
+def make_long_audio(path, minutes):
+    """噪声每 7 秒有 0.8 秒降到 1%，模拟说话间隙"""
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"anoisesrc=d={minutes * 60}:a=0.1:r=16000:seed=1",
+        "-af", "volume='if(lt(mod(t,7),0.8),0.01,1)':eval=frame",
+        "-ac", "1", "-acodec", "pcm_s16le", str(path)
+    ], check=True)
+
+
+def measure(mode, audio_path, minutes):
+    """在子进程中运行：处理音频并输出峰值内存（JSON）"""
+    import numpy as np
+    import metrics
+    from audio_io import decode_audio, stream_audio
+    from batch_features import extract_batch_features, extract_streaming_features
+    from chunked_transcriber import iter_stream_chunks
+
+    starts = np.arange(0, minutes * 60 - SEGMENT_LENGTH, SEGMENT_STEP)
+    ends = starts + SEGMENT_LENGTH
+    start = time.perf_counter()
+    info = {}
+    if mode == "full":
+        audio = decode_audio(audio_path)
+        info["rows"] = len(extract_batch_features(audio, starts, ends))
+    elif mode == "stream-features":
+        info["rows"] = len(extract_streaming_features(stream_audio(audio_path), starts, ends))
+    elif mode == "stream-chunks":
+        info["chunks"] = sum(1 for _ in iter_stream_chunks(stream_audio(audio_path)))
+    info.update(seconds=round(time.perf_counter() - start, 2), peakRssMb=round(metrics.peak_rss_mb(), 1))
+    print(json.dumps(info))
+
+
+def run_measure(mode, audio_path, minutes):
+    output = subprocess.run(
+        [sys.executable, __file__, "--measure", mode, str(audio_path), str(minutes)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式解码峰值内存检查")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[20, 120], help="合成录音的时长（分钟）")
+    parser.add_argument("--budget-mb", type=float, default=300, help="流式方式比基线多出的峰值内存上限 (MB)")
+    parser.add_argument("--growth-mb", type=float, default=50, help="最长与最短录音的流式峰值内存差上限 (MB)")
+    parser.add_argument("--skip-full", action="store_true", help="不运行整段解码的对照组")
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "AUDIO", "MINUTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, audio_path, minutes = args.measure
+        measure(mode, audio_path, float(minutes))
+        return
+
+    modes = [mode for mode in MODES if not (args.skip_full and mode == "full")]
+    peaks = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for minutes in sorted(args.minutes):
+            audio_path = Path(temp_dir) / f"long_{minutes:g}min.wav"
+            make_long_audio(audio_path, minutes)
+            print(f"\n合成录音 {minutes:g} 分钟 ({audio_path.stat().st_size / 1024 / 1024:.0f} MB)")
+            for mode in modes:
+                result = run_measure(mode, audio_path, minutes)
+                peaks[(mode, minutes)] = result["peakRssMb"]
+                print(f"  {mode:<16} 峰值内存 {result['peakRssMb']:8.1f} MB  耗时 {result['seconds']:7.1f} 秒")
+            audio_path.unlink()
+
+    failed = False
+    shortest, longest = min(args.minutes), max(args.minutes)
+    for mode in STREAMING_MODES:
+        extra = max(peaks[(mode, minutes)] - peaks[("idle", minutes)] for minutes in args.minutes)
+        growth = peaks[(mode, longest)] - peaks[(mode, shortest)]
+        ok = extra <= args.budget_mb and growth <= args.growth_mb
+        failed |= not ok
+        print(f"{'✓' if ok else '✗'} {mode}: 比基线最多多 {extra:.1f} MB（上限 {args.budget_mb:g}），"
+              f"{shortest:g} → {longest:g} 分钟增长 {growth:.1f} MB（上限 {args.growth_mb:g}）")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -84,7 +84,6 @@ def build_python():
         '--hidden-import=numpy',
         '--hidden-import=librosa',
         '--hidden-import=sklearn',
-        '--hidden-import=pydub',
         '--hidden-import=ffmpeg',
         '--hidden-import=pyannote.audio',
         '--hidden-import=speechbrain',
@@ -1,14 +1,48 @@
 const { app, BrowserWindow, ipcMain, dialog } = require('electron');
 const path = require('path');
 const isDev = require('electron-is-dev');
-const { PythonShell } = require('python-shell');
 const fs = require('fs');
+const { TranscriptionWorker } = require('./transcriptionWorker');
 
 // 将 pythonPath 的声明移到全局作用域
 const pythonPath = isDev 
   ? path.join(process.cwd(), 'venv/bin/python3')
   : path.join(process.resourcesPath, 'venv/bin/python3');
 
+// 常驻的转录进程，在多次转录请求间复用已加载的模型
+let transcriptionWorker = null;
+// 渲染进程保存的临时音频，保留到下一次转录以便重新分配说话人，退出时删除剩余的文件
+const tempFiles = new Set();
+let pythonChecked = false;
+
+function getTranscriptionWorker(scriptPath) {
+  if (!transcriptionWorker) {
+    transcriptionWorker = new TranscriptionWorker(pythonPath, scriptPath);
+  }
+  return transcriptionWorker;
+}
+
+// 检查 Python 环境和 whisper 是否可用
+function checkPythonEnvironment() {
+  try {
+    const pythonVersion = require('child_process').execSync(`${pythonPath} --version`, { encoding: 'utf8' });
+    console.log('Python 版本:', pythonVersion);
+    
+    // 检查 whisper 是否已安装
+    const pipList = require('child_process').execSync(`${pythonPath} -m pip list`, { encoding: 'utf8' });
+    console.log('已安装的包:', pipList);
+    
+    if (!pipList.includes('openai-whisper')) {
+      throw new Error('Whisper 包未安装');
+    }
+    
+    console.log('Python 环境检查通过');
+  } catch (err) {
+    console.error('Python 环境检查失败:', err);
+    throw new Error(`Python 环境未正确配置: ${err.message}`);
+  }
+}
+
 function createWindow() {
   const win = new BrowserWindow({
     width: 1200,
@@ -40,6 +74,13 @@ app.whenReady().then(() => {
   });
 });
 
+app.on('will-quit', () => {
+  if (transcriptionWorker) {
+    transcriptionWorker.stop();
+  }
+  tempFiles.forEach(tempPath => require('fs').rmSync(tempPath, { force: true }));
+});
+
 app.on('window-all-closed', () => {
   if (process.platform !== 'darwin') {
     app.quit();
@@ -51,6 +92,7 @@ ipcMain.handle('save-temp-file', async (event, { buffer, filename }) => {
   try {
     const tempPath = path.join(app.getPath('temp'), filename);
     require('fs').writeFileSync(tempPath, Buffer.from(buffer));
+    tempFiles.add(tempPath);
     console.log('临时文件已保存:', tempPath);
     return tempPath;
   } catch (error) {
@@ -61,6 +103,7 @@ ipcMain.handle('save-temp-file', async (event, { buffer, filename }) => {
 
 ipcMain.handle('delete-temp-file', async (event, filepath) => {
   try {
+    tempFiles.delete(filepath);
     require('fs').unlinkSync(filepath);
     console.log('临时文件已删除:', filepath);
     return true;
@@ -71,30 +114,17 @@ ipcMain.handle('delete-temp-file', async (event, filepath) => {
 });
 
 // 处理音频转录
-ipcMain.handle('transcribe-audio', async (event, filePath, numSpeakers, modelSize) => {
+ipcMain.handle('transcribe-audio', async (event, filePath, numSpeakers, modelSize, profile) => {
   try {
     console.log('收到转录请求:', filePath);
     console.log('说话人数量:', numSpeakers);  // 添加日志
+    console.log('解码档位:', profile || '默认');
     
     // 检查文件是否存在
     if (!fs.existsSync(filePath)) {
       throw new Error(`文件不存在: ${filePath}`);
     }
 
-    // 设置 Python 选项
-    let options = {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      scriptPath: path.join(__dirname, '../src/core'),
-      args: [filePath, numSpeakers.toString(), modelSize]
-    };
-
-    // 如果指定了说话人数量，添加到参数中
-    if (numSpeakers) {
-      options.args.push(numSpeakers.toString());
-    }
-
     const sendLog = (message) => {
       event.sender.send('transcription-log', message);
       console.log('日志:', message);
@@ -102,23 +132,10 @@ ipcMain.handle('transcribe-audio', async (event, filePath, numSpeakers, modelSiz
 
     sendLog('开始处理音频文件...');
     
-    // 检查 Python 是否可用
-    try {
-      const pythonVersion = require('child_process').execSync(`${pythonPath} --version`, { encoding: 'utf8' });
-      console.log('Python 版本:', pythonVersion);
-      
-      // 检查 whisper 是否已安装
-      const pipList = require('child_process').execSync(`${pythonPath} -m pip list`, { encoding: 'utf8' });
-      console.log('已安装的包:', pipList);
-      
-      if (!pipList.includes('openai-whisper')) {
-        throw new Error('Whisper 包未安装');
-      }
-      
-      console.log('Python 环境检查通过');
-    } catch (err) {
-      console.error('Python 环境检查失败:', err);
-      throw new Error(`Python 环境未正确配置: ${err.message}`);
+    // 检查 Python 是否可用（常驻进程只需检查一次）
+    if (!pythonChecked) {
+      checkPythonEnvironment();
+      pythonChecked = true;
     }
 
     // 检查文件是否存在
@@ -154,115 +171,83 @@ ipcMain.handle('transcribe-audio', async (event, filePath, numSpeakers, modelSiz
       console.log(`找到文件: ${file}`);
     }
 
-    console.log('Python 配置:', JSON.stringify(options, null, 2));
+    const result = await getTranscriptionWorker(scriptPath).transcribe(filePath, numSpeakers, modelSize, profile, {
+      onProgress: (progress) => event.sender.send('transcription-progress', progress),
+      onLog: sendLog,
+      // 逐个转发已解码的片段和说话人标签，渲染进程可以边转录边显示
+      onSegment: (segment) => event.sender.send('transcription-segment', segment),
+      onSpeakers: (labels) => event.sender.send('transcription-speakers', labels),
+      onMetric: (metric) => {
+        console.log('阶段指标:', JSON.stringify(metric));
+        event.sender.send('transcription-metric', metric);
+      }
+    });
 
-    return new Promise((resolve, reject) => {
-      let output = '';
-      let hasResult = false;
-      
-      console.log('启动 Python 进程...');
-      const pyshell = new PythonShell('transcribe.py', options);
+    sendLog('转录和说话人识别完成');
+    return result;
+  } catch (error) {
+    console.error('转录失败:', error);
+    throw error;
+  }
+});
 
-      pyshell.on('message', (message) => {
-        console.log('Python 输出:', message);
-        sendLog(message);
-      });
+// 波形索引文件名与 src/core/audio_index.py 的 index_path 一致：音频旁边的 {文件名}_波形索引.peaks
+function audioIndexPath(audioPath) {
+  const { dir, name } = path.parse(audioPath);
+  return path.join(dir, `${name}_波形索引.peaks`);
+}
 
-      pyshell.on('error', (err) => {
-        console.error('Python错误:', err);
-        sendLog(`转录错误: ${err.message}`);
-        reject(err);
-      });
+// 读取 Python 端写在识别结果旁边的波形索引，渲染进程把各列直接映射为类型化数组
+// 只接受本进程保存的临时音频，索引路径在主进程中推导，渲染进程不能借此读取任意文件
+ipcMain.handle('read-audio-index', async (event, audioPath) => {
+  try {
+    if (typeof audioPath !== 'string' || !tempFiles.has(audioPath)) {
+      throw new Error(`不是转录中的音频文件: ${audioPath}`);
+    }
+    return fs.readFileSync(audioIndexPath(audioPath));
+  } catch (error) {
+    console.error('读取波形索引失败:', error);
+    throw error;
+  }
+});
 
-      pyshell.on('close', async (code) => {
-        console.log(`Python进程退出，退出码: ${code}`);
-        
-        // 检查结果文件
-        const speakerResultPath = filePath.replace(/\.[^/.]+$/, '_说话人识别结果.json');
-        console.log('结果文件路径:', speakerResultPath);
-        
-        // 检查文件是否存在
-        const fileExists = require('fs').existsSync(speakerResultPath);
-        console.log('结果文件是否存在:', fileExists);
-        
-        if (fileExists) {
-            try {
-                // 读取文件并移除可能的 BOM
-                let speakerResult = fs.readFileSync(speakerResultPath);
-                // 检查并移除 BOM
-                if (speakerResult[0] === 0xEF && speakerResult[1] === 0xBB && speakerResult[2] === 0xBF) {
-                    speakerResult = speakerResult.slice(3);
-                }
-                const resultText = speakerResult.toString('utf8');
-                
-                try {
-                    const result = JSON.parse(resultText);
-                    if (result && result.segments) {
-                        output = result;
-                        hasResult = true;
-                        sendLog('转录和说话人识别完成');
-                        resolve(output);
-                        return;
-                    }
-                } catch (parseError) {
-                    console.error('JSON 解析错误:', parseError);
-                    console.log('原始文件内容:', resultText);
-                    sendLog(`JSON 解析错误: ${parseError.message}`);
-                    reject(parseError);
-                    return;
-                }
-            } catch (readError) {
-                console.error('读取文件错误:', readError);
-                sendLog(`读取文件错误: ${readError.message}`);
-                reject(readError);
-                return;
-            }
-        }
+// 用户修改部分片段的说话人后，只重新分配其余片段（特征取自缓存，不重新转录和聚类）
+ipcMain.handle('rediarize-speakers', async (event, filePath, segments, pinned) => {
+  try {
+    if (!fs.existsSync(filePath)) {
+      throw new Error(`文件不存在: ${filePath}`);
+    }
 
-        // 如果没有找到结果，等待一段时间后重试
-        setTimeout(async () => {
-          try {
-            if (require('fs').existsSync(speakerResultPath)) {
-              const speakerResult = require('fs').readFileSync(speakerResultPath, 'utf8');
-              if (speakerResult.trim()) {
-                output = speakerResult;
-                hasResult = true;
-                sendLog('转录和说话人识别完成');
-                resolve(output.trim());
-                return;
-              }
-            }
-            sendLog('未能获取转录结果');
-            reject(new Error('未能获取转录结果'));
-          } catch (err) {
-            console.error('重试读取结果失败:', err);
-            reject(err);
-          }
-        }, 3000); // 等待 3 秒
-      });
+    const scriptPath = isDev 
+      ? path.join(process.cwd(), 'src/core')
+      : path.join(process.resourcesPath, 'app/core');
 
-      pyshell.end((err) => {
-        if (err) {
-          console.error('转录失败:', err);
-          reject(err);
-          return;
-        }
-        
-        // 只在没有其他结果时处理
-        if (!hasResult) {
-          console.log('pyshell.end - hasResult:', hasResult);
-          console.log('pyshell.end - output:', output);
-          
-          if (!output.trim()) {
-            sendLog('警告：未获取到转录结果');
-            reject(new Error('转录结果为空'));
-            return;
-          }
-        }
-      });
+    return await getTranscriptionWorker(scriptPath).rediarize(filePath, segments, pinned, {
+      onLog: (message) => event.sender.send('transcription-log', message),
+      onMetric: (metric) => console.log('阶段指标:', JSON.stringify(metric))
     });
   } catch (error) {
-    console.error('转录失败:', error);
+    console.error('重新分配说话人失败:', error);
+    throw error;
+  }
+});
+
+// 打开已保存的识别结果（.json / .jsonl / .segcol），文件内容交给渲染进程按格式解析
+ipcMain.handle('open-result-file', async (event) => {
+  try {
+    const { canceled, filePaths } = await dialog.showOpenDialog({
+      title: '打开识别结果',
+      filters: [
+        { name: '识别结果', extensions: ['json', 'jsonl', 'segcol'] }
+      ],
+      properties: ['openFile']
+    });
+    if (canceled || !filePaths.length) {
+      return null;
+    }
+    return { path: filePaths[0], data: fs.readFileSync(filePaths[0]) };
+  } catch (error) {
+    console.error('打开识别结果失败:', error);
     throw error;
   }
 });
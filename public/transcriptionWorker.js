@@ -0,0 +1,166 @@
+const { PythonShell } = require('python-shell');
+
+// 常驻的 Python 转录进程：模型只加载一次，多次转录请求复用同一个进程
+class TranscriptionWorker {
+  constructor(pythonPath, scriptPath) {
+    this.pythonPath = pythonPath;
+    this.scriptPath = scriptPath;
+    this.shell = null;
+    this.jobs = new Map();
+    this.nextId = 1;
+  }
+
+  // 按需启动进程，进程退出后下次请求会重新启动
+  start() {
+    if (this.shell) {
+      return this.shell;
+    }
+
+    const shell = new PythonShell('transcribe.py', {
+      mode: 'text',
+      pythonPath: this.pythonPath,
+      pythonOptions: ['-u'],
+      scriptPath: this.scriptPath,
+      args: ['--worker']
+    });
+
+    shell.on('message', (message) => this.handleMessage(message));
+    shell.on('stderr', (message) => this.handleLog(message));
+
+    shell.on('error', (err) => {
+      console.error('转录进程错误:', err);
+      this.failAll(err);
+    });
+
+    shell.on('close', () => {
+      console.log('转录进程已退出');
+      this.shell = null;
+      this.failAll(new Error('转录进程意外退出'));
+    });
+
+    this.shell = shell;
+    return shell;
+  }
+
+  handleMessage(message) {
+    if (message.startsWith('METRIC:')) {
+      this.handleMetric(message);
+      return;
+    }
+    if (!message.startsWith('EVENT:')) {
+      this.handleLog(message);
+      return;
+    }
+
+    let event;
+    try {
+      event = JSON.parse(message.slice('EVENT:'.length));
+    } catch (err) {
+      console.error('无法解析转录事件:', message);
+      return;
+    }
+
+    const job = this.jobs.get(event.id);
+    if (!job) {
+      return;
+    }
+
+    switch (event.event) {
+      case 'progress':
+        job.onProgress(event.progress);
+        break;
+      case 'segment':
+        job.onSegment({ index: event.index, text: event.text, start: event.start, end: event.end });
+        break;
+      case 'speakers':
+        job.onSpeakers(event.labels);
+        break;
+      case 'result':
+        this.jobs.delete(event.id);
+        job.resolve(event.result);
+        break;
+      case 'error':
+        this.jobs.delete(event.id);
+        job.reject(new Error(event.message));
+        break;
+      default:
+        break;
+    }
+  }
+
+  // 阶段指标：耗时（秒）、CPU 时间（秒）和峰值内存（MB），按任务 id 转发
+  handleMetric(message) {
+    let metric;
+    try {
+      metric = JSON.parse(message.slice('METRIC:'.length));
+    } catch (err) {
+      console.error('无法解析性能指标:', message);
+      return;
+    }
+
+    const job = metric.id ? this.jobs.get(metric.id) : this.jobs.values().next().value;
+    if (job) {
+      job.onMetric(metric);
+    }
+  }
+
+  // 普通输出转发给当前正在处理的任务（任务按提交顺序依次执行）
+  handleLog(message) {
+    console.log('Python 输出:', message);
+    const current = this.jobs.values().next().value;
+    if (current) {
+      current.onLog(message);
+    }
+  }
+
+  failAll(err) {
+    for (const job of this.jobs.values()) {
+      job.reject(err);
+    }
+    this.jobs.clear();
+  }
+
+  submit(payload, {
+    onProgress = () => {},
+    onLog = () => {},
+    onSegment = () => {},
+    onSpeakers = () => {},
+    onMetric = () => {}
+  } = {}) {
+    const shell = this.start();
+    const id = String(this.nextId++);
+
+    return new Promise((resolve, reject) => {
+      this.jobs.set(id, { resolve, reject, onProgress, onLog, onSegment, onSpeakers, onMetric });
+      shell.send(JSON.stringify({ id, ...payload }));
+    });
+  }
+
+  // profile 为解码档位（fast / balanced / accurate），省略时使用 Python 端的默认档位
+  transcribe(filePath, numSpeakers, modelSize, profile, callbacks = {}) {
+    return this.submit({
+      audio_path: filePath,
+      num_speakers: numSpeakers,
+      model_size: modelSize,
+      profile
+    }, callbacks);
+  }
+
+  // 用户修改说话人后只重新分配未固定的片段：pinned 为 { 片段序号: '说话人N' }，片段序号按 segments 展开后的顺序
+  rediarize(filePath, segments, pinned, callbacks = {}) {
+    return this.submit({
+      type: 'rediarize',
+      audio_path: filePath,
+      segments,
+      pinned
+    }, callbacks);
+  }
+
+  stop() {
+    if (this.shell) {
+      this.shell.end(() => {});
+    }
+  }
+}
+
+module.exports = { TranscriptionWorker };
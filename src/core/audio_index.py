@@ -0,0 +1,187 @@
+"""波形峰值索引：界面绘制波形时不需要在渲染进程中解码音频
+
+索引文件写在识别结果旁边（{文件名}_波形索引.peaks），布局与片段列存储相同（见 segment_store.write_column_file）：
+多级波形峰值，最细一级每 256 个采样点（16kHz 下 16 毫秒）一个桶，之后每级桶宽乘 4，
+每个桶保存最小值和最大值，量化为 int8（或 int16）；一小时的录音所有级别合计约 0.6MB。
+跳转到片段由界面的 <audio> 元素按时间定位，不需要字节偏移。
+
+峰值只取决于音频内容：已有索引文件记录的音频文件大小和修改时间一致时直接复用，不再重新写入。
+
+用法: python audio_index.py 音频.mp3 [--bits 16]
+"""
+import os
+import argparse
+import numpy as np
+from audio_io import stream_audio, SAMPLE_RATE
+from segment_store import write_column_file, read_column_file
+
+INDEX_MAGIC = b"TYPKS\x00\x00\x01"
+INDEX_VERSION = 1
+INDEX_SUFFIX = "_波形索引.peaks"
+# 各级每个峰值桶的采样点数，16kHz 下约为 16 毫秒、64 毫秒、0.26 秒、1 秒、4 秒
+PEAK_LEVELS = (256, 1024, 4096, 16384, 65536)
+PEAK_BITS = 8
+# 量化位数 -> (NumPy 类型, 文件头中的类型名)
+PEAK_DTYPES = {8: ("<i1", "int8"), 16: ("<i2", "int16")}
+
+def index_path(audio_path):
+    """索引文件路径：音频旁边的 {文件名}_波形索引.peaks"""
+    return f"{os.path.splitext(audio_path)[0]}{INDEX_SUFFIX}"
+
+
+def source_stamp(audio_path):
+    """音频文件的大小和修改时间，用于判断已有索引中的峰值是否仍然有效"""
+    stat = os.stat(audio_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def quantize(values, bits, rounding):
+    """把 [-1, 1] 的采样值量化为有符号整数；最小值向下、最大值向上取整，波形包络不会变窄"""
+    scale = 2 ** (bits - 1) - 1
+    return np.clip(rounding(values * scale), -scale - 1, scale).astype(PEAK_DTYPES[bits][0])
+
+
+class PeaksBuilder:
+    """按块累积最细一级的峰值：可以一次传入整段音频，也可以接在流式解码后面（见 tee）"""
+
+    def __init__(self, bucket=PEAK_LEVELS[0]):
+        self.bucket = bucket
+        self.samples = 0
+        self._mins = []
+        self._maxs = []
+        # 不足一个桶的剩余采样点，与下一块拼接
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def add(self, block):
+        self.samples += len(block)
+        if len(self._pending):
+            block = np.concatenate([self._pending, block])
+        usable = len(block) - len(block) % self.bucket
+        if usable:
+            buckets = np.asarray(block[:usable]).reshape(-1, self.bucket)
+            self._mins.append(buckets.min(axis=1))
+            self._maxs.append(buckets.max(axis=1))
+        self._pending = np.array(block[usable:], dtype=np.float32)
+
+    def tee(self, blocks):
+        """原样产出 blocks 中的每一块，同时累积峰值"""
+        for block in blocks:
+            self.add(block)
+            yield block
+
+    def finish(self, bits=PEAK_BITS, sizes=PEAK_LEVELS):
+        """返回各级量化后的峰值 [(每桶采样点数, 最小值数组, 最大值数组)]，较粗的级别由最细一级归约得到"""
+        mins = self._mins + ([self._pending.min(keepdims=True)] if len(self._pending) else [])
+        maxs = self._maxs + ([self._pending.max(keepdims=True)] if len(self._pending) else [])
+        mins = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+        maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+        levels = []
+        for size in sizes:
+            level_mins, level_maxs = mins, maxs
+            if size != self.bucket and len(mins):
+                boundaries = np.arange(0, len(mins), size // self.bucket)
+                level_mins = np.minimum.reduceat(mins, boundaries)
+                level_maxs = np.maximum.reduceat(maxs, boundaries)
+            levels.append((size, quantize(level_mins, bits, np.floor), quantize(level_maxs, bits, np.ceil)))
+        return levels
+
+
+class AudioIndex:
+    """波形索引：多级峰值，read/write 对应磁盘上的 .peaks 文件"""
+
+    def __init__(self, levels, samples, bits, source=None, sample_rate=SAMPLE_RATE):
+        # [(每桶采样点数, 量化后的最小值数组, 最大值数组)]，从细到粗
+        self.levels = levels
+        self.samples = samples
+        self.bits = bits
+        self.source = source
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return self.samples / self.sample_rate
+
+    def header(self):
+        return {
+            "format": "tingyin-audio-index",
+            "version": INDEX_VERSION,
+            "sampleRate": self.sample_rate,
+            "samples": self.samples,
+            "duration": round(self.duration, 6),
+            "bits": self.bits,
+            "levels": [{"samplesPerBucket": size, "buckets": len(mins)} for size, mins, _ in self.levels],
+            "source": self.source
+        }
+
+    def write(self, path):
+        """各列（小端）: 每一级的 min{桶宽}/max{桶宽} int8 或 int16[桶数]"""
+        dtype, dtype_name = PEAK_DTYPES[self.bits]
+        columns = []
+        for size, mins, maxs in self.levels:
+            columns.append((f"min{size}", dtype_name, mins.astype(dtype).tobytes()))
+            columns.append((f"max{size}", dtype_name, maxs.astype(dtype).tobytes()))
+        write_column_file(path, INDEX_MAGIC, self.header(), columns)
+
+    @classmethod
+    def read(cls, path):
+        header, data = read_column_file(path, INDEX_MAGIC, "波形索引文件")
+        if header["version"] != INDEX_VERSION:
+            raise ValueError(f"波形索引版本不兼容: {path}")
+        dtype = PEAK_DTYPES[header["bits"]][0]
+
+        def column(name, dtype, count):
+            return np.frombuffer(data, dtype=dtype, count=count, offset=header["columns"][name]["offset"])
+
+        levels = [
+            (level["samplesPerBucket"],
+             column(f"min{level['samplesPerBucket']}", dtype, level["buckets"]),
+             column(f"max{level['samplesPerBucket']}", dtype, level["buckets"]))
+            for level in header["levels"]
+        ]
+        return cls(levels, header["samples"], header["bits"], header.get("source"), header["sampleRate"])
+
+
+def _is_reusable(path, source, bits):
+    """已有索引文件记录的音频与当前文件一致时返回 True"""
+    if not os.path.exists(path):
+        return False
+    try:
+        previous = AudioIndex.read(path)
+    except (ValueError, KeyError, OSError):
+        return False
+    return previous.source == source and previous.bits == bits
+
+
+def write_audio_index(audio_path, audio=None, peaks=None, bits=PEAK_BITS, path=None):
+    """为音频写入波形索引，返回索引文件路径
+
+    audio 为已解码的整段音频；peaks 为流式解码时同步累积、已经读完整个文件的 PeaksBuilder。
+    两者都没有时已有索引仍然有效就直接复用，否则流式解码一遍（内存占用与录音时长无关）。
+    """
+    path = path or index_path(audio_path)
+    source = source_stamp(audio_path)
+    if audio is None and peaks is None and _is_reusable(path, source, bits):
+        return path
+    if peaks is None:
+        peaks = PeaksBuilder()
+        for block in ([audio] if audio is not None else stream_audio(audio_path)):
+            peaks.add(block)
+    AudioIndex(peaks.finish(bits), peaks.samples, bits, source).write(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成波形峰值索引")
+    parser.add_argument("audio_file", help="音频文件")
+    parser.add_argument("--bits", type=int, choices=sorted(PEAK_DTYPES), default=PEAK_BITS, help="峰值量化位数")
+    parser.add_argument("--output", default=None, help="索引文件路径，默认写在音频旁边")
+    args = parser.parse_args()
+
+    path = write_audio_index(args.audio_file, bits=args.bits, path=args.output)
+    index = AudioIndex.read(path)
+    print(f"波形索引已保存到: {path}（{os.path.getsize(path) / 1024:.1f} KB，{index.duration:.1f} 秒，"
+          f"{len(index.levels)} 级峰值）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import subprocess
+import tempfile
+import numpy as np
+
+# 统一的分析采样率（与 Whisper 一致）
+SAMPLE_RATE = 16000
+# 每次从 ffmpeg 管道读取的时长（秒）
+BLOCK_SECONDS = 30
+# 超过该时长（秒）的音频写入内存映射的临时文件，而不是常驻内存
+MMAP_THRESHOLD_SECONDS = 30 * 60
+
+
+def _open_ffmpeg(audio_path, sr):
+    """启动把音频解码为 16kHz 单声道 float32 PCM 的 ffmpeg 进程，没有 ffmpeg 时返回 None"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", str(audio_path),
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(sr),
+        "-loglevel", "error", "-"
+    ]
+    try:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        return None
+
+
+def _check_exit(process):
+    error_output = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"音频解码失败: {error_output.decode('utf-8', errors='ignore').strip()}")
+
+
+def decode_audio(audio_path, sr=SAMPLE_RATE, mmap_threshold=MMAP_THRESHOLD_SECONDS):
+    """一次性把音频解码为单声道 float32 数组
+
+    通过一条 ffmpeg 管道按块读取 PCM 数据。音频较短时直接拼成内存数组；
+    超过 mmap_threshold 秒后改为写入临时文件，并以写时复制的内存映射方式返回。
+    """
+    process = _open_ffmpeg(audio_path, sr)
+    if process is None:
+        # 没有 ffmpeg 时退回 librosa 解码
+        import librosa
+        y, _ = librosa.load(audio_path, sr=sr)
+        return y.astype(np.float32, copy=False)
+
+    block_bytes = BLOCK_SECONDS * sr * 4
+    threshold_bytes = int(mmap_threshold * sr * 4)
+    blocks = []
+    total_bytes = 0
+    scratch = None
+
+    try:
+        while True:
+            chunk = process.stdout.read(block_bytes)
+            if not chunk:
+                break
+
+            # 超过阈值后把已读的数据和后续数据都写入临时文件
+            if scratch is None and total_bytes + len(chunk) > threshold_bytes:
+                scratch = tempfile.NamedTemporaryFile(prefix="tingyin_", suffix=".f32", delete=False)
+                for block in blocks:
+                    scratch.write(block)
+                blocks = []
+
+            if scratch is not None:
+                scratch.write(chunk)
+            else:
+                blocks.append(chunk)
+            total_bytes += len(chunk)
+
+        _check_exit(process)
+    except Exception:
+        process.kill()
+        if scratch is not None:
+            scratch.close()
+            os.unlink(scratch.name)
+        raise
+
+    if scratch is None:
+        # bytearray 可写，whisper/torch 直接使用时不会因只读数组报警告
+        return np.frombuffer(bytearray().join(blocks), dtype=np.float32)
+
+    scratch.close()
+    audio = np.memmap(scratch.name, dtype=np.float32, mode="c")
+    try:
+        # 映射建立后即可删除文件，映射释放时系统自动回收空间
+        os.unlink(scratch.name)
+    except OSError:
+        pass
+    return audio
+
+
+def wav_data_offset(f):
+    """WAV 文件中 data 块的起始字节位置（f 为以二进制方式打开的文件）"""
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV 文件中没有 data 块")
+        chunk_id, size = header[:4], int.from_bytes(header[4:], "little")
+        if chunk_id == b"data":
+            return f.tell()
+        f.seek(size + size % 2, 1)
+
+
+def segment_view(audio, start_time, end_time, sr=SAMPLE_RATE):
+    """按采样点偏移返回片段的零拷贝视图"""
+    start = min(max(int(start_time * sr), 0), len(audio))
+    end = min(max(int(end_time * sr), start), len(audio))
+    return audio[start:end]
+
+
+def stream_audio(audio_path, block_seconds=BLOCK_SECONDS, sr=SAMPLE_RATE):
+    """流式解码：从 ffmpeg 管道逐块产出单声道 float32 数组，每块 block_seconds 秒（最后一块可能更短）
+
+    任何时刻只有一块 PCM 数据在内存中，与文件时长无关。生成器提前关闭时结束 ffmpeg 进程。
+    """
+    process = _open_ffmpeg(audio_path, sr)
+    if process is None:
+        # 没有 ffmpeg 时只能整段解码再切块，内存不受限
+        audio = decode_audio(audio_path, sr)
+        block = int(block_seconds * sr)
+        for start in range(0, len(audio), block):
+            yield audio[start:start + block]
+        return
+
+    block_bytes = int(block_seconds * sr) * 4
+    try:
+        while True:
+            # 缓冲读取在凑满 block_bytes 或管道关闭前不会返回，因此只有最后一块可能不足
+            chunk = process.stdout.read(block_bytes)
+            # 管道末尾可能有不足一个采样点的残余字节
+            chunk = chunk[:len(chunk) - len(chunk) % 4]
+            if not chunk:
+                break
+            yield np.frombuffer(bytearray(chunk), dtype=np.float32)
+        _check_exit(process)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+class PcmWindow:
+    """流式处理用的滑动窗口：按需从块迭代器读取，只保留 [start, end) 范围内的采样点
+
+    位置都是从音频开头算起的绝对采样点下标。discard 之前的数据被丢弃，
+    窗口的内存占用取决于调用方一次需要的最大范围，与音频总时长无关。
+    """
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        # buffer[0] 对应的绝对采样点下标，以及 buffer 中有效数据的长度
+        self.start = 0
+        self.length = 0
+        self.exhausted = False
+
+    @property
+    def end(self):
+        return self.start + self.length
+
+    def fill(self, until):
+        """读取数据直到窗口覆盖 until 之前的采样点或音频结束，返回是否已覆盖"""
+        while self.end < until and not self.exhausted:
+            block = next(self.blocks, None)
+            if block is None:
+                self.exhausted = True
+                break
+            needed = self.length + len(block)
+            if needed > len(self.buffer):
+                grown = np.empty(max(needed, len(self.buffer) * 3 // 2), dtype=np.float32)
+                grown[:self.length] = self.buffer[:self.length]
+                self.buffer = grown
+            self.buffer[self.length:needed] = block
+            self.length = needed
+        return self.end >= until
+
+    def view(self, begin, end):
+        """绝对下标 [begin, end) 的视图（截断到窗口范围内），下一次 fill 或 discard 后失效"""
+        begin = min(max(begin, self.start), self.end)
+        end = min(max(end, begin), self.end)
+        return self.buffer[begin - self.start:end - self.start]
+
+    def discard(self, before):
+        """丢弃绝对下标 before 之前的数据，剩余数据移到缓冲区开头"""
+        drop = min(max(before - self.start, 0), self.length)
+        if drop:
+            self.buffer[:self.length - drop] = self.buffer[drop:self.length]
+            self.start += drop
+            self.length -= drop
@@ -0,0 +1,173 @@
+import numpy as np
+from audio_io import SAMPLE_RATE, PcmWindow
+
+# 与 librosa 各特征函数的默认参数保持一致
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+TOP_DB = 80.0
+# 每次计算 STFT 覆盖的最长时长（秒），限制整段录音频谱矩阵的内存占用，
+# 同时也是并行提取时的任务粒度
+BLOCK_SECONDS = 60
+
+# 特征矩阵的列顺序；末尾的 MFCC 逐帧标准差（二阶统计量）用于说话人声纹，不参与聚类
+FEATURE_NAMES = [f"mfcc_{i}" for i in range(N_MFCC)] + [
+    "pitch", "spectral_centroid", "rms_energy", "zero_crossing_rate"
+] + [f"mfcc_std_{i}" for i in range(N_MFCC)]
+# 聚类使用的列：MFCC 均值 + 音高 + 频谱质心（与原逐片段实现一致）
+CLUSTER_FEATURE_COUNT = N_MFCC + 2
+
+
+def segment_sample_ranges(starts, ends, n_samples, sr=SAMPLE_RATE):
+    """把片段的起止时间换算为采样点下标（与 audio_io.segment_view 一致）"""
+    starts = np.clip((np.asarray(starts, dtype=np.float64) * sr).astype(np.int64), 0, n_samples)
+    ends = np.clip((np.asarray(ends, dtype=np.float64) * sr).astype(np.int64), starts, n_samples)
+    return starts, ends
+
+
+def group_segments(starts, ends, max_span):
+    """按覆盖范围把相邻片段分组，每组的跨度不超过 max_span 个采样点"""
+    groups = []
+    begin = 0
+    low, high = starts[0], ends[0]
+    for i in range(1, len(starts)):
+        new_low = min(low, starts[i])
+        new_high = max(high, ends[i])
+        if new_high - new_low > max_span:
+            groups.append((begin, i))
+            begin = i
+            low, high = starts[i], ends[i]
+        else:
+            low, high = new_low, new_high
+    groups.append((begin, len(starts)))
+    return groups
+
+
+def compute_block_features(y, starts, ends, sr):
+    """在一个音频块上计算一次 STFT，再按帧区间归约出各片段的特征"""
+    import librosa
+    import scipy.fft
+    n_segments = len(starts)
+    if len(y) == 0:
+        return np.zeros((n_segments, len(FEATURE_NAMES)))
+
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    n_frames = S.shape[1]
+
+    # 逐片段计算时，长度为 n 的片段有 1 + n // hop 帧（center=True）
+    first = np.minimum(np.rint(starts / HOP_LENGTH).astype(np.int64), n_frames - 1)
+    last = np.minimum(first + 1 + (ends - starts) // HOP_LENGTH, n_frames)
+    counts = last - first
+
+    # 把所有片段的帧下标拼接成一维索引，片段可以相互重叠
+    offsets = np.cumsum(counts) - counts
+    frame_index = np.repeat(first - offsets, counts) + np.arange(counts.sum())
+
+    def segment_mean(frame_values):
+        return np.add.reduceat(frame_values[..., frame_index], offsets, axis=-1) / counts
+
+    # 音高：piptrack 的幅度矩阵只在频谱峰值处非零，且峰值受 fmin/fmax 限制远少于半数频点，
+    # 因此每个片段的幅度中位数恒为 0，"大于中位数" 等价于 "大于 0"
+    pitches, magnitudes = librosa.piptrack(S=S, sr=sr)
+    voiced = magnitudes > 0
+    pitch_sum = np.add.reduceat(np.where(voiced, pitches, 0).sum(axis=0)[frame_index], offsets)
+    pitch_count = np.add.reduceat(voiced.sum(axis=0)[frame_index], offsets)
+    pitch = np.divide(pitch_sum, pitch_count, out=np.zeros(n_segments), where=pitch_count > 0)
+
+    centroid = segment_mean(librosa.feature.spectral_centroid(S=S, sr=sr)[0])
+    rms = segment_mean(librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0])
+    zcr = segment_mean(librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0])
+
+    # MFCC：power_to_db 的 top_db 截断以各片段自身的最大值为参考；
+    # DCT 是线性变换，所以先对对数梅尔谱求均值再做 DCT，结果与逐帧 DCT 后求均值相同
+    log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr), top_db=None)
+    gathered = log_mel[:, frame_index]
+    segment_max = np.maximum.reduceat(gathered.max(axis=0), offsets)
+    floor = np.repeat(segment_max - TOP_DB, counts)
+    floored = np.maximum(gathered, floor)
+    mean_log_mel = np.add.reduceat(floored, offsets, axis=1) / counts
+    mfccs = scipy.fft.dct(mean_log_mel, axis=0, type=2, norm="ortho")[:N_MFCC]
+
+    # 标准差需要逐帧的 MFCC：E[x²] - E[x]²
+    frame_mfccs = scipy.fft.dct(floored, axis=0, type=2, norm="ortho")[:N_MFCC]
+    mfcc_square_mean = np.add.reduceat(frame_mfccs ** 2, offsets, axis=1) / counts
+    mfcc_std = np.sqrt(np.maximum(mfcc_square_mean - mfccs ** 2, 0))
+
+    return np.column_stack([mfccs.T, pitch, centroid, rms, zcr, mfcc_std.T])
+
+
+def extract_batch_features(audio, starts, ends, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS, progress=None):
+    """一次性提取所有片段的特征
+
+    返回 (片段数 × 特征数) 的矩阵，列顺序见 FEATURE_NAMES。
+    progress 为可选回调，每处理完一组片段调用一次，参数为该组的片段数。
+    """
+    n_segments = len(starts)
+    features = np.zeros((n_segments, len(FEATURE_NAMES)))
+    if n_segments == 0:
+        return features
+
+    sample_starts, sample_ends = segment_sample_ranges(starts, ends, len(audio), sr)
+    for begin, end in group_segments(sample_starts, sample_ends, int(block_seconds * sr)):
+        block_start = sample_starts[begin:end].min()
+        block_end = sample_ends[begin:end].max()
+        features[begin:end] = compute_block_features(
+            audio[block_start:block_end],
+            sample_starts[begin:end] - block_start,
+            sample_ends[begin:end] - block_start,
+            sr
+        )
+        if progress is not None:
+            progress(end - begin)
+
+    return features
+
+
+def iter_stream_groups(blocks, starts, ends, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    """流式分组：从 PCM 块迭代器中逐组取出片段所需的音频
+
+    产出 (begin, end, 音频块, 组内相对起点, 组内相对终点)，音频块是独立的副本。
+    分组方式与 extract_batch_features 相同；窗口只保留尚未处理的组还会用到的数据，
+    片段按起点排序（转录结果即是如此）时内存占用约为一个组的跨度（不超过 block_seconds 秒）。
+    """
+    if len(starts) == 0:
+        return
+    # 音频总长度事先未知，先不截断，取数据时再截断到实际长度
+    sample_starts, sample_ends = segment_sample_ranges(starts, ends, np.iinfo(np.int64).max // 2, sr)
+    groups = group_segments(sample_starts, sample_ends, int(block_seconds * sr))
+    group_starts = np.array([sample_starts[begin:end].min() for begin, end in groups])
+    # 每组之后所有组的最早起点，早于它的数据不会再用到
+    keep_from = np.minimum.accumulate(group_starts[::-1])[::-1]
+
+    window = PcmWindow(blocks)
+    index = 0
+    while index < len(groups):
+        begin, end = groups[index]
+        if not window.fill(sample_ends[begin:end].max()):
+            # 音频比片段短：与整段提取一样把剩余片段截断到音频末尾，再重新分组
+            sample_starts[begin:] = np.minimum(sample_starts[begin:], window.end)
+            sample_ends[begin:] = np.clip(sample_ends[begin:], sample_starts[begin:], window.end)
+            groups = groups[:index] + [
+                (begin + low, begin + high)
+                for low, high in group_segments(sample_starts[begin:], sample_ends[begin:], int(block_seconds * sr))
+            ]
+            group_starts = np.array([sample_starts[low:high].min() for low, high in groups])
+            keep_from = np.minimum.accumulate(group_starts[::-1])[::-1]
+            begin, end = groups[index]
+        block_start = sample_starts[begin:end].min()
+        block_end = sample_ends[begin:end].max()
+        y = window.view(block_start, block_end).copy()
+        yield begin, end, y, sample_starts[begin:end] - block_start, sample_ends[begin:end] - block_start
+        index += 1
+        if index < len(groups):
+            window.discard(keep_from[index])
+
+
+def extract_streaming_features(blocks, starts, ends, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS, progress=None):
+    """与 extract_batch_features 相同，但音频来自 PCM 块迭代器（见 audio_io.stream_audio），不需要整段音频"""
+    features = np.zeros((len(starts), len(FEATURE_NAMES)))
+    for begin, end, y, group_starts, group_ends in iter_stream_groups(blocks, starts, ends, sr, block_seconds):
+        features[begin:end] = compute_block_features(y, group_starts, group_ends, sr)
+        if progress is not None:
+            progress(end - begin)
+    return features
@@ -0,0 +1,319 @@
+"""批量转录：处理一个目录或清单文件中的所有音频
+
+用法: python batch_transcribe.py 目录或清单.txt [说话人数量] [模型大小] [--whisper-workers N] ...
+
+三个阶段通过有界队列串联，各自在独立线程中运行，彼此重叠:
+1. 解码（ffmpeg 子进程）
+2. Whisper 转录（每个线程加载并复用自己的模型）
+3. 说话人识别（特征提取 + 聚类）
+队列长度限制了同时驻留内存的已解码音频数量。
+
+每个文件完成后把状态和各阶段耗时写入状态文件，中断后重新运行同一命令会跳过已完成的文件。
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import tempfile
+from pathlib import Path
+from audio_io import decode_audio, SAMPLE_RATE
+from whisper_transcriber import WhisperTranscriber
+from speaker_recognizer import SpeakerRecognizer, result_path
+from speaker_clustering import CLUSTERING_BACKENDS
+from transcribe import parse_num_speakers
+from decoding_profiles import DECODING_PROFILES, DEFAULT_PROFILE, cache_options as profile_cache_options
+from speaker_profiles import SpeakerProfileStore, DEFAULT_PROFILE_PATH
+from transcript_search import TranscriptIndex, DEFAULT_SEARCH_INDEX_PATH
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
+
+# 目录模式下识别的音频扩展名
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg"}
+# 解码后等待转录的音频数量上限
+DEFAULT_QUEUE_SIZE = 2
+
+# 队列结束标记
+_DONE = None
+
+
+def collect_audio_files(source):
+    """目录：递归查找音频文件；文件：每行一个路径的清单（# 开头为注释，相对路径相对于清单所在目录）"""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(
+            str(path) for path in source.rglob("*")
+            if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS
+        )
+
+    files = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = Path(line)
+            if not path.is_absolute():
+                path = source.parent / path
+            files.append(str(path))
+    return files
+
+
+def default_status_path(source):
+    source = Path(source)
+    if source.is_dir():
+        return str(source / "batch_status.json")
+    return str(source.with_name(f"{source.stem}_status.json"))
+
+
+class BatchStatus:
+    """批量任务的状态文件，每次更新都原子写入，进程崩溃后可以据此续跑"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.files = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def is_done(self, audio_path):
+        """已完成、结果文件还在、音频文件未被修改过"""
+        entry = self.files.get(os.path.abspath(audio_path))
+        if not entry or entry.get("status") != "done":
+            return False
+        stat = os.stat(audio_path)
+        return (
+            entry.get("size") == stat.st_size
+            and entry.get("mtime") == stat.st_mtime_ns
+            and os.path.exists(result_path(audio_path))
+        )
+
+    def update(self, audio_path, **fields):
+        with self.lock:
+            key = os.path.abspath(audio_path)
+            entry = self.files.setdefault(key, {})
+            entry.update(fields)
+            self._save()
+            return dict(entry)
+
+    def _save(self):
+        data = json.dumps({"updatedAt": time.time(), "files": self.files}, ensure_ascii=False, indent=2)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp_")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+
+def run_batch(files, status, num_speakers=2, model_size="small", whisper_workers=1, speaker_workers=1,
+              queue_size=DEFAULT_QUEUE_SIZE, cache=None, clustering="auto", feature_workers=1,
+              decoding_profile=DEFAULT_PROFILE, speaker_profiles=None, streaming=False, audio_index=True,
+              search_index=None):
+    """运行批量任务，返回本次处理的文件的状态列表
+
+    streaming 为 True 时解码阶段不预先解码，转录和说话人识别各自流式解码，
+    队列中不保留整段音频，每个任务的内存占用与录音时长无关。
+    audio_index 为 True 时在每个结果旁边写入波形索引。
+    传入 search_index（TranscriptIndex）时每个任务完成后立即写入全文索引，各识别线程共用同一个索引。
+    """
+    pending = [path for path in files if not status.is_done(path)]
+    skipped = len(files) - len(pending)
+    if skipped:
+        print(f"跳过已完成的文件: {skipped} 个")
+    print(f"待处理文件: {len(pending)} 个")
+
+    decoded = queue.Queue(maxsize=queue_size)
+    transcribed = queue.Queue(maxsize=queue_size)
+    # 流式转录按静音分块，与整段转录的结果不同
+    cache_options = profile_cache_options(decoding_profile, chunked=streaming)
+    results = []
+    results_lock = threading.Lock()
+
+    def fail(job, error):
+        print(f"处理失败 {job['path']}: {error}")
+        entry = status.update(job["path"], status="failed", error=str(error), timings=job["timings"])
+        with results_lock:
+            results.append(dict(entry, path=job["path"]))
+
+    def decode_stage():
+        """解码阶段：转录结果有缓存时不解码，留给说话人识别按需处理"""
+        for path in pending:
+            job = {"path": path, "timings": {}, "started": time.perf_counter(), "audio": None, "segments": None}
+            try:
+                stat = os.stat(path)
+                status.update(path, status="running", error=None, size=stat.st_size, mtime=stat.st_mtime_ns)
+                if cache is not None:
+                    job["segments"] = cache.get_segments(path, model_size, cache_options)
+                if job["segments"] is None and not streaming:
+                    start = time.perf_counter()
+                    job["audio"] = decode_audio(path)
+                    job["timings"]["decode"] = time.perf_counter() - start
+                    print(f"解码完成 {path}: {len(job['audio']) / SAMPLE_RATE:.1f} 秒")
+            except Exception as e:
+                fail(job, e)
+                continue
+            decoded.put(job)
+        for _ in range(whisper_workers):
+            decoded.put(_DONE)
+
+    def whisper_stage():
+        """转录阶段：每个线程一个 WhisperTranscriber，模型只加载一次"""
+        transcriber = WhisperTranscriber(profile=decoding_profile)
+        load_error = None
+        try:
+            transcriber.load_model(model_size)
+        except Exception as e:
+            # 模型加载失败时继续消费队列并把任务标记为失败，避免解码阶段阻塞
+            load_error = e
+        while True:
+            job = decoded.get()
+            if job is _DONE:
+                break
+            try:
+                if load_error is not None:
+                    raise RuntimeError(f"模型加载失败: {load_error}")
+                if job["segments"] is None:
+                    start = time.perf_counter()
+                    if streaming:
+                        # 只用本线程已加载的模型逐块转录
+                        segments = transcriber.transcribe_stream(job["path"], model_size, num_workers=1)
+                    else:
+                        segments = transcriber.transcribe(job["path"], model_size, audio=job["audio"])
+                    job["timings"]["transcribe"] = time.perf_counter() - start
+                    job["segments"] = [
+                        {"text": segment["text"], "start": segment["start"], "end": segment["end"]}
+                        for segment in segments
+                    ]
+                    if cache is not None and job["segments"]:
+                        cache.put_segments(job["path"], model_size, cache_options, job["segments"])
+                if not job["segments"]:
+                    raise RuntimeError("未转录出任何片段")
+            except Exception as e:
+                fail(job, e)
+                continue
+            transcribed.put(job)
+
+    def speaker_stage():
+        """说话人识别阶段：复用解码阶段的音频，完成后释放"""
+        recognizer = SpeakerRecognizer(
+            num_workers=feature_workers, cache=cache, clustering=clustering, profiles=speaker_profiles,
+            streaming=streaming, audio_index=audio_index, search_index=search_index
+        )
+        while True:
+            job = transcribed.get()
+            if job is _DONE:
+                break
+            try:
+                start = time.perf_counter()
+                result = recognizer.recognize_speakers(job["path"], job["segments"], num_speakers, audio=job["audio"])
+                job["audio"] = None
+                job["timings"]["speakers"] = time.perf_counter() - start
+                job["timings"]["total"] = time.perf_counter() - job["started"]
+                entry = status.update(
+                    job["path"],
+                    status="done",
+                    timings=job["timings"],
+                    segments=len(job["segments"]),
+                    speakers=result["speakerEstimate"]["numSpeakers"],
+                    resultPath=result_path(job["path"]),
+                    finishedAt=time.time()
+                )
+                with results_lock:
+                    results.append(dict(entry, path=job["path"]))
+                print(f"完成 {job['path']}: {job['timings']['total']:.1f} 秒")
+            except Exception as e:
+                fail(job, e)
+
+    whisper_threads = [threading.Thread(target=whisper_stage, daemon=True) for _ in range(whisper_workers)]
+    speaker_threads = [threading.Thread(target=speaker_stage, daemon=True) for _ in range(speaker_workers)]
+    decode_thread = threading.Thread(target=decode_stage, daemon=True)
+    for thread in [decode_thread] + whisper_threads + speaker_threads:
+        thread.start()
+
+    decode_thread.join()
+    for thread in whisper_threads:
+        thread.join()
+    for _ in range(speaker_workers):
+        transcribed.put(_DONE)
+    for thread in speaker_threads:
+        thread.join()
+
+    return results
+
+
+def print_summary(results, elapsed):
+    done = [entry for entry in results if entry["status"] == "done"]
+    failed = [entry for entry in results if entry["status"] == "failed"]
+    print(f"\n批量处理完成: 成功 {len(done)} 个, 失败 {len(failed)} 个, 总耗时 {elapsed:.1f} 秒")
+    for entry in results:
+        timings = entry.get("timings") or {}
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items())
+        message = entry.get("error") if entry["status"] == "failed" else stages
+        print(f"  [{entry['status']}] {Path(entry['path']).name}: {message}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量音频转录和说话人识别")
+    parser.add_argument("source", help="音频目录，或每行一个音频路径的清单文件")
+    parser.add_argument("num_speakers", nargs="?", type=parse_num_speakers, default=2, help="说话人数量，0 或 auto 表示自动估计")
+    parser.add_argument("model_size", nargs="?", default="small", help="Whisper 模型大小")
+    parser.add_argument("--status", default=None, help="状态文件路径，默认放在目录内或清单旁边")
+    parser.add_argument("--whisper-workers", type=int, default=1, help="转录线程数，每个线程加载一份模型")
+    parser.add_argument("--speaker-workers", type=int, default=1, help="说话人识别线程数")
+    parser.add_argument("--feature-workers", type=int, default=1, help="每个说话人识别任务的特征提取进程数，0 表示全部 CPU 核心")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="已解码待转录的音频数量上限")
+    parser.add_argument("--clustering", choices=["auto"] + list(CLUSTERING_BACKENDS), default="auto",
+                        help="聚类方法，auto 在片段很多时改用 mini-batch k-means")
+    parser.add_argument("--decoding-profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE,
+                        help="解码档位：fast（贪心解码 + CPU 上 int8 量化）、balanced（贪心解码）、accurate（beam search）")
+    parser.add_argument("--speaker-profiles", nargs="?", const=DEFAULT_PROFILE_PATH, default=None, metavar="PATH",
+                        help="用声纹库识别已知说话人，省略 PATH 时使用默认声纹库")
+    parser.add_argument("--streaming", action="store_true",
+                        help="流式解码，不在队列中保留整段音频（适合数小时的录音）")
+    parser.add_argument("--no-audio-index", action="store_true", help="不在结果旁边写入波形峰值索引")
+    parser.add_argument("--search-index", nargs="?", const=DEFAULT_SEARCH_INDEX_PATH, default=None, metavar="PATH",
+                        help="把识别结果写入全文索引，省略 PATH 时使用默认索引")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="缓存大小上限 (MB)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用缓存")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    files = collect_audio_files(args.source)
+    if not files:
+        print(f"没有找到音频文件: {args.source}")
+        sys.exit(1)
+
+    status = BatchStatus(args.status or default_status_path(args.source))
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+
+    start = time.perf_counter()
+    results = run_batch(
+        files,
+        status,
+        args.num_speakers,
+        args.model_size,
+        whisper_workers=max(1, args.whisper_workers),
+        speaker_workers=max(1, args.speaker_workers),
+        queue_size=max(1, args.queue_size),
+        cache=cache,
+        clustering=args.clustering,
+        feature_workers=args.feature_workers,
+        decoding_profile=args.decoding_profile,
+        speaker_profiles=SpeakerProfileStore(args.speaker_profiles) if args.speaker_profiles else None,
+        streaming=args.streaming,
+        audio_index=not args.no_audio_index,
+        search_index=TranscriptIndex(args.search_index) if args.search_index else None
+    )
+    print_summary(results, time.perf_counter() - start)
+    print(f"状态文件: {status.path}")
+    if any(entry["status"] == "failed" for entry in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
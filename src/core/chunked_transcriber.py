@@ -0,0 +1,247 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import numpy as np
+from audio_io import SAMPLE_RATE, PcmWindow
+
+# 每个分块的目标时长（秒）
+CHUNK_SECONDS = 120
+# 在目标切分点前后多少秒内寻找最安静的位置
+SEARCH_SECONDS = 10
+# 分块向两侧多转录的重叠时长（秒），拼接时按片段中点去重
+OVERLAP_SECONDS = 1.0
+# VAD 的能量帧长和平滑窗口（秒）
+FRAME_SECONDS = 0.03
+SMOOTH_SECONDS = 0.3
+
+# 子进程中加载的模型
+_worker_model = None
+_worker_options = None
+
+
+def frame_energy_db(audio, sr=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """按帧计算能量（dB），分块计算避免对长录音生成整段的临时数组"""
+    frame = max(1, int(frame_seconds * sr))
+    n_frames = len(audio) // frame
+    energy = np.empty(n_frames, dtype=np.float64)
+    frames_per_block = max(1, (60 * sr) // frame)
+    for begin in range(0, n_frames, frames_per_block):
+        end = min(begin + frames_per_block, n_frames)
+        block = np.asarray(audio[begin * frame:end * frame], dtype=np.float32).reshape(end - begin, frame)
+        energy[begin:end] = np.mean(block ** 2, axis=1)
+    return 10 * np.log10(energy + 1e-10)
+
+
+def find_split_points(audio, sr=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, search_seconds=SEARCH_SECONDS):
+    """基于能量的 VAD：在每个目标切分点附近找平滑能量最低（最安静）的位置
+
+    返回切分时间点列表（秒）。
+    """
+    duration = len(audio) / sr
+    if duration <= chunk_seconds * 1.5:
+        return []
+
+    energy = smooth_energy(frame_energy_db(audio, sr))
+
+    splits = []
+    target = chunk_seconds
+    # 剩余不足半个分块时不再切分，避免出现过短的尾块
+    while target < duration - chunk_seconds / 2:
+        low, high = search_frames(target, duration, search_seconds)
+        splits.append(quietest_split(energy[low:high], low))
+        target = splits[-1] + chunk_seconds
+    return splits
+
+
+def smooth_energy(energy):
+    smooth = max(1, int(SMOOTH_SECONDS / FRAME_SECONDS))
+    return np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+
+
+def search_frames(target, duration, search_seconds=SEARCH_SECONDS):
+    """目标切分点前后的搜索范围（能量帧下标）"""
+    low = int(max(target - search_seconds, 0) / FRAME_SECONDS)
+    high = int(min(target + search_seconds, duration) / FRAME_SECONDS)
+    return low, high
+
+
+def quietest_split(energy, first_frame):
+    """平滑能量最低的帧的中点（秒），first_frame 为 energy[0] 的帧下标"""
+    return (first_frame + int(np.argmin(energy)) + 0.5) * FRAME_SECONDS
+
+
+def iter_stream_chunks(blocks, chunk_seconds=CHUNK_SECONDS, overlap_seconds=OVERLAP_SECONDS,
+                       search_seconds=SEARCH_SECONDS, sr=SAMPLE_RATE):
+    """流式切分：从 PCM 块迭代器中边读边找切分点，逐个产出 (分块, 分块音频)
+
+    分块格式与 plan_chunks 相同，切分点与对整段音频调用 find_split_points 的结果一致。
+    窗口最多保留约 1.5 个分块加一个 PCM 块的音频，与音频总时长无关。
+    """
+    window = PcmWindow(blocks)
+    frame = max(1, int(FRAME_SECONDS * sr))
+    # 平滑窗口两侧各多取的帧数，使搜索范围内的平滑结果与整段计算相同
+    margin = max(1, int(SMOOTH_SECONDS / FRAME_SECONDS))
+    core_start = 0.0
+    target = chunk_seconds
+    while True:
+        # 能判断 target < duration - chunk_seconds / 2 且覆盖搜索范围时才切分
+        low, high = search_frames(target, float("inf"), search_seconds)
+        needed = max(int((target + chunk_seconds / 2) * sr) + 1, (high + margin) * frame)
+        if not window.fill(needed):
+            break
+        begin = max(low - margin, 0)
+        energy = smooth_energy(frame_energy_db(window.view(begin * frame, (high + margin) * frame), sr))
+        split = quietest_split(energy[low - begin:high - begin], low)
+
+        chunk = (core_start, split, max(core_start - overlap_seconds, 0.0), split + overlap_seconds)
+        yield chunk, window.view(int(chunk[2] * sr), int(chunk[3] * sr)).copy()
+        window.discard(int(max(split - overlap_seconds, 0.0) * sr))
+        core_start = split
+        target = split + chunk_seconds
+
+    duration = window.end / sr
+    chunk = (core_start, duration, max(core_start - overlap_seconds, 0.0), duration)
+    yield chunk, window.view(int(chunk[2] * sr), int(chunk[3] * sr)).copy()
+
+
+def plan_chunks(duration, splits, overlap_seconds=OVERLAP_SECONDS):
+    """根据切分点生成分块：(核心起点, 核心终点, 转录起点, 转录终点)，单位秒"""
+    bounds = [0.0] + list(splits) + [duration]
+    chunks = []
+    for core_start, core_end in zip(bounds[:-1], bounds[1:]):
+        chunks.append((
+            core_start,
+            core_end,
+            max(core_start - overlap_seconds, 0.0),
+            min(core_end + overlap_seconds, duration)
+        ))
+    return chunks
+
+
+def stitch_segments(chunk_results, chunks):
+    """拼接各分块的片段：时间戳加上分块偏移，重叠区的片段只保留中点落在核心区间内的那一份"""
+    stitched = []
+    for index, segments in chunk_results:
+        core_start, core_end, offset, _ = chunks[index]
+        is_last = index == len(chunks) - 1
+        for segment in segments:
+            start = segment["start"] + offset
+            end = segment["end"] + offset
+            middle = (start + end) / 2
+            if middle < core_start or (middle >= core_end and not is_last):
+                continue
+            segment = dict(segment, start=start, end=end)
+            stitched.append(segment)
+
+    stitched.sort(key=lambda segment: segment["start"])
+    for i, segment in enumerate(stitched):
+        segment["id"] = i
+    return stitched
+
+
+def _init_worker(model_size, decode_options, num_threads, profile):
+    """子进程初始化：每个进程按解码档位加载自己的模型实例"""
+    global _worker_model, _worker_options
+    import torch
+    from decoding_profiles import load_model
+    torch.set_num_threads(num_threads)
+    _worker_model = load_model(model_size, profile)
+    # 子进程不逐句打印，避免多个进程的输出交错
+    _worker_options = dict(decode_options, verbose=None)
+
+
+def _transcribe_chunk(index, chunk_audio):
+    result = _worker_model.transcribe(chunk_audio, **_worker_options)
+    return index, result["segments"]
+
+
+def transcribe_chunked(audio, model_size, decode_options, num_workers=None, chunk_seconds=CHUNK_SECONDS,
+                       overlap_seconds=OVERLAP_SECONDS, sr=SAMPLE_RATE, model=None, profile=None):
+    """把音频在静音处切分，用多个进程并行转录后拼接
+
+    音频不足以切分时，如果传入了已加载的 model 就直接在当前进程转录。
+    profile 为解码档位，决定子进程是否加载量化模型（decode_options 应与之对应）。
+    """
+    duration = len(audio) / sr
+    chunks = plan_chunks(duration, find_split_points(audio, sr, chunk_seconds), overlap_seconds)
+    if len(chunks) == 1 and model is not None:
+        return model.transcribe(np.asarray(audio, dtype=np.float32), **decode_options)["segments"]
+
+    num_workers = min(num_workers or os.cpu_count() or 1, len(chunks))
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    print(f"分块转录: {len(chunks)} 个分块, {num_workers} 个进程, 每进程 {num_threads} 线程")
+
+    chunk_results = []
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(model_size, decode_options, num_threads, profile)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _transcribe_chunk,
+                index,
+                np.ascontiguousarray(audio[int(start * sr):int(end * sr)], dtype=np.float32)
+            )
+            for index, (_, _, start, end) in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            index, segments = future.result()
+            chunk_results.append((index, segments))
+            print(f"分块 {index + 1}/{len(chunks)} 转录完成")
+
+    return stitch_segments(chunk_results, chunks)
+
+
+def transcribe_chunked_stream(blocks, model_size, decode_options, num_workers=None, chunk_seconds=CHUNK_SECONDS,
+                              overlap_seconds=OVERLAP_SECONDS, sr=SAMPLE_RATE, model=None, profile=None):
+    """流式分块转录：音频来自 PCM 块迭代器（见 audio_io.stream_audio），边解码边切分边转录
+
+    分块方式与 transcribe_chunked 相同。同时在途的分块不超过进程数加一，内存占用与音频总时长无关。
+    只有一个分块或只用一个进程且传入了已加载的 model 时，直接在当前进程逐块转录。
+    """
+    chunks = []
+    chunk_results = []
+    stream = iter_stream_chunks(blocks, chunk_seconds, overlap_seconds, sr=sr)
+    first = next(stream)
+    second = next(stream, None)
+    num_workers = num_workers or os.cpu_count() or 1
+    inline = model is not None and (second is None or num_workers == 1)
+
+    def all_chunks():
+        yield first
+        if second is not None:
+            yield second
+            yield from stream
+
+    def collect(done):
+        for future in done:
+            index, segments = future.result()
+            chunk_results.append((index, segments))
+            print(f"分块 {index + 1} 转录完成")
+
+    if inline:
+        print("流式分块转录: 当前进程逐块转录")
+        for index, (chunk, chunk_audio) in enumerate(all_chunks()):
+            chunks.append(chunk)
+            chunk_results.append((index, model.transcribe(chunk_audio, **decode_options)["segments"]))
+            print(f"分块 {index + 1} 转录完成")
+        return stitch_segments(chunk_results, chunks)
+
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    print(f"流式分块转录: {num_workers} 个进程, 每进程 {num_threads} 线程")
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(model_size, decode_options, num_threads, profile)
+    ) as executor:
+        pending = set()
+        for index, (chunk, chunk_audio) in enumerate(all_chunks()):
+            chunks.append(chunk)
+            if len(pending) > num_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(_transcribe_chunk, index, chunk_audio))
+        collect(as_completed(pending))
+
+    print(f"共 {len(chunks)} 个分块")
+    return stitch_segments(chunk_results, chunks)
@@ -0,0 +1,80 @@
+# torch 和 whisper 导入很慢（数秒），只在真正需要量化或加载模型时才在函数内导入
+
+# 所有档位共用的解码参数
+BASE_DECODE_OPTIONS = {
+    "language": "zh",
+    "task": "transcribe",
+    "fp16": False,
+    "verbose": True,
+    "beam_size": 5,
+    "best_of": 5,
+    "temperature": 0.0,
+    "condition_on_previous_text": True,
+    "initial_prompt": "这是一段多人对话的中文音频。"
+}
+
+# 解码速度档位：options 覆盖 BASE_DECODE_OPTIONS，quantize 表示在 CPU 上对线性层做 int8 动态量化
+# beam search 每一步要解码 beam_size 条候选，贪心解码只解码一条，速度相差数倍
+DECODING_PROFILES = {
+    "fast": {"options": {"beam_size": None, "best_of": None}, "quantize": True},
+    "balanced": {"options": {"beam_size": None, "best_of": None}, "quantize": False},
+    "accurate": {"options": {}, "quantize": False}
+}
+# 默认档位与原来写死的 beam_size=5 一致
+DEFAULT_PROFILE = "accurate"
+
+
+def resolve_profile(profile):
+    profile = profile or DEFAULT_PROFILE
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"未知的解码档位: {profile}")
+    return profile
+
+
+def decode_options_for(profile):
+    """某个档位传给 model.transcribe 的完整解码参数"""
+    return dict(BASE_DECODE_OPTIONS, **DECODING_PROFILES[resolve_profile(profile)]["options"])
+
+
+def uses_quantization(profile):
+    """量化只在 CPU 上生效（PyTorch 的动态量化算子只有 CPU 实现）"""
+    if not DECODING_PROFILES[resolve_profile(profile)]["quantize"]:
+        return False
+    import torch
+    return not torch.cuda.is_available()
+
+
+def cache_options(profile, chunked=False):
+    """转录结果缓存键使用的参数：解码参数 + 是否分块 + 是否量化（量化的结果与未量化不同）"""
+    options = dict(decode_options_for(profile), chunked=bool(chunked))
+    if uses_quantization(profile):
+        # 只在量化时加入，未量化档位的缓存键与之前保持一致
+        options["quantized"] = True
+    return options
+
+
+def quantize_model(model):
+    """把模型中的线性层替换为 int8 动态量化版本（权重 int8，激活在运行时量化）
+
+    whisper 的 Linear 是 nn.Linear 的子类，quantize_dynamic 只识别 nn.Linear 本身，
+    先换成普通的 nn.Linear 再量化。注意力的 key/value 层上的 kv-cache 钩子在每次解码时才注册，
+    替换模块不受影响。
+    """
+    import torch
+    import whisper
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, whisper.model.Linear):
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.load_state_dict(child.state_dict())
+                setattr(module, name, linear)
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_model(model_size, profile=DEFAULT_PROFILE):
+    """按档位加载模型，fast 档位在 CPU 上返回量化后的模型"""
+    import whisper
+    model = whisper.load_model(model_size)
+    if uses_quantization(profile):
+        model = quantize_model(model)
+    return model
@@ -0,0 +1,339 @@
+"""实时转录：边接收音频边转录，先输出临时片段，确认后输出最终片段和说话人
+
+用法:
+    python live_transcriber.py --replay test3min音频.MP3 [--speed 1]     # 按实时速度回放音频文件
+    python live_transcriber.py --wav 正在录制.wav                        # 跟随正在写入的 WAV 文件
+    ffmpeg -f pulse -i default -f s16le -ac 1 -ar 16000 - | python live_transcriber.py --stdin --output 会议.json
+
+每积累 --step 秒新音频，就把上次确认之后的音频（不超过 --max-window 秒的回看窗口）重新转录一遍。
+相邻两次转录开头一致的片段（不含最后一个，它可能还没说完）确认为最终片段，其余作为临时片段输出；
+最后一个片段在两次转录中一致、并且之后停顿了 ENDPOINT_SECONDS 秒时也确认；窗口超过回看上限时强制确认。
+最终片段立即提取说话人特征并分配给在线更新的说话人质心。
+输出与常驻模式相同的 EVENT: 行：provisional（临时片段，每次整体替换）、segment（最终片段，带说话人）、
+结束时输出 result（按说话人分组的结果，与文件转录的结构相同）。
+CPU 上要把延迟控制在 2 秒以内，建议使用 tiny/base 模型和 fast 档位。
+"""
+import sys
+import time
+import wave
+import queue
+import bisect
+import argparse
+import threading
+import numpy as np
+from audio_io import stream_audio, wav_data_offset, SAMPLE_RATE
+from batch_features import extract_batch_features, CLUSTER_FEATURE_COUNT
+from speaker_clustering import OnlineSpeakerAssigner, MAX_SPEAKERS
+from segment_store import SegmentStore, OUTPUT_FORMATS, speaker_name
+from text_cleanup import clean_text
+from decoding_profiles import DECODING_PROFILES
+from transcribe import emit_event
+import metrics
+
+# 音频来源每次产出的时长（秒）
+BLOCK_SECONDS = 0.25
+# 每积累多少秒新音频转录一次
+STEP_SECONDS = 1.0
+# 回看窗口上限（秒），超过后强制确认片段
+MAX_WINDOW_SECONDS = 15.0
+# 最后一个片段结束后至少有这么长（秒）没有新文字，并且两次转录一致时，认为已经说完
+ENDPOINT_SECONDS = 0.5
+# 确认片段时作为提示词的已确认文本长度（字）
+PROMPT_CHARS = 100
+PROMPT_SEGMENTS = 10
+# 实时模式默认的解码档位：beam search 每次转录耗时数倍，无法满足延迟要求
+DEFAULT_LIVE_PROFILE = "fast"
+
+
+def replay_source(audio_path, speed=1.0, block_seconds=BLOCK_SECONDS):
+    """按实时速度（speed 倍速）回放音频文件，用于离线测试"""
+    started = time.perf_counter()
+    position = 0
+    for block in stream_audio(audio_path, block_seconds):
+        position += len(block)
+        delay = started + position / SAMPLE_RATE / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield block
+
+
+def pcm_source(stream, sample_format="s16le", block_seconds=BLOCK_SECONDS):
+    """从二进制流（例如 stdin）读取 16kHz 单声道 PCM，s16le 或 f32le"""
+    dtype = np.int16 if sample_format == "s16le" else np.float32
+    block_bytes = int(block_seconds * SAMPLE_RATE) * np.dtype(dtype).itemsize
+    while True:
+        # read1 有多少返回多少，不等凑满一块，降低延迟
+        chunk = stream.read1(block_bytes) if hasattr(stream, "read1") else stream.read(block_bytes)
+        if not chunk:
+            break
+        chunk = chunk[:len(chunk) - len(chunk) % np.dtype(dtype).itemsize]
+        samples = np.frombuffer(chunk, dtype=dtype)
+        yield samples.astype(np.float32) / 32768.0 if dtype == np.int16 else samples.copy()
+
+
+def follow_wav_source(wav_path, idle_timeout=5.0, block_seconds=BLOCK_SECONDS):
+    """跟随正在写入的 16kHz 16 位 WAV 文件读取新数据，超过 idle_timeout 秒没有新数据时结束
+
+    录音软件通常在结束时才回填文件头中的长度，因此不依赖文件头里的帧数。
+    """
+    with wave.open(str(wav_path), "rb") as reader:
+        channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+    if width != 2 or rate != SAMPLE_RATE:
+        raise ValueError(f"只支持 {SAMPLE_RATE}Hz 16 位 PCM 的 WAV 文件（当前 {rate}Hz {width * 8} 位）")
+
+    with open(wav_path, "rb") as f:
+        data_offset = wav_data_offset(f)
+        f.seek(data_offset)
+        frame_bytes = 2 * channels
+        block_bytes = int(block_seconds * SAMPLE_RATE) * frame_bytes
+        pending = b""
+        idle_since = time.perf_counter()
+        while True:
+            chunk = f.read(block_bytes)
+            if not chunk:
+                if time.perf_counter() - idle_since > idle_timeout:
+                    break
+                time.sleep(block_seconds / 2)
+                continue
+            idle_since = time.perf_counter()
+            pending += chunk
+            usable = len(pending) - len(pending) % frame_bytes
+            samples = np.frombuffer(pending[:usable], dtype=np.int16).reshape(-1, channels)
+            pending = pending[usable:]
+            yield samples.mean(axis=1).astype(np.float32) / 32768.0
+
+
+class LiveTranscriber:
+    """实时转录器：在 WhisperTranscriber 已加载的模型上对滚动窗口反复转录
+
+    on_event(event, **payload) 接收 provisional 和 segment 事件。
+    max_speakers 为在线说话人分配的说话人数上限。
+    """
+
+    def __init__(self, transcriber, on_event=None, max_speakers=MAX_SPEAKERS, step_seconds=STEP_SECONDS,
+                 max_window_seconds=MAX_WINDOW_SECONDS):
+        self.transcriber = transcriber
+        self.on_event = on_event or (lambda event, **payload: None)
+        self.step = int(step_seconds * SAMPLE_RATE)
+        self.max_window = int(max_window_seconds * SAMPLE_RATE)
+        self.speakers = OnlineSpeakerAssigner(max_speakers)
+        self.store = SegmentStore()
+        self.labels = []
+        # 每个最终片段的聚类特征（在线分配使用的同一份），用于与离线聚类比较
+        self.features = []
+        # 上次确认之后的音频，offset 为 buffer[0] 的绝对采样点下标
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0
+        # 每个音频块到达时的 (块末尾的绝对采样点下标, 墙钟时间)，用于计算延迟
+        self.arrivals = []
+        self.arrival_times = []
+        self.previous = []
+        self.provisional_latencies = []
+        self.final_latencies = []
+        self.decode_seconds = []
+
+    @property
+    def received(self):
+        return self.offset + len(self.buffer)
+
+    def warmup(self):
+        """提前导入特征提取依赖（librosa 首次导入约需数秒），避免第一个最终片段的延迟"""
+        extract_batch_features(np.zeros(SAMPLE_RATE, dtype=np.float32), [0.0], [1.0])
+
+    def run(self, source):
+        """处理来源产出的所有音频块，返回最终的 SegmentStore（已设置说话人标签）"""
+        self.warmup()
+        blocks = queue.Queue()
+
+        def read():
+            try:
+                for block in source:
+                    blocks.put((block, time.perf_counter()))
+            finally:
+                blocks.put(None)
+
+        threading.Thread(target=read, name="live-source", daemon=True).start()
+        decoded_until = 0
+        finished = False
+        while not finished:
+            # 转录期间到达的块一次取完，转录总是针对最新的音频
+            item = blocks.get()
+            while True:
+                if item is None:
+                    finished = True
+                    break
+                self._receive(*item)
+                try:
+                    item = blocks.get_nowait()
+                except queue.Empty:
+                    break
+            if finished or self.received - decoded_until >= self.step:
+                self._decode(decoded_until, flush=finished)
+                decoded_until = self.received
+        self.store.set_labels(self.labels)
+        self._report()
+        return self.store
+
+    def _receive(self, block, arrived):
+        self.buffer = np.concatenate([self.buffer, np.asarray(block, dtype=np.float32)])
+        self.arrivals.append(self.received)
+        self.arrival_times.append(arrived)
+
+    def _arrival_time(self, sample):
+        """绝对采样点 sample 到达的墙钟时间"""
+        index = min(bisect.bisect_left(self.arrivals, sample), len(self.arrivals) - 1)
+        return self.arrival_times[index]
+
+    def transcribe_window(self, audio, offset_seconds):
+        """转录一个窗口，返回绝对时间的 [{"start", "end", "text"}]"""
+        # 已确认的文本作为提示词，保持用词和标点风格一致；不沿用上一次窗口的临时文本
+        prompt = "".join(self.store.texts[-PROMPT_SEGMENTS:])[-PROMPT_CHARS:]
+        prompt = prompt or self.transcriber.decode_options.get("initial_prompt")
+        options = dict(self.transcriber.decode_options, verbose=None, condition_on_previous_text=False,
+                       initial_prompt=prompt)
+        duration = len(audio) / SAMPLE_RATE
+        segments = []
+        for segment in self.transcriber.model.transcribe(audio, **options)["segments"]:
+            text = clean_text(segment["text"])
+            if text:
+                segments.append({
+                    "start": offset_seconds + min(segment["start"], duration),
+                    "end": offset_seconds + min(segment["end"], duration),
+                    "text": text
+                })
+        return segments
+
+    def _decode(self, decoded_until, flush=False):
+        if len(self.buffer) == 0:
+            return
+        started = time.perf_counter()
+        segments = self.transcribe_window(self.buffer, self.offset / SAMPLE_RATE)
+        emitted = time.perf_counter()
+        self.decode_seconds.append(emitted - started)
+        # 本次转录覆盖的新音频中最早到达的那一刻起算，界面上最久要等多久才看到文字
+        latency = emitted - self._arrival_time(max(decoded_until, self.offset) + 1)
+
+        # 与上一次转录开头一致的片段确认为最终片段，最后一个片段可能还没说完
+        agreed = 0
+        while (agreed < min(len(segments), len(self.previous))
+               and segments[agreed]["text"] == self.previous[agreed]["text"]):
+            agreed += 1
+        final_count = len(segments) if flush else max(min(agreed, len(segments) - 1), 0)
+        if (not flush and segments and agreed == len(segments)
+                and segments[-1]["end"] * SAMPLE_RATE <= self.received - ENDPOINT_SECONDS * SAMPLE_RATE):
+            # 最后一个片段之后已经停顿了一段时间，不必等下一句开始再确认
+            final_count = len(segments)
+        if not flush and len(self.buffer) > self.max_window:
+            # 窗口超过回看上限：只保留最后一个片段继续等待；最后一个片段本身过长时也确认
+            final_count = max(final_count, len(segments) - 1)
+            if final_count == 0 and segments and segments[0]["end"] * SAMPLE_RATE < self.received - self.step:
+                final_count = 1
+
+        for segment in segments[:final_count]:
+            self._finalize(segment)
+        self.previous = segments[final_count:]
+        if final_count:
+            self._trim(int(round(segments[final_count - 1]["end"] * SAMPLE_RATE)))
+        elif not segments and len(self.buffer) > self.max_window:
+            # 长时间没有语音，只保留最近一步的音频
+            self._trim(self.received - self.step)
+
+        if not flush:
+            self.provisional_latencies.append(latency)
+            self.on_event("provisional", segments=self.previous, latency=round(latency, 3))
+
+    def _finalize(self, segment):
+        start = max(int(segment["start"] * SAMPLE_RATE) - self.offset, 0)
+        end = min(int(segment["end"] * SAMPLE_RATE) - self.offset, len(self.buffer))
+        features = extract_batch_features(self.buffer, [start / SAMPLE_RATE], [max(end, start) / SAMPLE_RATE])
+        label = self.speakers.assign(features[0, :CLUSTER_FEATURE_COUNT])
+        self.features.append(features[0, :CLUSTER_FEATURE_COUNT])
+
+        index = len(self.store)
+        self.store.append(segment["start"], segment["end"], segment["text"])
+        self.labels.append(label)
+        latency = time.perf_counter() - self._arrival_time(int(segment["end"] * SAMPLE_RATE))
+        self.final_latencies.append(latency)
+        self.on_event("segment", index=index, start=segment["start"], end=segment["end"], text=segment["text"],
+                      speakerId=speaker_name(label), latency=round(latency, 3))
+
+    def _trim(self, before):
+        """丢弃绝对采样点 before 之前的音频"""
+        drop = min(max(before - self.offset, 0), len(self.buffer))
+        self.buffer = self.buffer[drop:].copy()
+        self.offset += drop
+
+    def latency_summary(self):
+        def percentiles(values):
+            if not values:
+                return None
+            p50, p95 = np.percentile(values, [50, 95])
+            return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "max": round(float(max(values)), 3)}
+        return {
+            "audioSeconds": round(self.received / SAMPLE_RATE, 2),
+            "segments": len(self.store),
+            "numSpeakers": len(self.speakers),
+            "decodes": len(self.decode_seconds),
+            "decodeSeconds": percentiles(self.decode_seconds),
+            "provisionalLatency": percentiles(self.provisional_latencies),
+            "finalLatency": percentiles(self.final_latencies)
+        }
+
+    def _report(self):
+        summary = self.latency_summary()
+        metrics.emit("live", **summary)
+        provisional = summary["provisionalLatency"] or {}
+        final = summary["finalLatency"] or {}
+        print(f"实时转录结束: {summary['audioSeconds']:.1f} 秒音频, {summary['segments']} 个片段, "
+              f"{summary['numSpeakers']} 个说话人; 临时片段延迟 p95 {provisional.get('p95', 0):.2f} 秒, "
+              f"最终片段延迟 p95 {final.get('p95', 0):.2f} 秒")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="实时转录")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="AUDIO", help="按实时速度回放音频文件（离线测试）")
+    source.add_argument("--wav", metavar="WAV", help="跟随正在写入的 16kHz 16 位 WAV 文件")
+    source.add_argument("--stdin", action="store_true", help="从 stdin 读取 16kHz 单声道 PCM")
+    parser.add_argument("--format", choices=["s16le", "f32le"], default="s16le", help="--stdin 的采样格式")
+    parser.add_argument("--speed", type=float, default=1.0, help="--replay 的回放倍速")
+    parser.add_argument("--model", default="small", help="Whisper 模型大小，CPU 上建议 tiny 或 base")
+    parser.add_argument("--decoding-profile", choices=list(DECODING_PROFILES), default=DEFAULT_LIVE_PROFILE,
+                        help="解码档位，默认 fast")
+    parser.add_argument("--max-speakers", type=int, default=MAX_SPEAKERS, help="说话人数上限")
+    parser.add_argument("--step", type=float, default=STEP_SECONDS, help="每积累多少秒新音频转录一次")
+    parser.add_argument("--max-window", type=float, default=MAX_WINDOW_SECONDS, help="回看窗口上限（秒）")
+    parser.add_argument("--idle-timeout", type=float, default=5.0, help="--wav 文件多久没有新数据时结束（秒）")
+    parser.add_argument("--output", help="结果文件路径（--stdin 时不指定则不保存）")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json", help="结果文件格式")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from whisper_transcriber import WhisperTranscriber
+    from speaker_recognizer import result_path
+
+    transcriber = WhisperTranscriber(profile=args.decoding_profile)
+    transcriber.load_model(args.model)
+    if args.replay:
+        source = replay_source(args.replay, args.speed)
+    elif args.wav:
+        source = follow_wav_source(args.wav, args.idle_timeout)
+    else:
+        source = pcm_source(sys.stdin.buffer, args.format)
+
+    live = LiveTranscriber(transcriber, emit_event, args.max_speakers, args.step, args.max_window)
+    emit_event("ready")
+    store = live.run(source)
+
+    output = args.output or (result_path(args.replay or args.wav, args.output_format) if not args.stdin else None)
+    extra = {"live": live.latency_summary()}
+    if output:
+        store.write(output, args.output_format, extra)
+        print(f"结果已保存到: {output}")
+    emit_event("result", result=dict(extra, segments=store.groups()))
+
+
+if __name__ == "__main__":
+    main()
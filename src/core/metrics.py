@@ -0,0 +1,134 @@
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，不报告内存和子进程 CPU 时间
+    resource = None
+
+# 指标输出前缀，Electron 端按该前缀识别并转发
+METRIC_PREFIX = "METRIC:"
+
+# 附加到每条指标上的字段（例如常驻模式下的任务 id）
+_context = {}
+# 自定义的指标接收函数，为空时按行打印
+_sink = None
+
+
+def set_context(**fields):
+    """设置附加到后续每条指标上的字段，不传参数时清空"""
+    _context.clear()
+    _context.update(fields)
+
+
+def set_sink(sink):
+    """替换指标的输出方式：sink(record)，传入 None 恢复为打印 METRIC: 行"""
+    global _sink
+    _sink = sink
+
+
+def peak_rss_mb():
+    """本进程的峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def cpu_seconds():
+    """本进程加上已退出子进程（ffmpeg、进程池）的 CPU 时间"""
+    total = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        total += children.ru_utime + children.ru_stime
+    return total
+
+
+def emit(name, **fields):
+    """输出一条指标"""
+    record = dict(_context, stage=name)
+    record.update(fields)
+    if _sink is not None:
+        _sink(record)
+    else:
+        print(METRIC_PREFIX + json.dumps(record, ensure_ascii=False), flush=True)
+
+
+@contextmanager
+def stage(name, **fields):
+    """记录一个阶段的墙钟时间、CPU 时间和结束时的峰值内存
+
+    yield 出的字典可以在阶段内补充字段（例如处理的片段数），阶段结束时一起输出。
+    """
+    info = dict(fields)
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    try:
+        yield info
+    finally:
+        info["wall"] = round(time.perf_counter() - wall_start, 4)
+        info["cpu"] = round(cpu_seconds() - cpu_start, 4)
+        info["peakRssMb"] = peak_rss_mb()
+        emit(name, **info)
+
+
+class BatchTimer:
+    """按批次记录耗时：每次调用记录距上一次调用的时间，用作进度回调"""
+
+    def __init__(self, name, callback=None, **fields):
+        self.name = name
+        self.callback = callback
+        self.fields = fields
+        self.index = 0
+        self.last_wall = time.perf_counter()
+        self.last_cpu = cpu_seconds()
+
+    def __call__(self, count):
+        now_wall = time.perf_counter()
+        now_cpu = cpu_seconds()
+        emit(
+            self.name,
+            batch=self.index,
+            segments=count,
+            wall=round(now_wall - self.last_wall, 4),
+            cpu=round(now_cpu - self.last_cpu, 4),
+            peakRssMb=peak_rss_mb(),
+            **self.fields
+        )
+        self.index += 1
+        self.last_wall = now_wall
+        self.last_cpu = now_cpu
+        if self.callback is not None:
+            self.callback(count)
+
+
+class Profiler:
+    """可选的 cProfile 分析，每次 dump 都覆盖写入 pstats 文件，常驻进程不用退出也能查看"""
+
+    def __init__(self, path):
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def __enter__(self):
+        self.active = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.active = False
+        self.profile.disable()
+        self.dump()
+        return False
+
+    def dump(self):
+        # dump_stats 会停止采样，进行中的分析需要重新启用
+        self.profile.dump_stats(self.path)
+        if self.active:
+            self.profile.enable()
+        print(f"性能分析结果已保存到: {self.path}（可用 python -m pstats 查看）")
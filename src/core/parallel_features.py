@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+from audio_io import SAMPLE_RATE
+from batch_features import (
+    FEATURE_NAMES, BLOCK_SECONDS, extract_batch_features, segment_sample_ranges, group_segments, compute_block_features,
+    iter_stream_groups, extract_streaming_features
+)
+
+# 子进程中映射到共享内存的音频
+_shared_memory = None
+_shared_audio = None
+
+
+def _init_worker(shm_name, n_samples):
+    """子进程初始化：挂载共享内存中的音频，只做一次"""
+    global _shared_memory, _shared_audio
+    _shared_memory = shared_memory.SharedMemory(name=shm_name)
+    _shared_audio = np.ndarray((n_samples,), dtype=np.float32, buffer=_shared_memory.buf)
+
+
+def _extract_group(begin, end, starts, ends, sr):
+    """在子进程中计算一组片段的特征"""
+    block_start = starts.min()
+    block_end = ends.max()
+    features = compute_block_features(
+        _shared_audio[block_start:block_end], starts - block_start, ends - block_start, sr
+    )
+    return begin, end, features
+
+
+def resolve_num_workers(num_workers):
+    """None 或 0 表示使用全部 CPU 核心"""
+    if not num_workers:
+        return os.cpu_count() or 1
+    return max(1, int(num_workers))
+
+
+def extract_features_parallel(audio, starts, ends, num_workers=None, sr=SAMPLE_RATE,
+                              block_seconds=BLOCK_SECONDS, progress=None):
+    """用进程池并行提取所有片段的特征
+
+    分组方式与 extract_batch_features 完全相同，因此结果与单进程逐位一致；
+    音频通过共享内存传给子进程，不随任务序列化。
+    """
+    num_workers = resolve_num_workers(num_workers)
+    n_segments = len(starts)
+    sample_starts, sample_ends = segment_sample_ranges(starts, ends, len(audio), sr)
+    groups = group_segments(sample_starts, sample_ends, int(block_seconds * sr)) if n_segments else []
+
+    if num_workers == 1 or len(groups) <= 1:
+        return extract_batch_features(audio, starts, ends, sr, block_seconds, progress)
+
+    features = np.zeros((n_segments, len(FEATURE_NAMES)))
+    shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+    try:
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+
+        with ProcessPoolExecutor(
+            max_workers=min(num_workers, len(groups)),
+            initializer=_init_worker,
+            initargs=(shm.name, len(audio))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _extract_group, begin, end, sample_starts[begin:end], sample_ends[begin:end], sr
+                )
+                for begin, end in groups
+            ]
+            # 按完成顺序回填到各自的行，输出顺序与片段顺序一致
+            for future in as_completed(futures):
+                begin, end, group_features = future.result()
+                features[begin:end] = group_features
+                if progress is not None:
+                    progress(end - begin)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return features
+
+
+def _extract_stream_group(begin, end, y, starts, ends, sr):
+    """在子进程中计算一组片段的特征，音频块随任务传入"""
+    return begin, end, compute_block_features(y, starts, ends, sr)
+
+
+def extract_features_streaming(blocks, starts, ends, num_workers=None, sr=SAMPLE_RATE,
+                               block_seconds=BLOCK_SECONDS, progress=None):
+    """流式版本的 extract_features_parallel：音频来自 PCM 块迭代器，不需要整段音频
+
+    每组的音频块（不超过 block_seconds 秒）随任务发给子进程；同时在途的任务不超过进程数的两倍，
+    因此内存占用与音频总时长无关。结果与 extract_streaming_features 逐位一致。
+    """
+    num_workers = resolve_num_workers(num_workers)
+    if num_workers == 1:
+        return extract_streaming_features(blocks, starts, ends, sr, block_seconds, progress)
+
+    features = np.zeros((len(starts), len(FEATURE_NAMES)))
+
+    def collect(done):
+        for future in done:
+            begin, end, group_features = future.result()
+            features[begin:end] = group_features
+            if progress is not None:
+                progress(end - begin)
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = set()
+        for group in iter_stream_groups(blocks, starts, ends, sr, block_seconds):
+            if len(pending) >= 2 * num_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(_extract_stream_group, *group, sr))
+        collect(as_completed(pending))
+
+    return features
+
+
+class OverlappedFeatureExtractor:
+    """边转录边提取特征：转录每产出一个片段就调用 add，攒满一组就交给后台线程计算
+
+    分组规则与 group_segments 相同（按到达顺序，组跨度不超过 block_seconds），
+    因此结果与转录结束后调用 extract_batch_features 逐位一致。
+    后台线程直接读取共享的解码音频，不复制；STFT 等 NumPy 运算大部分时间释放 GIL，
+    可以与 whisper 的 PyTorch 推理同时运行。转录结束后 finish 只需等待最后一组。
+    """
+
+    def __init__(self, audio, num_workers=1, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+        self.audio = audio
+        self.sr = sr
+        self.max_span = int(block_seconds * sr)
+        self.starts = []
+        self.ends = []
+        # 当前未提交的组：起始片段序号和覆盖的采样点范围
+        self.group_begin = 0
+        self.low = self.high = 0
+        self.futures = []
+        self.executor = ThreadPoolExecutor(max_workers=resolve_num_workers(num_workers),
+                                           thread_name_prefix="features")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start_time, end_time):
+        """追加一个片段（秒），按片段顺序调用"""
+        (start,), (end,) = segment_sample_ranges([start_time], [end_time], len(self.audio), self.sr)
+        index = len(self.starts)
+        if index > self.group_begin:
+            low, high = min(self.low, start), max(self.high, end)
+            if high - low > self.max_span:
+                self._submit(index)
+                low, high = start, end
+        else:
+            low, high = start, end
+        self.low, self.high = low, high
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def _submit(self, end):
+        begin = self.group_begin
+        starts = np.array(self.starts[begin:end], dtype=np.int64)
+        ends = np.array(self.ends[begin:end], dtype=np.int64)
+        self.futures.append(self.executor.submit(self._compute, begin, end, starts, ends))
+        self.group_begin = end
+
+    def _compute(self, begin, end, starts, ends):
+        block_start = starts.min()
+        features = compute_block_features(
+            self.audio[block_start:ends.max()], starts - block_start, ends - block_start, self.sr
+        )
+        return begin, end, features
+
+    def finish(self):
+        """提交最后一组并等待所有组完成，返回 (片段数 × 特征数) 的矩阵"""
+        if len(self.starts) > self.group_begin:
+            self._submit(len(self.starts))
+        features = np.zeros((len(self.starts), len(FEATURE_NAMES)))
+        try:
+            for future in self.futures:
+                begin, end, group_features = future.result()
+                features[begin:end] = group_features
+        finally:
+            self.close()
+        return features
+
+    def close(self):
+        """放弃尚未开始的组（例如转录失败时）"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -1,38 +1,79 @@
-import sys
-from pathlib import Path
+import argparse
 import json
+import os
 from speaker_recognizer import SpeakerRecognizer
+from speaker_clustering import CLUSTERING_BACKENDS
+from segment_store import SegmentStore, OUTPUT_FORMATS
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
+from transcript_export import EXPORT_FORMATS, export_path, export_transcript
+from transcript_search import TranscriptIndex, DEFAULT_SEARCH_INDEX_PATH
 
-def load_segments(json_path):
-    """从JSON文件加载语音片段"""
+def load_segments(json_path, keep_tokens=False):
+    """从JSON文件加载语音片段，存入紧凑的 SegmentStore（默认丢弃 tokens）
+
+    也可以读取之前的识别结果（按说话人分组的 json、.jsonl 或 .segcol 列存储），此时保留说话人标签。
+    """
+    if json_path.endswith(".segcol"):
+        return SegmentStore.read_columnar(json_path)
+    if json_path.endswith(".jsonl"):
+        return SegmentStore.read_jsonl(json_path)
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    return data["segments"]
+    segments = data["segments"]
+    if segments and "speakerId" in segments[0]:
+        return SegmentStore.from_groups(segments)
+    return SegmentStore.from_segments(segments, keep_tokens)
+
+def parse_pin(value):
+    """--pin 参数: 片段序号=说话人，例如 12=说话人2 或 12=1（序号从 0 开始）"""
+    index, separator, speaker = value.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"格式应为 片段序号=说话人: {value}")
+    return int(index), speaker if not speaker.isdigit() else int(speaker)
 
-def main(audio_path, segments_json):
+def main(audio_path, segments_json, num_workers=1, clustering="auto", output_format="json", pins=None, cache=None, exports=None, search_index=None):
     try:
         # 1. 加载语音片段
         print(f"正在加载语音片段: {segments_json}")
         segments = load_segments(segments_json)
-        
-        # 2. 识别说话人
-        recognizer = SpeakerRecognizer()
-        labeled_segments = recognizer.recognize_speakers(audio_path, segments)
-        
-        # 3. 保存结果
-        output_file = Path(audio_path).stem + "_说话人识别结果.txt"
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(labeled_segments)
-            
-        print(f"结果已保存到: {output_file}")
-        
+
+        # 2. 识别说话人，结果由识别器按 output_format 保存到音频旁边
+        recognizer = SpeakerRecognizer(num_workers=num_workers, cache=cache, clustering=clustering, output_format=output_format,
+                                       search_index=search_index)
+        if pins:
+            # 只重新分配未固定的片段，特征命中缓存时不需要重新解码
+            recognizer.rediarize(audio_path, segments, dict(pins))
+        else:
+            recognizer.recognize_speakers(audio_path, segments)
+
+        # 3. 从带标签的片段流式导出字幕和文本
+        for export_format in exports or []:
+            path = export_path(audio_path, export_format)
+            export_transcript(segments, path, export_format, title=os.path.basename(os.path.splitext(audio_path)[0]))
+            print(f"已导出: {path}")
+
     except Exception as e:
         print(f"发生错误: {str(e)}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        audio_file = sys.argv[1]
-        segments_json = sys.argv[2]
-        main(audio_file, segments_json)
-    else:
-        print("使用方法: python recognize_speakers.py 音频文件.mp3 语音片段.json") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(usage="python recognize_speakers.py 音频文件.mp3 语音片段.json [--workers N] [--clustering auto] [--format json] [--pin 序号=说话人N ...] [--export srt ...]")
+    parser.add_argument("audio_file", help="音频文件")
+    parser.add_argument("segments_json", help="Whisper 输出的语音片段 JSON，或之前的识别结果（.json / .jsonl / .segcol）")
+    parser.add_argument("--workers", type=int, default=1, help="特征提取进程数，0 表示使用全部 CPU 核心")
+    parser.add_argument("--clustering", choices=["auto"] + list(CLUSTERING_BACKENDS), default="auto",
+                        help="聚类方法，auto 在片段很多时改用 mini-batch k-means")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json",
+                        help="结果文件格式：json（压缩）、jsonl（每行一个片段）、columnar（二进制列存储）")
+    parser.add_argument("--pin", type=parse_pin, action="append", default=[], metavar="序号=说话人",
+                        help="固定片段的说话人（可重复），只重新分配其余片段，不重新聚类")
+    parser.add_argument("--export", choices=EXPORT_FORMATS, action="append", default=[],
+                        help="另外导出字幕或文本（可重复）：srt、vtt、txt、jsonl、md")
+    parser.add_argument("--search-index", nargs="?", const=DEFAULT_SEARCH_INDEX_PATH, default=None, metavar="PATH",
+                        help="把识别结果写入全文索引，省略 PATH 时使用默认索引（检索见 transcript_search.py）")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="缓存大小上限 (MB)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用缓存")
+    args = parser.parse_args()
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+    main(args.audio_file, args.segments_json, args.workers, args.clustering, args.format, args.pin, cache, args.export,
+         TranscriptIndex(args.search_index) if args.search_index else None)
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+import numpy as np
+
+# 默认缓存目录，可通过环境变量 TINGYIN_CACHE_DIR 或命令行参数修改
+DEFAULT_CACHE_DIR = os.environ.get("TINGYIN_CACHE_DIR", str(Path.home() / ".cache" / "tingyin"))
+# 缓存总大小上限，超过后按最近使用时间淘汰
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# 特征提取算法变化时递增，使旧的特征缓存失效
+FEATURE_VERSION = 2
+
+
+class ResultCache:
+    """按音频内容寻址的磁盘缓存
+
+    Whisper 片段以 音频哈希 + 模型 + 解码参数 为键，特征矩阵以 音频哈希 + 片段边界 为键，
+    两者分开存放：只修改说话人数量时可以直接复用特征，只重新聚类。
+    批量处理时多个线程共用同一个实例，命中统计由锁保护，另外按线程单独计数，
+    按任务统计时取任务前后两次 thread_stats 的差，不清零共用的计数；其他线程随时可能淘汰文件，
+    读取目录和文件时都要容忍文件已被删除。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (路径, 大小, 修改时间) -> 内容哈希，避免同一任务重复读取文件
+        self._hashes = {}
+
+    def audio_hash(self, audio_path):
+        """计算音频文件内容的 SHA-256"""
+        stat = os.stat(audio_path)
+        key = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(audio_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def segments_key(self, audio_path, model_size, options):
+        options_json = json.dumps(options, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(f"{model_size}\n{options_json}".encode("utf-8")).hexdigest()[:16]
+        return f"{self.audio_hash(audio_path)}-{digest}.segments.json"
+
+    def features_key(self, audio_path, starts, ends):
+        bounds = np.asarray([starts, ends], dtype=np.float64).tobytes()
+        digest = hashlib.sha256(bounds).hexdigest()[:16]
+        return f"{self.audio_hash(audio_path)}-v{FEATURE_VERSION}-{digest}.features.npy"
+
+    def _lookup(self, name, read):
+        """读取缓存文件，不存在时返回 None
+
+        读取前更新修改时间，作为 LRU 淘汰的依据；文件刚被其他线程淘汰时同样算作未命中。
+        """
+        path = self.cache_dir / name
+        try:
+            os.utime(path)
+            value = read(path)
+        except FileNotFoundError:
+            value = None
+        key = "misses" if value is None else "hits"
+        with self._lock:
+            setattr(self, key, getattr(self, key) + 1)
+        setattr(self._local, key, getattr(self._local, key, 0) + 1)
+        return value
+
+    def _store(self, name, write):
+        """先写临时文件再原子替换，避免并发任务读到写了一半的缓存"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, self.cache_dir / name)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def get_segments(self, audio_path, model_size, options):
+        def read(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return self._lookup(self.segments_key(audio_path, model_size, options), read)
+
+    def put_segments(self, audio_path, model_size, options, segments):
+        data = json.dumps(segments, ensure_ascii=False).encode("utf-8")
+        self._store(self.segments_key(audio_path, model_size, options), lambda f: f.write(data))
+
+    def get_features(self, audio_path, starts, ends):
+        return self._lookup(self.features_key(audio_path, starts, ends), np.load)
+
+    def put_features(self, audio_path, starts, ends, features):
+        self._store(self.features_key(audio_path, starts, ends), lambda f: np.save(f, features))
+
+    def evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            if path.name.startswith(".tmp_") or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # 其他线程同时在淘汰或替换
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def thread_stats(self):
+        """调用线程自己累计的命中统计"""
+        return {"hits": getattr(self._local, "hits", 0), "misses": getattr(self._local, "misses", 0)}
@@ -0,0 +1,268 @@
+import re
+import json
+import struct
+from array import array
+import numpy as np
+
+# 结果文件格式：json（压缩的 JSON，与界面使用的结构一致）、jsonl（每行一个片段）、columnar（二进制列存储）
+OUTPUT_FORMATS = ("json", "jsonl", "columnar")
+# 各格式的结果文件后缀
+OUTPUT_SUFFIXES = {"json": ".json", "jsonl": ".jsonl", "columnar": ".segcol"}
+# 二进制列存储的文件头标识和版本
+COLUMNAR_MAGIC = b"TYSEG\x00\x00\x01"
+FORMAT_VERSION = 1
+
+
+# 标签为 -1（未识别说话人）的片段在结果中使用的名称，parse_speaker_label 读回 -1
+UNKNOWN_SPEAKER = "未知说话人"
+
+
+def speaker_name(label):
+    return UNKNOWN_SPEAKER if label < 0 else f"说话人{label + 1}"
+
+
+def parse_speaker_label(value):
+    """说话人序号（从 0 开始）：接受整数序号或界面使用的 "说话人N" 名称，UNKNOWN_SPEAKER 为 -1"""
+    if isinstance(value, str):
+        if value.strip() == UNKNOWN_SPEAKER:
+            return -1
+        match = re.fullmatch(r"\s*说话人\s*(\d+)\s*", value)
+        if match is None:
+            raise ValueError(f"无法识别的说话人: {value}")
+        label = int(match.group(1)) - 1
+    else:
+        label = int(value)
+    if label < 0:
+        raise ValueError(f"说话人序号不能为负数: {value}")
+    return label
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_column_file(path, magic, header, columns):
+    """写入二进制列文件，读取方可以直接把各列映射为类型化数组
+
+    布局: 8 字节标识 | uint32 文件头长度 | JSON 文件头 | 按 8 字节对齐的各列数据
+    columns 为 [(列名, 类型名, 字节)]，写入的文件头在 header 之外加上 columns，
+    给出每列相对数据区起点的偏移、类型和字节数。
+    """
+    layout = {}
+    offset = 0
+    for name, dtype, data in columns:
+        offset = _align(offset)
+        layout[name] = {"offset": offset, "dtype": dtype, "bytes": len(data)}
+        offset += len(data)
+
+    header_bytes = json.dumps(dict(header, columns=layout), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    data_start = _align(len(magic) + 4 + len(header_bytes))
+    header_bytes += b" " * (data_start - len(magic) - 4 - len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        position = 0
+        for name, _, data in columns:
+            f.write(b"\x00" * (layout[name]["offset"] - position))
+            f.write(data)
+            position = layout[name]["offset"] + len(data)
+
+
+def read_column_file(path, magic, description="列存储文件"):
+    """读取 write_column_file 写入的文件，返回 (文件头, 数据区的 memoryview)"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw[:len(magic)] != magic:
+        raise ValueError(f"不是{description}: {path}")
+    header_length = struct.unpack_from("<I", raw, len(magic))[0]
+    header_start = len(magic) + 4
+    header = json.loads(raw[header_start:header_start + header_length].decode("utf-8"))
+    return header, memoryview(raw)[header_start + header_length:]
+
+
+class SegmentStore:
+    """紧凑的片段存储：起止时间和说话人标签放在连续数组中，文本放在一个列表里
+
+    Whisper 片段中的 tokens 等字段默认丢弃，keep_tokens=True 时单独保存。
+    支持逐个追加（转录时流式写入），需要计算时以 NumPy 数组视图读取，不复制数据。
+    """
+
+    def __init__(self, keep_tokens=False):
+        self._starts = array("d")
+        self._ends = array("d")
+        self._labels = array("i")
+        self.texts = []
+        self.tokens = [] if keep_tokens else None
+
+    @classmethod
+    def from_segments(cls, segments, keep_tokens=False):
+        """从 Whisper 片段或 {"text", "start", "end"} 字典列表构建"""
+        if isinstance(segments, SegmentStore):
+            return segments
+        store = cls(keep_tokens)
+        for segment in segments:
+            store.append(segment.get("start", 0), segment.get("end", 0), segment["text"], segment.get("tokens"))
+        return store
+
+    @classmethod
+    def from_groups(cls, groups):
+        """从按说话人分组的结果（界面的 TranscriptionData.segments 或 json 结果文件）构建，保留标签"""
+        store = cls()
+        labels = []
+        for group in groups:
+            label = parse_speaker_label(group["speakerId"])
+            for segment in group["segments"]:
+                store.append(segment.get("start", 0), segment.get("end", 0), segment["text"])
+                labels.append(label)
+        store.set_labels(labels)
+        return store
+
+    def append(self, start, end, text, tokens=None):
+        self._starts.append(float(start))
+        self._ends.append(float(end))
+        self._labels.append(-1)
+        self.texts.append(str(text).strip())
+        if self.tokens is not None:
+            self.tokens.append(list(tokens or []))
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def starts(self):
+        return np.frombuffer(self._starts, dtype=np.float64) if len(self) else np.zeros(0)
+
+    @property
+    def ends(self):
+        return np.frombuffer(self._ends, dtype=np.float64) if len(self) else np.zeros(0)
+
+    @property
+    def labels(self):
+        return np.frombuffer(self._labels, dtype=np.int32) if len(self) else np.zeros(0, dtype=np.int32)
+
+    def set_labels(self, labels):
+        """设置每个片段的说话人序号（从 0 开始），-1 表示未知"""
+        labels = np.asarray(labels, dtype=np.int32)
+        if len(labels) != len(self):
+            raise ValueError(f"标签数量 {len(labels)} 与片段数量 {len(self)} 不一致")
+        self._labels = array("i", labels.tobytes())
+
+    def num_speakers(self):
+        labels = self.labels
+        return int(labels.max()) + 1 if len(labels) and labels.max() >= 0 else 0
+
+    def records(self):
+        """转换为 {"text", "start", "end"} 字典列表（缓存和流式事件使用）"""
+        return [
+            {"text": text, "start": start, "end": end}
+            for text, start, end in zip(self.texts, self._starts, self._ends)
+        ]
+
+    def groups(self):
+        """按说话人标签把连续的片段合并为一组，结构与界面的 TranscriptionData.segments 一致"""
+        groups = []
+        previous = None
+        for i, text in enumerate(self.texts):
+            label = self._labels[i]
+            item = {"text": text, "start": self._starts[i], "end": self._ends[i]}
+            if label != previous or not groups:
+                groups.append({"speakerId": speaker_name(label), "startTime": self._starts[i], "segments": [item]})
+                previous = label
+            else:
+                groups[-1]["segments"].append(item)
+        return groups
+
+    def write(self, path, output_format="json", extra=None):
+        """按指定格式写入结果文件，extra 为 json 格式下附加的顶层字段（例如说话人估计）"""
+        if output_format == "json":
+            self.write_json(path, extra)
+        elif output_format == "jsonl":
+            self.write_jsonl(path)
+        elif output_format == "columnar":
+            self.write_columnar(path)
+        else:
+            raise ValueError(f"未知的输出格式: {output_format}")
+
+    def header(self):
+        return {
+            "format": "tingyin-segments",
+            "version": FORMAT_VERSION,
+            "count": len(self),
+            "speakers": [speaker_name(label) for label in range(self.num_speakers())]
+        }
+
+    def write_json(self, path, extra=None):
+        """不缩进、不加空格的 JSON"""
+        result = {"segments": self.groups()}
+        result.update(extra or {})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+
+    def write_jsonl(self, path):
+        """第一行为文件头，之后每行一个片段: [开始, 结束, 说话人序号, 文本(, tokens)]"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.header(), ensure_ascii=False, separators=(",", ":")) + "\n")
+            for i, text in enumerate(self.texts):
+                row = [self._starts[i], self._ends[i], self._labels[i], text]
+                if self.tokens is not None:
+                    row.append(self.tokens[i])
+                f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def read_jsonl(cls, path):
+        """读取 write_jsonl 写入的文件，保留说话人标签（和 tokens）"""
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != "tingyin-segments":
+                raise ValueError(f"不是片段 JSON Lines 文件: {path}")
+            rows = [json.loads(line) for line in f if line.strip()]
+        store = cls(keep_tokens=any(len(row) > 4 for row in rows))
+        for row in rows:
+            store.append(row[0], row[1], row[3], row[4] if len(row) > 4 else None)
+        store.set_labels([row[2] for row in rows])
+        return store
+
+    def write_columnar(self, path):
+        """二进制列存储，读取方可以直接把各列映射为类型化数组，文本按需解码
+
+        布局: 8 字节标识 | uint32 文件头长度 | JSON 文件头 | 按 8 字节对齐的各列数据
+        各列（小端）: start float64[n], end float64[n], label int32[n],
+        textOffsets uint32[n+1]（文本字节区内的偏移）, text UTF-8 字节
+        文件头中的 columns 给出每列相对数据区起点的偏移。
+        """
+        n = len(self)
+        encoded = [text.encode("utf-8") for text in self.texts]
+        text_offsets = np.zeros(n + 1, dtype="<u4")
+        if n:
+            np.cumsum([len(data) for data in encoded], out=text_offsets[1:])
+        columns = [
+            ("start", "float64", self.starts.astype("<f8").tobytes()),
+            ("end", "float64", self.ends.astype("<f8").tobytes()),
+            ("label", "int32", self.labels.astype("<i4").tobytes()),
+            ("textOffsets", "uint32", text_offsets.tobytes()),
+            ("text", "utf8", b"".join(encoded))
+        ]
+
+        write_column_file(path, COLUMNAR_MAGIC, self.header(), columns)
+
+    @classmethod
+    def read_columnar(cls, path):
+        """读取 write_columnar 写入的文件"""
+        header, data = read_column_file(path, COLUMNAR_MAGIC, "片段列存储文件")
+        n = header["count"]
+
+        def column(name, dtype, count):
+            offset = header["columns"][name]["offset"]
+            return np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+
+        store = cls()
+        store._starts = array("d", column("start", "<f8", n).tobytes())
+        store._ends = array("d", column("end", "<f8", n).tobytes())
+        store._labels = array("i", column("label", "<i4", n).tobytes())
+        offsets = column("textOffsets", "<u4", n + 1)
+        text_start = header["columns"]["text"]["offset"]
+        text_bytes = bytes(data[text_start:text_start + header["columns"]["text"]["bytes"]])
+        store.texts = [text_bytes[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(n)]
+        return store
@@ -0,0 +1,275 @@
+import numpy as np
+
+# 自动估计时尝试的最大说话人数（与界面可选范围一致）
+MAX_SPEAKERS = 10
+# 计算轮廓系数时最多使用的样本数，避免片段很多时 O(n²) 的距离计算
+SILHOUETTE_SAMPLE_SIZE = 2000
+# 得分与最佳值相差不超过该容差时选择更少的说话人，避免把同一个人拆成多个簇
+SILHOUETTE_TOLERANCE = 0.01
+# 片段数超过该值时 "auto" 改用 O(n·k) 的 mini-batch k-means，层次聚类需要 O(n²) 的内存
+LARGE_SEGMENT_THRESHOLD = 2000
+# mini-batch k-means 的批大小
+KMEANS_BATCH_SIZE = 1024
+# 结果中只保存选定说话人数前后各这么多个候选的标签，其余候选只保留得分，避免每个结果带上 10×n 个标签
+CANDIDATE_LABEL_RANGE = 1
+# 在线分配时，与所有说话人质心的标准化距离都超过该值的片段作为新说话人
+# （内置测试音频中片段到所属簇质心的距离中位数约 3，不同簇质心相距 4~7）
+ONLINE_NEW_SPEAKER_DISTANCE = 5.5
+# 在线分配的前几个片段标准差还不可靠，只分给已有的说话人
+ONLINE_WARMUP_SEGMENTS = 5
+
+
+def standardize(features):
+    """按列标准化为 float32，避免音高（数百 Hz）和频谱质心（数千 Hz）主导距离"""
+    features = np.asarray(features, dtype=np.float32)
+    if len(features) == 0:
+        return features
+    mean = features.mean(axis=0)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    return (features - mean) / std
+
+
+def relabel_by_first_appearance(labels):
+    """按首次出现的顺序重新编号，第一个开口的人为 0"""
+    mapping = {}
+    relabeled = np.empty(len(labels), dtype=np.int64)
+    for i, label in enumerate(labels):
+        if label not in mapping:
+            mapping[label] = len(mapping)
+        relabeled[i] = mapping[label]
+    return relabeled
+
+
+def build_linkage(features):
+    """构建平均链接的层次聚类树，与 AgglomerativeClustering(linkage='average') 等价"""
+    from scipy.cluster.hierarchy import linkage
+    return linkage(np.asarray(features, dtype=np.float64), method="average", metric="euclidean")
+
+
+def cut_linkage(tree, num_speakers):
+    """在层次聚类树上切出 num_speakers 个簇，不需要重新聚类"""
+    from scipy.cluster.hierarchy import fcluster
+    return relabel_by_first_appearance(fcluster(tree, num_speakers, criterion="maxclust"))
+
+
+def agglomerative_backend(features):
+    """层次聚类：只建一次树，每个 k 直接切分"""
+    tree = build_linkage(features)
+    return lambda k: cut_linkage(tree, k)
+
+
+def kmeans_backend(features):
+    """mini-batch k-means：每个 k 单独拟合，时间和内存都是 O(n·k)"""
+    from sklearn.cluster import MiniBatchKMeans
+    def fit(k):
+        model = MiniBatchKMeans(
+            n_clusters=k,
+            batch_size=KMEANS_BATCH_SIZE,
+            n_init=3,
+            random_state=0
+        )
+        return relabel_by_first_appearance(model.fit_predict(features))
+    return fit
+
+
+# 可用的聚类后端：名称 -> 接收标准化特征、返回 "k -> 标签" 函数的构造器
+CLUSTERING_BACKENDS = {
+    "agglomerative": agglomerative_backend,
+    "kmeans": kmeans_backend
+}
+
+
+def resolve_method(method, num_segments):
+    """"auto" 按片段数选择后端"""
+    if method in (None, "auto"):
+        return "kmeans" if num_segments > LARGE_SEGMENT_THRESHOLD else "agglomerative"
+    if method not in CLUSTERING_BACKENDS:
+        raise ValueError(f"未知的聚类方法: {method}")
+    return method
+
+
+def bic_score(features, labels):
+    """球形高斯模型的 BIC，越小越好，可以比较包括 1 个说话人在内的所有切分"""
+    n, d = features.shape
+    within = 0.0
+    for label in np.unique(labels):
+        members = features[labels == label]
+        within += float(((members - members.mean(axis=0)) ** 2).sum())
+    variance = max(within / (n * d), 1e-12)
+    num_clusters = len(np.unique(labels))
+    log_likelihood = -0.5 * n * d * (np.log(2 * np.pi * variance) + 1)
+    num_params = num_clusters * d + 1
+    return float(-2 * log_likelihood + num_params * np.log(n))
+
+
+def estimate_speakers(features, max_speakers=MAX_SPEAKERS, criterion="silhouette", method="auto"):
+    """自动估计说话人数量
+
+    特征先按列标准化，再用所选后端对 k = 1..max_speakers 逐一聚类并打分；
+    层次聚类只构建一次树，各个 k 直接切分，不重新拟合。
+    criterion 为 "silhouette"（轮廓系数，越大越好，只比较 k >= 2，得分接近时取较小的 k）
+    或 "bic"（越小越好，可以选出 1 个说话人）。
+    返回最佳的 k 以及每个候选的标签和得分，界面可以直接切换到其他说话人数。
+    """
+    return _estimate(standardize(features), max_speakers, criterion, method)
+
+
+def _estimate(features, max_speakers, criterion, method):
+    from sklearn.metrics import silhouette_score
+    n = len(features)
+    method = resolve_method(method, n)
+    labels_for = CLUSTERING_BACKENDS[method](features) if n > 1 else None
+    max_speakers = max(1, min(max_speakers, n - 1 if n > 2 else 1))
+
+    candidates = []
+    for k in range(1, max_speakers + 1):
+        labels = labels_for(k) if labels_for is not None and k > 1 else np.zeros(n, dtype=np.int64)
+        found = len(np.unique(labels))
+        silhouette = None
+        if 2 <= found < n:
+            silhouette = float(silhouette_score(
+                features, labels, sample_size=min(n, SILHOUETTE_SAMPLE_SIZE), random_state=0
+            ))
+        candidates.append({
+            "numSpeakers": k,
+            "silhouette": silhouette,
+            "bic": bic_score(features, labels) if n > 0 else None,
+            "labels": labels.tolist()
+        })
+
+    if criterion == "bic" and n > 0:
+        best = min(candidates, key=lambda candidate: candidate["bic"])
+    else:
+        scored = [candidate for candidate in candidates if candidate["silhouette"] is not None]
+        if scored:
+            top = max(candidate["silhouette"] for candidate in scored)
+            best = next(candidate for candidate in scored if candidate["silhouette"] >= top - SILHOUETTE_TOLERANCE)
+        else:
+            best = candidates[0]
+
+    return {
+        "numSpeakers": best["numSpeakers"],
+        "criterion": criterion,
+        "method": method,
+        "candidates": candidates
+    }
+
+
+def fixed_speakers(features, num_speakers, criterion, method):
+    """指定说话人数时只聚一次类，估计结果的 numSpeakers 为空、没有候选"""
+    n = len(features)
+    method = resolve_method(method, n)
+    if n <= 1 or num_speakers <= 1:
+        labels = [0] * n
+    else:
+        labels = CLUSTERING_BACKENDS[method](features)(min(num_speakers, n)).tolist()
+    return labels, {"numSpeakers": None, "criterion": criterion, "method": method, "candidates": []}
+
+
+def cluster_speakers(features, num_speakers=None, max_speakers=MAX_SPEAKERS, criterion="silhouette", method="auto"):
+    """聚类并返回 (每个片段的标签, 估计结果)
+
+    num_speakers 为空或 0 时使用估计的说话人数；指定数量时直接聚类，不再对各个候选打分。
+    返回的候选只有选定说话人数前后 CANDIDATE_LABEL_RANGE 个保留 "labels"，其余只有得分。
+    method 为 "auto"、"agglomerative" 或 "kmeans"。
+    """
+    features = standardize(features)
+    if num_speakers:
+        return fixed_speakers(features, num_speakers, criterion, method)
+    estimate = _estimate(features, max_speakers, criterion, method)
+    best = next(candidate for candidate in estimate["candidates"] if candidate["numSpeakers"] == estimate["numSpeakers"])
+    labels = list(best["labels"])
+    for candidate in estimate["candidates"]:
+        if abs(candidate["numSpeakers"] - best["numSpeakers"]) > CANDIDATE_LABEL_RANGE:
+            del candidate["labels"]
+    return labels, estimate
+
+
+def assign_to_centroids(features, labels, pinned):
+    """用户固定部分片段的说话人后，把其余片段重新分配给最近的说话人质心
+
+    features 为原始特征矩阵（与 cluster_speakers 一样先标准化），labels 为当前每个片段的标签，
+    pinned 为 {片段序号: 标签}。固定的片段保持不变；先把固定的标签写入当前标签，
+    再用每个说话人当前归属的所有片段计算质心（只固定了一个片段的新说话人以该片段为质心）。
+    不重新聚类，只做一次 O(n·k) 的距离计算。
+    标签不重新编号，界面上的说话人名称保持不变。
+    """
+    features = standardize(features)
+    labels = np.array(labels, dtype=np.int64)
+    if len(labels) != len(features):
+        raise ValueError(f"标签数量 {len(labels)} 与片段数量 {len(features)} 不一致")
+
+    is_pinned = np.zeros(len(labels), dtype=bool)
+    if pinned:
+        indices = np.fromiter(pinned.keys(), dtype=np.int64, count=len(pinned))
+        if indices.min() < 0 or indices.max() >= len(labels):
+            raise ValueError(f"固定的片段序号超出范围: 0..{len(labels) - 1}")
+        labels[indices] = np.fromiter(pinned.values(), dtype=np.int64, count=len(pinned))
+        is_pinned[indices] = True
+
+    speakers = np.unique(labels[labels >= 0])
+    if len(speakers) == 0:
+        return labels
+    centroids = np.empty((len(speakers), features.shape[1]), dtype=np.float32)
+    for i, speaker in enumerate(speakers):
+        centroids[i] = features[labels == speaker].mean(axis=0)
+
+    # |x - c|² = |x|² - 2x·c + |c|²，|x|² 对所有质心相同可以省略
+    free = ~is_pinned
+    distances = (centroids ** 2).sum(axis=1) - 2 * features[free] @ centroids.T
+    labels[free] = speakers[np.argmin(distances, axis=1)]
+    return labels
+
+
+class OnlineSpeakerAssigner:
+    """实时转录的在线说话人分配：每个片段到达时立即确定说话人，之后不再改变
+
+    特征用目前为止所有片段的均值和标准差标准化（随片段增加更新），片段分给最近的说话人质心；
+    与所有质心的距离都超过 new_speaker_distance 且说话人数未达上限时作为新说话人。
+    每个片段 O(k) 的计算，质心只保存特征的累加和与片段数。
+    """
+
+    def __init__(self, max_speakers=MAX_SPEAKERS, new_speaker_distance=ONLINE_NEW_SPEAKER_DISTANCE,
+                 warmup=ONLINE_WARMUP_SEGMENTS):
+        self.max_speakers = max(1, max_speakers)
+        self.new_speaker_distance = new_speaker_distance
+        self.warmup = warmup
+        self.count = 0
+        self.sum = None
+        self.square_sum = None
+        self.speaker_sums = []
+        self.speaker_counts = []
+
+    def __len__(self):
+        return len(self.speaker_counts)
+
+    def assign(self, features):
+        """features 为一个片段的原始特征（与 cluster_speakers 相同的列），返回说话人序号"""
+        features = np.asarray(features, dtype=np.float64)
+        if self.sum is None:
+            self.sum = np.zeros_like(features)
+            self.square_sum = np.zeros_like(features)
+        self.count += 1
+        self.sum += features
+        self.square_sum += features ** 2
+
+        if not self.speaker_counts:
+            label = 0
+        else:
+            mean = self.sum / self.count
+            std = np.sqrt(np.maximum(self.square_sum / self.count - mean ** 2, 0))
+            std[std == 0] = 1.0
+            centroids = np.array(self.speaker_sums) / np.array(self.speaker_counts)[:, None]
+            distances = np.linalg.norm((centroids - features) / std, axis=1)
+            label = int(np.argmin(distances))
+            if (distances[label] > self.new_speaker_distance and self.count > self.warmup
+                    and len(self) < self.max_speakers):
+                label = len(self)
+
+        if label == len(self):
+            self.speaker_sums.append(np.zeros_like(features))
+            self.speaker_counts.append(0)
+        self.speaker_sums[label] = self.speaker_sums[label] + features
+        self.speaker_counts[label] += 1
+        return label
@@ -0,0 +1,255 @@
+"""说话人声纹库：跨录音识别反复出现的说话人
+
+每个片段的声纹向量取自批量特征中的 MFCC 统计量（均值和逐帧标准差，不含与音量相关的 c0），
+每个已知说话人保存其所有登记片段声纹的累加和与片段数（即均值声纹）。
+比较前用背景统计量（所有登记过的录音的全部片段）做逐维标准化，
+相当于简化的 i-vector 式中心化，再按余弦相似度匹配：
+所有新簇与所有已知说话人的相似度由一次矩阵乘法算出，再用匈牙利算法做一对一分配。
+只依赖 NumPy/SciPy，完全离线运行。
+
+用法:
+    python speaker_profiles.py enroll 音频.mp3 识别结果.json 说话人1=张三 [说话人2=李四 ...]
+    python speaker_profiles.py match 音频.mp3 识别结果.json
+    python speaker_profiles.py list
+    python speaker_profiles.py remove 张三
+"""
+import os
+import json
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+from batch_features import FEATURE_NAMES, N_MFCC
+from segment_store import parse_speaker_label, speaker_name
+
+# 声纹库默认路径；不放在缓存目录中，避免被缓存淘汰删除
+DEFAULT_PROFILE_PATH = os.environ.get(
+    "TINGYIN_SPEAKER_PROFILES", str(Path.home() / ".local" / "share" / "tingyin" / "speaker_profiles.npz")
+)
+# 声纹向量定义变化时递增，旧的声纹库需要重新登记
+PROFILE_VERSION = 1
+# 声纹向量使用的特征列：MFCC 1..12 的均值和标准差
+EMBEDDING_COLUMNS = [FEATURE_NAMES.index(f"mfcc_{i}") for i in range(1, N_MFCC)] + [
+    FEATURE_NAMES.index(f"mfcc_std_{i}") for i in range(1, N_MFCC)
+]
+# 余弦相似度低于该值时不认为是已知说话人
+MATCH_THRESHOLD = 0.6
+
+
+def segment_embeddings(feature_table):
+    """从完整的特征矩阵（列顺序见 FEATURE_NAMES）取出每个片段的声纹向量"""
+    return np.asarray(feature_table, dtype=np.float64)[:, EMBEDDING_COLUMNS]
+
+
+def cluster_means(embeddings, labels):
+    """每个标签的平均声纹，返回 (标签数组, 均值矩阵)，忽略 -1"""
+    labels = np.asarray(labels)
+    speakers = np.unique(labels[labels >= 0])
+    means = np.array([embeddings[labels == speaker].mean(axis=0) for speaker in speakers])
+    return speakers, means.reshape(len(speakers), embeddings.shape[1])
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SpeakerProfileStore:
+    """磁盘上的声纹库，整个库保存为一个 .npz 文件，写入时原子替换"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_PROFILE_PATH)
+        dimension = len(EMBEDDING_COLUMNS)
+        self.names = []
+        self.sums = np.zeros((0, dimension))
+        self.counts = np.zeros(0, dtype=np.int64)
+        # 背景统计量：所有登记录音中全部片段声纹的片段数、和、平方和
+        self.background_count = 0
+        self.background_sum = np.zeros(dimension)
+        self.background_square_sum = np.zeros(dimension)
+        if self.path.exists():
+            self.load()
+
+    def __len__(self):
+        return len(self.names)
+
+    def load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            if int(data["version"]) != PROFILE_VERSION:
+                raise ValueError(f"声纹库版本不兼容: {self.path}，请重新登记")
+            self.names = [str(name) for name in data["names"]]
+            self.sums = data["sums"].reshape(len(self.names), len(EMBEDDING_COLUMNS))
+            self.counts = data["counts"]
+            self.background_count = int(data["background_count"])
+            self.background_sum = data["background_sum"]
+            self.background_square_sum = data["background_square_sum"]
+
+    def save(self):
+        """先写临时文件再原子替换"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp_", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=PROFILE_VERSION,
+                    names=np.array(self.names, dtype=str),
+                    sums=self.sums,
+                    counts=self.counts,
+                    background_count=self.background_count,
+                    background_sum=self.background_sum,
+                    background_square_sum=self.background_square_sum
+                )
+            os.replace(temp_path, self.path)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def enroll(self, embeddings, labels, names):
+        """从一次录音登记说话人
+
+        embeddings 为该录音所有片段的声纹，labels 为每个片段的说话人序号，
+        names 为 {说话人序号: 姓名}。已有的姓名累加新的片段，所有片段都计入背景统计量。
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        labels = np.asarray(labels)
+        for label, name in names.items():
+            members = embeddings[labels == label]
+            if len(members) == 0:
+                raise ValueError(f"{speaker_name(label)} 没有任何片段")
+            if name in self.names:
+                index = self.names.index(name)
+                self.sums[index] += members.sum(axis=0)
+                self.counts[index] += len(members)
+            else:
+                self.names.append(name)
+                self.sums = np.vstack([self.sums, members.sum(axis=0)])
+                self.counts = np.append(self.counts, len(members))
+        self.background_count += len(embeddings)
+        self.background_sum = self.background_sum + embeddings.sum(axis=0)
+        self.background_square_sum = self.background_square_sum + (embeddings ** 2).sum(axis=0)
+
+    def remove(self, name):
+        if name not in self.names:
+            raise KeyError(f"声纹库中没有: {name}")
+        index = self.names.index(name)
+        del self.names[index]
+        self.sums = np.delete(self.sums, index, axis=0)
+        self.counts = np.delete(self.counts, index)
+
+    def normalizer(self):
+        """背景均值和标准差，只用已登记的录音计算
+
+        当前录音不计入背景：否则声纹库中只有当前说话人自己的历史录音时，中心化后的
+        历史声纹与当前声纹恰好方向相反。背景中只有一个已知说话人的片段时背景均值就是
+        该说话人本身，此时只缩放不中心化（相似度普遍偏高，需要登记更多说话人才可靠）。
+        """
+        dimension = len(EMBEDDING_COLUMNS)
+        if self.background_count < 2:
+            return np.zeros(dimension), np.ones(dimension)
+        mean = self.background_sum / self.background_count
+        std = np.sqrt(np.maximum(self.background_square_sum / self.background_count - mean ** 2, 0))
+        std[std == 0] = 1.0
+        if len(self.names) < 2 and self.background_count <= self.counts.sum():
+            mean = np.zeros(dimension)
+        return mean, std
+
+    def similarity(self, queries):
+        """queries (k × 维数) 与所有已知说话人的余弦相似度矩阵 (k × 已知说话人数)，一次矩阵乘法"""
+        mean, std = self.normalizer()
+        profiles = _unit_rows((self.sums / self.counts[:, None] - mean) / std)
+        queries = _unit_rows((np.asarray(queries, dtype=np.float64) - mean) / std)
+        return queries @ profiles.T
+
+    def match(self, embeddings, labels, threshold=MATCH_THRESHOLD):
+        """把一次录音中的各个说话人对应到已知说话人
+
+        返回 {说话人序号: (姓名, 相似度)}，每个已知说话人最多对应一个簇，
+        相似度低于 threshold 的簇不出现在结果中。
+        """
+        from scipy.optimize import linear_sum_assignment
+        if not self.names:
+            return {}
+        speakers, means = cluster_means(np.asarray(embeddings, dtype=np.float64), labels)
+        if len(speakers) == 0:
+            return {}
+        scores = self.similarity(means)
+        rows, columns = linear_sum_assignment(-scores)
+        return {
+            int(speakers[row]): (self.names[column], float(scores[row, column]))
+            for row, column in zip(rows, columns)
+            if scores[row, column] >= threshold
+        }
+
+    def describe(self):
+        return [{"name": name, "segments": int(count)} for name, count in zip(self.names, self.counts)]
+
+
+def parse_assignment(value):
+    """说话人1=张三 -> (0, "张三")"""
+    speaker, separator, name = value.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"格式应为 说话人N=姓名: {value}")
+    label = parse_speaker_label(speaker)
+    if label < 0:
+        raise argparse.ArgumentTypeError(f"不能登记未知说话人: {value}")
+    return label, name
+
+
+def _load_embeddings(audio_path, result_json, num_workers):
+    """读取识别结果并计算（或从缓存读取）各片段的声纹
+
+    speaker_recognizer 会导入本模块，命令行用到的识别器在函数内导入以避免循环导入。
+    """
+    from recognize_speakers import load_segments
+    from speaker_recognizer import SpeakerRecognizer
+    from result_cache import ResultCache
+    store = load_segments(result_json)
+    recognizer = SpeakerRecognizer(num_workers=num_workers, cache=ResultCache())
+    return store, segment_embeddings(recognizer.feature_table(audio_path, store))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="说话人声纹库")
+    parser.add_argument("--profiles", default=DEFAULT_PROFILE_PATH, help="声纹库文件路径")
+    parser.add_argument("--workers", type=int, default=1, help="特征提取进程数，0 表示使用全部 CPU 核心")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enroll_parser = commands.add_parser("enroll", help="从识别结果登记说话人")
+    enroll_parser.add_argument("audio_file", help="音频文件")
+    enroll_parser.add_argument("result_json", help="说话人识别结果（.json / .segcol）")
+    enroll_parser.add_argument("names", nargs="+", type=parse_assignment, help="说话人N=姓名")
+
+    match_parser = commands.add_parser("match", help="把识别结果中的说话人对应到已知说话人")
+    match_parser.add_argument("audio_file", help="音频文件")
+    match_parser.add_argument("result_json", help="说话人识别结果（.json / .segcol）")
+    match_parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD, help="最低余弦相似度")
+
+    commands.add_parser("list", help="列出已登记的说话人")
+    remove_parser = commands.add_parser("remove", help="删除已登记的说话人")
+    remove_parser.add_argument("name", help="姓名")
+    args = parser.parse_args()
+
+    profiles = SpeakerProfileStore(args.profiles)
+    if args.command == "enroll":
+        store, embeddings = _load_embeddings(args.audio_file, args.result_json, args.workers)
+        profiles.enroll(embeddings, store.labels, dict(args.names))
+        profiles.save()
+        print(f"已登记: {', '.join(name for _, name in args.names)}，声纹库: {profiles.path}")
+    elif args.command == "match":
+        store, embeddings = _load_embeddings(args.audio_file, args.result_json, args.workers)
+        matches = profiles.match(embeddings, store.labels, args.threshold)
+        for label in range(store.num_speakers()):
+            name, score = matches.get(label, (None, None))
+            print(f"{speaker_name(label)}: {name or '未知'}" + (f"（相似度 {score:.3f}）" if name else ""))
+    elif args.command == "list":
+        print(json.dumps(profiles.describe(), ensure_ascii=False, indent=2))
+    elif args.command == "remove":
+        profiles.remove(args.name)
+        profiles.save()
+        print(f"已删除: {args.name}")
+
+
+if __name__ == "__main__":
+    main()
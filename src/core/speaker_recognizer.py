@@ -1,25 +1,71 @@
-import librosa
 import numpy as np
-from sklearn.cluster import AgglomerativeClustering
-from tqdm import tqdm
-import time
+import threading
 import os
-import re
-import json
+from audio_io import decode_audio, stream_audio, segment_view, SAMPLE_RATE
+from batch_features import CLUSTER_FEATURE_COUNT
+from parallel_features import (
+    extract_features_parallel, extract_features_streaming, resolve_num_workers, OverlappedFeatureExtractor
+)
+from speaker_clustering import cluster_speakers, assign_to_centroids
+from segment_store import SegmentStore, OUTPUT_FORMATS, OUTPUT_SUFFIXES, parse_speaker_label, speaker_name
+from speaker_profiles import segment_embeddings
+from audio_index import PeaksBuilder, write_audio_index
+from transcript_search import profile_names
+import metrics
+
+def result_path(audio_path, output_format="json"):
+    """识别结果文件路径：音频旁边的 {文件名}_说话人识别结果.{json|jsonl|segcol}"""
+    return f"{os.path.splitext(audio_path)[0]}_说话人识别结果{OUTPUT_SUFFIXES[output_format]}"
 
 class SpeakerRecognizer:
-    def __init__(self):
-        self.weights = {
-            'pitch': 0.2,
-            'spectral_centroid': 0.15,
-            'rms_energy': 0.05,
-            'zero_crossing_rate': 0.05,
-            'mfccs': 0.55
-        }
+    def __init__(self, num_workers=1, cache=None, clustering="auto", output_format="json", profiles=None,
+                 streaming=False, audio_index=True, search_index=None):
+        # 特征提取使用的进程数，None 或 0 表示使用全部 CPU 核心
+        self.num_workers = resolve_num_workers(num_workers)
+        # 可选的 ResultCache，命中时跳过解码和特征提取
+        self.cache = cache
+        # 聚类后端："auto" 在片段很多时自动改用 mini-batch k-means
+        self.clustering = clustering
+        # 结果文件格式，见 segment_store.OUTPUT_FORMATS
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"未知的输出格式: {output_format}")
+        self.output_format = output_format
+        # 可选的 SpeakerProfileStore，聚类后把各说话人对应到已登记的姓名
+        self.profiles = profiles
+        # 没有传入已解码的音频时是否流式解码，不在内存中保留整段音频（适合数小时的录音）
+        self.streaming = streaming
+        # 是否在识别结果旁边写入波形峰值索引（见 audio_index），供界面绘制波形
+        self.audio_index = audio_index
+        # 可选的 TranscriptIndex，每个结果保存后写入全文索引（见 transcript_search）
+        self.search_index = search_index
+    
+    def warmup(self):
+        """在后台线程导入 librosa/scikit-learn，并在一秒静音上跑一次特征提取和聚类，返回该线程
+
+        librosa 的子模块在首次访问时才加载，提前跑一遍可以把这部分开销移出第一个任务。
+        """
+        def run():
+            try:
+                silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+                starts = np.array([0.0, 0.25, 0.5])
+                feature_table = extract_features_parallel(silence, starts, starts + 0.5, num_workers=1)
+                cluster_speakers(feature_table[:, :CLUSTER_FEATURE_COUNT], None)
+            except Exception as e:
+                print(f"预热说话人识别失败: {str(e)}")
+        thread = threading.Thread(target=run, name="speaker-warmup", daemon=True)
+        thread.start()
+        return thread
     
-    def extract_features(self, audio_path, start_time, end_time, sr=16000):
-        """提取音频特征"""
-        y, sr = librosa.load(audio_path, sr=sr, offset=start_time, duration=end_time-start_time)
+    def extract_features(self, audio_path, start_time, end_time, sr=SAMPLE_RATE, audio=None):
+        """提取音频特征
+
+        传入已解码的 audio 时直接在内存中切片，避免每个片段重新解码文件。
+        """
+        import librosa
+        if audio is None:
+            y, sr = librosa.load(audio_path, sr=sr, offset=start_time, duration=end_time-start_time)
+        else:
+            y = segment_view(audio, start_time, end_time, sr)
         
         features = {}
         pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
@@ -27,133 +73,247 @@ class SpeakerRecognizer:
         features['spectral_centroid'] = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
         features['rms_energy'] = float(np.mean(librosa.feature.rms(y=y)))
         features['zero_crossing_rate'] = float(np.mean(librosa.feature.zero_crossing_rate(y)))
-        features['mfccs'] = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13).mean(axis=1).tolist()
+        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        features['mfccs'] = mfccs.mean(axis=1).tolist()
+        features['mfcc_std'] = mfccs.std(axis=1).tolist()
         
         return features
     
-    def calculate_similarity(self, features1, features2):
-        """计算特征相似度"""
-        similarity = 0
-        for key, weight in self.weights.items():
-            if key == 'mfccs':
-                similarity += weight * np.dot(features1[key], features2[key]) / (
-                    np.linalg.norm(features1[key]) * np.linalg.norm(features2[key]))
-            else:
-                similarity -= weight * abs(features1[key] - features2[key])
-        return similarity
-    
-    def recognize_speakers(self, audio_path, segments, num_speakers=None):
-        """识别说话人"""
+    def save_result(self, audio_path, store, extra=None):
+        """按 output_format 把识别结果写入音频旁边的文件"""
+        path = result_path(audio_path, self.output_format)
         try:
-            print("\n正在分析说话人特征...")
-            all_segments_features = []
-            
-            # 提取特征
-            with tqdm(total=len(segments), desc="处理进度") as pbar:
-                for segment in segments:
-                    start_time = segment.get("start", 0)
-                    end_time = segment.get("end", 0)
-                    features = self.extract_features(audio_path, start_time, end_time)
-                    
-                    all_segments_features.append({
-                        'features': features,
-                        'start': start_time,
-                        'end': end_time,
-                        'text': segment["text"]
-                    })
-                    pbar.update(1)
+            store.write(path, self.output_format, extra)
+            print(f"结果已保存到: {path}")
+        except Exception as e:
+            print(f"保存结果文件时出错: {str(e)}")
+
+    def index_result(self, audio_path, store, names=None):
+        """把刚保存的结果写入全文索引，失败时只打印错误"""
+        if self.search_index is None:
+            return
+        try:
+            self.search_index.add(result_path(audio_path, self.output_format), store, names, audio_path)
+        except Exception as e:
+            print(f"写入搜索索引时出错: {str(e)}")
+
+    def save_audio_index(self, audio_path, audio=None, peaks=None):
+        """写入波形索引并返回路径，失败时只打印错误并返回 None
+
+        audio 为已解码的整段音频，peaks 为提取特征时同步累积的 PeaksBuilder，都没有时由 audio_index 决定
+        复用已有索引中的峰值还是再流式解码一遍。
+        """
+        try:
+            path = write_audio_index(audio_path, audio=audio, peaks=peaks)
+            print(f"波形索引已保存到: {path}")
+            return path
+        except Exception as e:
+            print(f"保存波形索引时出错: {str(e)}")
+            return None
+
+    def feature_table(self, audio_path, store, audio=None, peaks=None):
+        """所有片段的完整特征矩阵（列顺序见 batch_features.FEATURE_NAMES）
+
+        有缓存时按音频内容和片段边界直接读取，否则解码并提取后写入缓存。
+        streaming 模式下没有传入 audio 时边解码边提取，不在内存中保留整段音频。
+        需要解码时顺便把整个文件的波形峰值累积到传入的 PeaksBuilder（命中缓存时不解码，peaks 保持为空）。
+        """
+        from tqdm import tqdm
+        starts = store.starts
+        ends = store.ends
+        
+        cached = self.cache.get_features(audio_path, starts, ends) if self.cache is not None else None
+        feature_table = cached
+        if cached is not None:
+            print("使用缓存的说话人特征")
+        elif audio is None and self.streaming:
+            # 流式解码：每次只保留一组片段覆盖的音频
+            blocks = stream_audio(audio_path) if peaks is None else peaks.tee(stream_audio(audio_path))
+            with metrics.stage("features", segments=len(store), workers=self.num_workers, streaming=True), \
+                    tqdm(total=len(store), desc="处理进度") as pbar:
+                feature_table = extract_features_streaming(
+                    blocks,
+                    starts,
+                    ends,
+                    num_workers=self.num_workers,
+                    progress=metrics.BatchTimer("feature_batch", pbar.update)
+                )
+            if peaks is not None:
+                # 最后一个片段之后的音频特征提取用不到，波形峰值需要读完整个文件
+                for _ in blocks:
+                    pass
+        else:
+            # 整个文件只解码一次，各片段从共享缓冲区切片
+            if audio is None:
+                with metrics.stage("decode") as info:
+                    audio = decode_audio(audio_path)
+                    info["audioSeconds"] = round(len(audio) / SAMPLE_RATE, 2)
+                if peaks is not None:
+                    peaks.add(audio)
+                print(f"音频解码完成: {len(audio) / SAMPLE_RATE:.1f} 秒")
             
-            # 准备特征矩阵
-            feature_matrix = []
-            for segment in all_segments_features:
-                features = []
-                features.extend(segment['features']['mfccs'])
-                features.append(segment['features']['pitch'])
-                features.append(segment['features']['spectral_centroid'])
-                feature_matrix.append(features)
+            # 批量提取特征：每段音频只做一次 STFT，再按帧区间归约到各片段
+            with metrics.stage("features", segments=len(store), workers=self.num_workers), \
+                    tqdm(total=len(store), desc="处理进度") as pbar:
+                feature_table = extract_features_parallel(
+                    audio,
+                    starts,
+                    ends,
+                    num_workers=self.num_workers,
+                    progress=metrics.BatchTimer("feature_batch", pbar.update)
+                )
+        if cached is None and self.cache is not None:
+            self.cache.put_features(audio_path, starts, ends, feature_table)
+        
+        return feature_table
+
+    def overlapped_features(self, audio):
+        """边转录边提取特征的提取器（见 parallel_features.OverlappedFeatureExtractor），使用 num_workers 个线程"""
+        return OverlappedFeatureExtractor(audio, self.num_workers)
+
+    def feature_matrix(self, audio_path, store, audio=None):
+        """聚类使用的特征矩阵：MFCC 均值 + 音高 + 频谱质心"""
+        return self.feature_table(audio_path, store, audio)[:, :CLUSTER_FEATURE_COUNT]
+
+    def match_profiles(self, feature_table, labels):
+        """把各说话人对应到声纹库中的已知说话人，没有声纹库时返回空列表"""
+        if not self.profiles:
+            return []
+        with metrics.stage("profile_match", profiles=len(self.profiles)) as info:
+            matches = self.profiles.match(segment_embeddings(feature_table), labels)
+            info["matched"] = len(matches)
+        for label, (name, score) in sorted(matches.items()):
+            print(f"{speaker_name(label)} 识别为已知说话人: {name}（相似度 {score:.3f}）")
+        return [
+            {"speakerId": speaker_name(label), "name": name, "similarity": round(score, 4)}
+            for label, (name, score) in sorted(matches.items())
+        ]
+
+    def recognize_speakers(self, audio_path, segments, num_speakers=None, audio=None, feature_table=None):
+        """识别说话人
+
+        segments 为片段字典列表或 SegmentStore。
+        audio 为已解码的音频数组（例如转录阶段解码的那一份），为空时从 audio_path 解码。
+        num_speakers 为空或 0 时自动估计说话人数量。
+        feature_table 为转录期间已经提取好的特征（与 segments 一一对应），传入时只做聚类。
+        """
+        try:
+            print("\n正在分析说话人特征...")
+            # 片段存入紧凑的数组存储，丢弃 tokens 等用不到的字段
+            store = SegmentStore.from_segments(segments)
+            # 提取特征需要解码时顺便累积波形峰值，避免为波形索引再解码一遍
+            peaks = PeaksBuilder() if self.audio_index and audio is None else None
+            if feature_table is None:
+                feature_table = self.feature_table(audio_path, store, audio, peaks)
+            elif self.cache is not None:
+                self.cache.put_features(audio_path, store.starts, store.ends, feature_table)
+            feature_matrix = feature_table[:, :CLUSTER_FEATURE_COUNT]
             
-            # 如果未指定说话人数量，使用默认值2
-            if num_speakers is None:
-                num_speakers = 2
-                print(f"未指定说话人数量，使用默认值: {num_speakers}")
+            # 标准化后对每个候选说话人数聚类打分（层次聚类只建一次树），未指定数量时取得分最高的结果
+            with metrics.stage("clustering", segments=len(feature_matrix)) as info:
+                labels, estimate = cluster_speakers(feature_matrix, num_speakers, method=self.clustering)
+                info["method"] = estimate["method"]
+                info["numSpeakers"] = num_speakers or estimate["numSpeakers"]
+            if not num_speakers:
+                num_speakers = estimate["numSpeakers"]
+                print(f"未指定说话人数量，自动估计为: {num_speakers}")
             else:
                 print(f"使用指定的说话人数量: {num_speakers}")
             
-            # 聚类分析
-            clustering = AgglomerativeClustering(
-                n_clusters=num_speakers,
-                linkage='average'
-            )
-            labels = clustering.fit_predict(feature_matrix)
+            with metrics.stage("format", segments=len(store)):
+                store.set_labels(labels)
+                result = {
+                    "segments": store.groups(),
+                    # 各候选说话人数的得分，以及选定数量前后几个候选的标签，界面可以直接切换而不用重新识别；
+                    # 指定了说话人数时不估计，suggested 就是指定的数量、没有候选
+                    "speakerEstimate": {
+                        "numSpeakers": num_speakers,
+                        "suggested": estimate["numSpeakers"] or num_speakers,
+                        "criterion": estimate["criterion"],
+                        "method": estimate["method"],
+                        "candidates": estimate["candidates"]
+                    }
+                }
             
-            # 修改结果格式
-            formatted_segments = []
-            current_speaker = None
-            current_segments = []
-            current_start_time = None
+            # 与声纹库匹配到的已知说话人：[{"speakerId": "说话人1", "name": "...", "similarity": 0.8}]
+            speaker_profiles = self.match_profiles(feature_table, labels)
+            if speaker_profiles:
+                result["speakerProfiles"] = speaker_profiles
             
-            for i, segment in enumerate(all_segments_features):
-                speaker_id = f"说话人{labels[i] + 1}"
-                
-                # 说话人改变时添加到结果中
-                if speaker_id != current_speaker:
-                    if current_segments:
-                        formatted_segments.append({
-                            "speakerId": current_speaker,
-                            "startTime": current_start_time,
-                            "segments": current_segments
-                        })
-                    current_speaker = speaker_id
-                    current_segments = []
-                    current_start_time = float(segment['start'])
-                
-                # 添加当前片段
-                current_segments.append({
-                    "text": str(segment['text']).strip(),
-                    "start": float(segment['start']),
-                    "end": float(segment['end'])
-                })
+            # 波形峰值索引的路径，界面据此绘制波形
+            if self.audio_index:
+                with metrics.stage("audio_index", segments=len(store)):
+                    filled = peaks if peaks is not None and peaks.samples else None
+                    index = self.save_audio_index(audio_path, audio, filled)
+                if index:
+                    result["audioIndex"] = index
             
-            # 添加最后一个说话人的片段
-            if current_segments:
-                formatted_segments.append({
-                    "speakerId": current_speaker,
-                    "startTime": current_start_time,
-                    "segments": current_segments
+            with metrics.stage("save_result", segments=len(store), format=self.output_format):
+                self.save_result(audio_path, store, {
+                    key: value for key, value in result.items() if key != "segments"
                 })
+            
+            if self.search_index is not None:
+                with metrics.stage("search_index", segments=len(store)):
+                    self.index_result(audio_path, store, profile_names(speaker_profiles))
+            
+            return result
 
-            # 转换为 JSON 格式
+        except Exception as e:
+            print(f"说话人识别失败: {str(e)}")
+            raise
+
+    def rediarize(self, audio_path, segments, pinned, labels=None, audio=None):
+        """用户修改部分片段的说话人后重新分配其余片段，不重新聚类
+
+        segments 为按说话人分组的结果（界面的 TranscriptionData.segments）、带标签的 SegmentStore，
+        或片段字典列表加上 labels（每个片段的当前标签，序号或 "说话人N"）。
+        pinned 为 {片段序号: 说话人}，这些片段保持用户指定的说话人，其余片段分配给最近的说话人质心。
+        特征命中缓存时只需一次矩阵运算，数千个片段也在毫秒级完成。
+        """
+        try:
+            if isinstance(segments, list) and segments and "speakerId" in segments[0]:
+                store = SegmentStore.from_groups(segments)
+            else:
+                store = SegmentStore.from_segments(segments)
+                if labels is not None:
+                    store.set_labels([parse_speaker_label(label) for label in labels])
+            pinned = {int(index): parse_speaker_label(label) for index, label in (pinned or {}).items()}
+            if any(label < 0 for label in pinned.values()):
+                raise ValueError("不能把片段固定为未知说话人")
+            if not pinned and store.num_speakers() == 0:
+                raise ValueError("没有可用的说话人标签，请先固定至少一个片段的说话人")
+            
+            feature_matrix = self.feature_matrix(audio_path, store, audio)
+            
+            with metrics.stage("rediarize", segments=len(store), pinned=len(pinned)) as info:
+                previous = store.labels.copy()
+                new_labels = assign_to_centroids(feature_matrix, previous, pinned)
+                changed = int((new_labels != previous).sum())
+                store.set_labels(new_labels)
+                info["changed"] = changed
+            print(f"重新分配说话人: 固定 {len(pinned)} 个片段, 改变 {changed} 个片段")
+            
             result = {
-                "segments": formatted_segments
+                "segments": store.groups(),
+                "rediarization": {
+                    "pinned": len(pinned),
+                    "changed": changed,
+                    "numSpeakers": len(np.unique(new_labels[new_labels >= 0]))
+                }
             }
             
-            # 保存结果到文件
-            base_name = os.path.splitext(audio_path)[0]
-            result_path = f"{base_name}_说话人识别结果.json"
-
-            try:
-                # 确保 JSON 格式正确
-                json_str = json.dumps(result, ensure_ascii=False, indent=2)
-                # 使用二进制模式写入，避免编码问题
-                with open(result_path, 'w', encoding='utf-8') as f:
-                    # 确保写入前没有 BOM
-                    if not f.tell():  # 如果在文件开始
-                        f.write(json_str)
-                    else:
-                        f.seek(0)
-                        f.write(json_str)
-                        f.truncate()
-                print(f"结果已保存到: {result_path}")
-            except Exception as e:
-                print(f"保存结果文件时出错: {str(e)}")
+            with metrics.stage("save_result", segments=len(store), format=self.output_format):
+                self.save_result(audio_path, store, {"rediarization": result["rediarization"]})
+            self.index_result(audio_path, store)
             
             return result
 
         except Exception as e:
-            print(f"说话人识别失败: {str(e)}")
+            print(f"重新分配说话人失败: {str(e)}")
             raise
 
-def recognize_speakers(audio_path, segments, num_speakers=None):
+def recognize_speakers(audio_path, segments, num_speakers=None, num_workers=1, clustering="auto", output_format="json"):
     """便捷函数用于直接调用说话人识别"""
-    recognizer = SpeakerRecognizer()
+    recognizer = SpeakerRecognizer(num_workers=num_workers, clustering=clustering, output_format=output_format)
     return recognizer.recognize_speakers(audio_path, segments, num_speakers) 
\ No newline at end of file
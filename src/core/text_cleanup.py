@@ -0,0 +1,42 @@
+import re
+
+# 连续重复时只保留一个的语气词和助词
+REPEATED_PARTICLES = "的了吗呢嘛啊哦额"
+# 连续出现时只保留第一个的标点（半角逗号在扫描前已转为全角）
+PUNCTUATION = "，。！？；："
+# 拼接整段文本时使用的分隔符，不会出现在转录文本中，也不属于空白
+SEPARATOR = "\x00"
+
+# 一次扫描完成所有替换：重复的语气词和连续的标点只保留第一个（分组 1、2），
+# 连续空白或单个非空格的空白字符替换为一个空格（没有分组）；单个空格不匹配，减少回调次数
+_CLEANUP_PATTERN = re.compile(
+    rf"([{REPEATED_PARTICLES}])\1+"
+    rf"|([{PUNCTUATION}])(?:\s*[{PUNCTUATION}])+"
+    r"|\s{2,}|[^\S ]"
+)
+
+
+def _replace(match):
+    group = match.lastindex
+    return match.group(group) if group else " "
+
+
+def clean_text(text):
+    """清理一段文本：重复的语气词（任意次数）合并为一个，连续标点只保留第一个，
+    半角逗号转为全角，空白合并为一个空格并去掉首尾空白"""
+    return _CLEANUP_PATTERN.sub(_replace, text.replace(",", "，")).strip()
+
+
+def clean_texts(texts):
+    """批量清理：把所有文本用分隔符拼接后只做一次正则扫描，再切分回来"""
+    if not texts:
+        return []
+    joined = SEPARATOR.join(text.replace(SEPARATOR, "") for text in texts).replace(",", "，")
+    return [text.strip() for text in _CLEANUP_PATTERN.sub(_replace, joined).split(SEPARATOR)]
+
+
+def clean_segments(segments):
+    """就地清理片段字典列表中的 text 字段，返回同一个列表"""
+    for segment, text in zip(segments, clean_texts([segment["text"] for segment in segments])):
+        segment["text"] = text
+    return segments
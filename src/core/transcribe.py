@@ -1,54 +1,330 @@
 import sys
 import os
+import json
+import argparse
+from contextlib import nullcontext
+import metrics
 from whisper_transcriber import WhisperTranscriber
-from speaker_recognizer import SpeakerRecognizer
+from speaker_recognizer import SpeakerRecognizer, result_path
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
+from speaker_clustering import CLUSTERING_BACKENDS
+from segment_store import SegmentStore, OUTPUT_FORMATS
+from decoding_profiles import DECODING_PROFILES, DEFAULT_PROFILE
+from speaker_profiles import SpeakerProfileStore, DEFAULT_PROFILE_PATH
+from transcript_search import TranscriptIndex, DEFAULT_SEARCH_INDEX_PATH
+from chunked_transcriber import CHUNK_SECONDS
 
-def main():
-    if len(sys.argv) < 2:
-        print("请提供音频文件路径")
-        return
+def emit_event(event, **payload):
+    """常驻模式下输出一条 JSON 事件，Electron 端按 EVENT: 前缀识别"""
+    message = {"event": event}
+    message.update(payload)
+    print("EVENT:" + json.dumps(message, ensure_ascii=False), flush=True)
+
+def parse_num_speakers(value, default=2):
+    """说话人数量：0 或 "auto" 表示自动估计（返回 None），未提供时使用默认值"""
+    if value is None or value == "":
+        return default
+    if str(value).lower() == "auto":
+        return None
+    return int(value) or None
+
+def run_job(transcriber, recognizer, audio_path, num_speakers=2, model_size="small", report_progress=None,
+            chunked=False, chunk_workers=None, on_event=None, streaming=False, chunk_seconds=CHUNK_SECONDS,
+            overlap_features=True):
+    """执行一次转录和说话人识别，返回识别结果
 
-    audio_path = sys.argv[1]
-    num_speakers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
-    model_size = sys.argv[3] if len(sys.argv) > 3 else "small"
+    recognizer.cache 不为空时，转录片段和说话人特征都会先查缓存。
+    chunked 为 True 时使用分块并行转录。
+    streaming 为 True 时边解码边分块转录，不在内存中保留整段音频，内存占用由 chunk_seconds 决定；
+    说话人特征由 recognizer 再流式解码一遍提取（recognizer.streaming 应同时为 True）。
+    整段转录时默认边转录边提取说话人特征（overlap_features），转录结束后只剩聚类。
+    on_event(event, **payload) 用于流式输出：每解码出一个片段发送 segment 事件，
+    说话人识别完成后发送 speakers 事件。
+    """
+    report_progress = report_progress or (lambda progress: None)
+    on_event = on_event or (lambda event, **payload: None)
+    cache = recognizer.cache
+    # 分块转录和量化模型的结果与整段、未量化的转录不同，缓存键需要区分；流式转录的分块与分块转录相同
+    cache_options = transcriber.cache_options(chunked or streaming)
 
     print(f"处理文件: {audio_path}")
-    print(f"说话人数量: {num_speakers}")
+    print(f"说话人数量: {num_speakers or '自动'}")
     print(f"使用模型: {model_size}")
+    print(f"解码档位: {transcriber.profile}")
+
+    # 片段直接追加到紧凑的数组存储中，不保留 whisper 片段里的 tokens 等字段
+    result = SegmentStore()
+    last_progress = [0]
+    audio = None
+    # 边转录边提取特征的提取器，只在整段转录时使用
+    overlapped = None
+
+    def add_segment(segment, duration):
+        """记录一个片段并立即发送，进度按片段结束时间占音频时长的比例计算（转录占 90%）"""
+        index = len(result)
+        result.append(segment['start'], segment['end'], segment['text'])
+        on_event("segment", index=index, text=result.texts[index], start=segment['start'], end=segment['end'])
+        if overlapped is not None:
+            overlapped.add(segment['start'], segment['end'])
+
+        progress = int(90 * min(segment['end'] / duration, 1.0)) if duration > 0 else 0
+        if progress > last_progress[0]:
+            last_progress[0] = progress
+            report_progress(progress)
+
+    cached = None
+    if cache is not None:
+        # 缓存可能与其他线程共用，只统计本任务（本线程）的查询
+        cache_before = cache.thread_stats()
+        cached = cache.get_segments(audio_path, model_size, cache_options)
+
+    if cached is not None:
+        print("使用缓存的转录结果")
+        duration = cached[-1]['end'] if cached else 0
+        for segment in cached:
+            add_segment(segment, duration)
+    elif streaming:
+        # 流式转录不保留音频，说话人识别时再流式解码一次
+        segments = transcriber.transcribe_stream(audio_path, model_size, chunk_workers, chunk_seconds)
+        duration = segments[-1]['end'] if segments else 0
+        for segment in segments:
+            add_segment(segment, duration)
+    else:
+        # 只解码一次，转录和说话人识别共用同一份音频数据
+        audio = transcriber.prepare_audio(audio_path)
+        if chunked:
+            # 分块转录各块乱序完成，拼接后再统一发送
+            segments = transcriber.transcribe_chunked(audio_path, model_size, chunk_workers, chunk_seconds, audio=audio)
+            duration = segments[-1]['end'] if segments else 0
+            for segment in segments:
+                add_segment(segment, duration)
+        else:
+            if overlap_features:
+                overlapped = recognizer.overlapped_features(audio)
+            try:
+                transcriber.transcribe(audio_path, model_size, on_segment=add_segment, audio=audio)
+            except BaseException:
+                if overlapped is not None:
+                    overlapped.close()
+                raise
+
+    if cached is None and cache is not None and len(result):
+        cache.put_segments(audio_path, model_size, cache_options, result.records())
+
+    report_progress(90)
+
+    feature_table = None
+    if overlapped is not None:
+        # 转录期间各组特征已在后台计算，这里只等待最后一组
+        with metrics.stage("features", segments=len(result), workers=recognizer.num_workers, overlapped=True):
+            feature_table = overlapped.finish()
 
-    transcriber = WhisperTranscriber()
-    segments = transcriber.transcribe(audio_path, model_size)
-
-    # 处理结果
-    print("PROGRESS:50")
-    result = []
-    for segment in segments:
-        result.append({
-            'text': segment['text'],
-            'start': segment['start'],
-            'end': segment['end']
-        })
-        
     # 调用说话人识别
     print("开始说话人识别...")
-    recognizer = SpeakerRecognizer()
-    formatted_text = recognizer.recognize_speakers(audio_path, result, num_speakers)
-    
+    speaker_result = recognizer.recognize_speakers(audio_path, result, num_speakers, audio=audio,
+                                                   feature_table=feature_table)
+    on_event("speakers", labels=[
+        group["speakerId"] for group in speaker_result["segments"] for _ in group["segments"]
+    ], numSpeakers=speaker_result["speakerEstimate"]["numSpeakers"])
+
+    if cache is not None:
+        stats = cache_stats_since(cache, cache_before)
+        print(f"缓存命中: {stats['hits']}, 未命中: {stats['misses']}")
+    report_progress(100)
+    return speaker_result
+
+def cache_stats_since(cache, before):
+    """当前线程自 before（thread_stats 的快照）以来的缓存命中统计"""
+    now = cache.thread_stats()
+    return {key: now[key] - before[key] for key in now}
+
+def create_cache(args):
+    """根据命令行参数创建缓存，--no-cache 时返回 None"""
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+
+def create_speaker_profiles(args):
+    """根据命令行参数加载声纹库，未指定 --speaker-profiles 时返回 None"""
+    if not args.speaker_profiles:
+        return None
+    profiles = SpeakerProfileStore(args.speaker_profiles)
+    print(f"已加载声纹库: {profiles.path}（{len(profiles)} 个已知说话人）")
+    return profiles
+
+def create_search_index(args):
+    """根据命令行参数打开全文索引，未指定 --search-index 时返回 None"""
+    if not args.search_index:
+        return None
+    index = TranscriptIndex(args.search_index)
+    print(f"识别结果将写入搜索索引: {index.path}")
+    return index
+
+def run_worker(cache=None, clustering="auto", profiler=None, output_format="json", decoding_profile=DEFAULT_PROFILE,
+               speaker_profiles=None, streaming=False, chunk_seconds=CHUNK_SECONDS, warmup_model=None,
+               audio_index=True, search_index=None):
+    """常驻模式：模型只加载一次，从 stdin 逐行读取任务
+
+    每行一个 JSON 任务: {"id": "1", "audio_path": "...", "num_speakers": 2, "model_size": "small", "profile": "fast"}
+    num_speakers 为 0 或 "auto" 时自动估计说话人数量；profile 为解码档位，省略时使用 decoding_profile。
+    每个任务在转录过程中输出 segment 和 progress 事件，说话人识别后输出 speakers 事件，
+    最后输出 result 或 error 事件。stdin 关闭后退出。
+    用户在界面上修改说话人后发送 {"id": "2", "type": "rediarize", "audio_path": "...",
+    "segments": [按说话人分组的片段], "pinned": {"片段序号": "说话人N"}}，
+    只重新分配未固定的片段（特征取自缓存），直接输出 result 事件。
+    各阶段的耗时以带任务 id 的 METRIC: 行输出；传入 profiler 时每个任务结束后更新分析文件。
+    streaming 为 True 时所有任务都流式解码（见 run_job）。
+    传入 warmup_model 时在后台预先加载该模型和说话人识别的依赖，ready 事件不等待预热完成。
+    audio_index 为 True 时每个任务在结果旁边写入波形索引，result 事件中的 audioIndex 为其路径。
+    传入 search_index（TranscriptIndex）时每个任务的结果保存后写入全文索引。
+    """
+    transcriber = WhisperTranscriber(profile=decoding_profile)
+    recognizer = SpeakerRecognizer(
+        cache=cache, clustering=clustering, output_format=output_format, profiles=speaker_profiles,
+        streaming=streaming, audio_index=audio_index, search_index=search_index
+    )
+    if warmup_model:
+        transcriber.warmup(warmup_model)
+        recognizer.warmup()
+    emit_event("ready")
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        job_id = None
+        cache_before = cache.thread_stats() if cache is not None else None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            metrics.set_context(id=job_id)
+            if job.get("type") == "rediarize":
+                with metrics.stage("job", type="rediarize"):
+                    result = recognizer.rediarize(
+                        job["audio_path"],
+                        job["segments"],
+                        job.get("pinned"),
+                        labels=job.get("labels")
+                    )
+                emit_event("result", id=job_id, result=result,
+                           cache=cache_stats_since(cache, cache_before) if cache is not None else None)
+                continue
+            model_size = job.get("model_size") or "small"
+            transcriber.set_profile(job.get("profile") or decoding_profile)
+            with metrics.stage("job", model=model_size, profile=transcriber.profile):
+                result = run_job(
+                    transcriber,
+                    recognizer,
+                    job["audio_path"],
+                    parse_num_speakers(job.get("num_speakers")),
+                    model_size,
+                    lambda progress: emit_event("progress", id=job_id, progress=progress),
+                    chunked=bool(job.get("chunked")),
+                    chunk_workers=job.get("chunk_workers"),
+                    on_event=lambda event, **payload: emit_event(event, id=job_id, **payload),
+                    streaming=streaming,
+                    chunk_seconds=chunk_seconds
+                )
+            emit_event("result", id=job_id, result=result,
+                       cache=cache_stats_since(cache, cache_before) if cache is not None else None)
+        except Exception as e:
+            print(f"任务处理失败: {str(e)}")
+            emit_event("error", id=job_id, message=str(e))
+        finally:
+            metrics.set_context()
+            if profiler is not None:
+                profiler.dump()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="音频转录和说话人识别")
+    parser.add_argument("audio_path", nargs="?", help="音频文件路径")
+    parser.add_argument("num_speakers", nargs="?", type=parse_num_speakers, default=2, help="说话人数量，0 或 auto 表示自动估计")
+    parser.add_argument("model_size", nargs="?", default="small", help="Whisper 模型大小")
+    parser.add_argument("--worker", action="store_true", help="常驻模式，从 stdin 读取任务")
+    parser.add_argument("--chunked", action="store_true", help="在静音处切分音频并行转录（适合长录音）")
+    parser.add_argument("--chunk-workers", type=int, default=None, help="分块转录的进程数，默认使用全部 CPU 核心")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS, help="分块转录每块的目标时长（秒）")
+    parser.add_argument("--streaming", action="store_true",
+                        help="流式解码，不在内存中保留整段音频（适合数小时的录音）；"
+                             "内存占用约为 (进程数 + 3) × --chunk-seconds 秒的音频，与录音时长无关")
+    parser.add_argument("--clustering", choices=["auto"] + list(CLUSTERING_BACKENDS), default="auto",
+                        help="聚类方法，auto 在片段很多时改用 mini-batch k-means")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="缓存大小上限 (MB)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用缓存")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json",
+                        help="结果文件格式：json（压缩）、jsonl（每行一个片段）、columnar（二进制列存储）")
+    parser.add_argument("--decoding-profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE,
+                        help="解码档位：fast（贪心解码 + CPU 上 int8 量化）、balanced（贪心解码）、accurate（beam search）")
+    parser.add_argument("--speaker-profiles", nargs="?", const=DEFAULT_PROFILE_PATH, default=None, metavar="PATH",
+                        help="用声纹库识别已知说话人，省略 PATH 时使用默认声纹库（见 speaker_profiles.py）")
+    parser.add_argument("--no-audio-index", action="store_true",
+                        help="不在结果旁边写入波形峰值索引（见 audio_index.py）")
+    parser.add_argument("--search-index", nargs="?", const=DEFAULT_SEARCH_INDEX_PATH, default=None, metavar="PATH",
+                        help="把识别结果写入全文索引，省略 PATH 时使用默认索引（见 transcript_search.py）")
+    parser.add_argument("--warmup", action="store_true",
+                        help="在后台预先导入依赖并加载 model_size 指定的模型（常驻模式在等待任务时加载，"
+                             "单次运行时与音频解码同时进行）")
+    parser.add_argument("--profile", metavar="PATH", default=None, help="用 cProfile 分析并把 pstats 结果写入 PATH")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    profiler = metrics.Profiler(args.profile) if args.profile else None
+
+    if args.worker:
+        with profiler or nullcontext():
+            run_worker(create_cache(args), args.clustering, profiler, args.output_format, args.decoding_profile,
+                       create_speaker_profiles(args), args.streaming, args.chunk_seconds,
+                       args.model_size if args.warmup else None, not args.no_audio_index,
+                       create_search_index(args))
+        return
+
+    if not args.audio_path:
+        print("请提供音频文件路径")
+        return
+
+    audio_path = args.audio_path
+
+    with profiler or nullcontext(), metrics.stage("job", model=args.model_size, profile=args.decoding_profile):
+        transcriber = WhisperTranscriber(profile=args.decoding_profile)
+        recognizer = SpeakerRecognizer(cache=create_cache(args), clustering=args.clustering,
+                                       output_format=args.output_format, profiles=create_speaker_profiles(args),
+                                       streaming=args.streaming, audio_index=not args.no_audio_index,
+                                       search_index=create_search_index(args))
+        if args.warmup:
+            # 模型加载与音频解码同时进行；分块转录在子进程中加载模型，不需要预热
+            if not (args.chunked or args.streaming):
+                transcriber.warmup(args.model_size)
+            recognizer.warmup()
+        run_job(
+            transcriber,
+            recognizer,
+            audio_path,
+            args.num_speakers,
+            args.model_size,
+            lambda progress: print(f"PROGRESS:{progress}"),
+            chunked=args.chunked,
+            chunk_workers=args.chunk_workers,
+            streaming=args.streaming,
+            chunk_seconds=args.chunk_seconds
+        )
+
     # 确认结果文件已生成
-    result_path = audio_path.replace('.mp3', '_说话人识别结果.txt')
-    if os.path.exists(result_path):
-        with open(result_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            print(f"结果文件内容长度: {len(content)}")
-            if content.strip():
-                print("结果文件生成成功")
-            else:
-                print("警告: 结果文件为空")
+    path = result_path(audio_path, args.output_format)
+    if os.path.exists(path):
+        size = os.path.getsize(path)
+        print(f"结果文件大小: {size} 字节")
+        if size:
+            print("结果文件生成成功")
+        else:
+            print("警告: 结果文件为空")
     else:
-        print(f"警告: 结果文件未生成: {result_path}")
-        
-    print("PROGRESS:100")
+        print(f"警告: 结果文件未生成: {path}")
+
     print("转录完成")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
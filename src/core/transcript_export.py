@@ -0,0 +1,263 @@
+"""转录结果导出：从 SegmentStore 流式写出字幕和文本
+
+支持的格式:
+  srt    SubRip 字幕，文本前加 "说话人N："
+  vtt    WebVTT 字幕，说话人用 <v 说话人N> 标注
+  txt    与 音频文件_说话人识别结果.txt 相同的纯文本：同一说话人的连续片段合并为一段
+  jsonl  每行一个片段 {"start", "end", "speaker", "text"}，方便其他工具逐行读取
+  md     Markdown，每段以说话人和时间开头
+
+片段按 CHUNK_SEGMENTS 个一块格式化后写入文件，时间戳按块用 NumPy 计算，
+内存占用只与块大小有关，与转录长度无关。可以只导出某个时间范围或某几个说话人。
+
+用法:
+    python transcript_export.py 识别结果.json --format srt
+    python transcript_export.py 识别结果.segcol --format vtt --start 600 --end 1200 --rebase
+    python transcript_export.py 识别结果.json --format txt --speaker 说话人2 --output 说话人2.txt
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from segment_store import OUTPUT_SUFFIXES, speaker_name, parse_speaker_label
+
+EXPORT_FORMATS = ("srt", "vtt", "txt", "jsonl", "md")
+EXPORT_SUFFIXES = {"srt": ".srt", "vtt": ".vtt", "txt": ".txt", "jsonl": ".jsonl", "md": ".md"}
+# 每次格式化并写入的片段数
+CHUNK_SEGMENTS = 1000
+# 识别结果文件名中的标记（见 speaker_recognizer.result_path）；导出文件使用另外的标记，不会覆盖结果
+RESULT_MARK = "_说话人识别结果"
+EXPORT_MARK = "_转录导出"
+
+
+def export_path(audio_path, export_format):
+    """导出文件路径：音频旁边的 {文件名}_转录导出.{srt|vtt|txt|jsonl|md}"""
+    return f"{os.path.splitext(audio_path)[0]}{EXPORT_MARK}{EXPORT_SUFFIXES[export_format]}"
+
+
+def is_result_path(path):
+    """path 是否为某个音频任一格式的识别结果文件（{文件名}_说话人识别结果.{json|jsonl|segcol}）"""
+    name = os.path.basename(path)
+    return any(name.endswith(RESULT_MARK + suffix) for suffix in OUTPUT_SUFFIXES.values())
+
+
+def select_segments(store, start=None, end=None, speakers=None):
+    """与 [start, end) 有重叠、且说话人在 speakers 中的片段序号（按时间顺序）
+
+    speakers 为说话人序号或 "说话人N" 名称的列表，None 表示不过滤。
+    """
+    mask = np.ones(len(store), dtype=bool)
+    if start is not None:
+        mask &= store.ends > start
+    if end is not None:
+        mask &= store.starts < end
+    if speakers:
+        mask &= np.isin(store.labels, [parse_speaker_label(speaker) for speaker in speakers])
+    return np.flatnonzero(mask)
+
+
+def clock_parts(seconds):
+    """秒数数组 -> (时, 分, 秒, 毫秒) 整数列表，按毫秒四舍五入"""
+    milliseconds = np.round(np.maximum(seconds, 0) * 1000).astype(np.int64)
+    hours, milliseconds = np.divmod(milliseconds, 3600000)
+    minutes, milliseconds = np.divmod(milliseconds, 60000)
+    secs, milliseconds = np.divmod(milliseconds, 1000)
+    return hours.tolist(), minutes.tolist(), secs.tolist(), milliseconds.tolist()
+
+
+def subtitle_times(seconds, separator):
+    """字幕时间戳 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（VTT）"""
+    return [
+        f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}"
+        for h, m, s, ms in zip(*clock_parts(seconds))
+    ]
+
+
+def short_times(seconds):
+    """段落时间 MM:SS，超过一小时时为 H:MM:SS"""
+    return [
+        f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+        for h, m, s, _ in zip(*clock_parts(np.floor(seconds)))
+    ]
+
+
+def escape_vtt(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class TranscriptExporter:
+    """把选中的片段按块格式化，写入文本文件对象
+
+    names 把说话人序号映射为显示名（例如声纹库中的姓名），没有时使用 "说话人N"；
+    标签为 -1（未识别说话人）的片段不加说话人。
+    rebase=True 时时间从 start 开始计为 0，并截断到 [start, end) 以内，用于给剪辑出的片段配字幕。
+    """
+
+    def __init__(self, export_format, names=None, start=None, end=None, rebase=False, title=None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"未知的导出格式: {export_format}")
+        self.export_format = export_format
+        self.names = names or {}
+        self.start = start
+        self.end = end
+        self.rebase = rebase
+        self.title = title
+        # 字幕的序号、txt/md 中上一段的说话人，跨块保持
+        self.number = 0
+        self.previous = None
+        self.paragraph = []
+
+    def speaker(self, label):
+        if label < 0:
+            return None
+        return self.names.get(label) or speaker_name(label)
+
+    def times(self, starts, ends):
+        if self.rebase:
+            low = self.start or 0.0
+            high = self.end if self.end is not None else np.inf
+            starts = np.clip(starts, low, high) - low
+            ends = np.clip(ends, low, high) - low
+        return starts, ends
+
+    def write(self, f, store, indices):
+        """写出 store 中 indices 对应的片段，返回写出的片段数"""
+        f.write(self.begin())
+        for offset in range(0, len(indices), CHUNK_SEGMENTS):
+            chunk = indices[offset:offset + CHUNK_SEGMENTS]
+            starts, ends = self.times(store.starts[chunk], store.ends[chunk])
+            texts = [store.texts[i] for i in chunk.tolist()]
+            f.write(self.format_chunk(starts, ends, store.labels[chunk].tolist(), texts))
+        f.write(self.finish())
+        return len(indices)
+
+    def begin(self):
+        if self.export_format == "vtt":
+            return "WEBVTT\n\n"
+        if self.export_format == "md" and self.title:
+            return f"# {self.title}\n\n"
+        return ""
+
+    def format_chunk(self, starts, ends, labels, texts):
+        if self.export_format in ("srt", "vtt"):
+            return self.format_subtitles(starts, ends, labels, texts)
+        if self.export_format == "jsonl":
+            return "".join(
+                json.dumps({"start": start, "end": end, "speaker": self.speaker(label), "text": text},
+                           ensure_ascii=False, separators=(",", ":")) + "\n"
+                for start, end, label, text in zip(starts.tolist(), ends.tolist(), labels, texts)
+            )
+        return self.format_paragraphs(starts, labels, texts)
+
+    def format_subtitles(self, starts, ends, labels, texts):
+        vtt = self.export_format == "vtt"
+        separator = "." if vtt else ","
+        lines = []
+        for begin, end, label, text in zip(subtitle_times(starts, separator), subtitle_times(ends, separator),
+                                           labels, texts):
+            self.number += 1
+            speaker = self.speaker(label)
+            if vtt:
+                text = escape_vtt(text)
+                if speaker:
+                    text = f"<v {escape_vtt(speaker)}>{text}"
+            elif speaker:
+                text = f"{speaker}：{text}"
+            lines.append(f"{self.number}\n{begin} --> {end}\n{text}\n\n")
+        return "".join(lines)
+
+    def format_paragraphs(self, starts, labels, texts):
+        """同一说话人的连续片段合并为一段；上一块末尾未结束的段落留到下一块或 finish"""
+        lines = []
+        for time, label, text in zip(short_times(starts), labels, texts):
+            if self.paragraph and label == self.previous:
+                self.paragraph.append(text)
+                continue
+            lines.append(self.flush_paragraph())
+            self.previous = label
+            self.paragraph = [self.paragraph_head(label, time), text]
+        return "".join(lines)
+
+    def paragraph_head(self, label, time):
+        speaker = self.speaker(label)
+        if self.export_format == "md":
+            return f"**{speaker}** `{time}`\n\n" if speaker else f"`{time}`\n\n"
+        return f"{speaker} [{time}]：" if speaker else f"[{time}] "
+
+    def flush_paragraph(self):
+        if not self.paragraph:
+            return ""
+        head, texts = self.paragraph[0], self.paragraph[1:]
+        self.paragraph = []
+        return head + "".join(texts) + "\n\n"
+
+    def finish(self):
+        return self.flush_paragraph()
+
+
+def export_transcript(store, path, export_format, start=None, end=None, speakers=None, names=None,
+                      rebase=False, title=None):
+    """把 store 导出到 path（"-" 表示标准输出），返回导出的片段数
+
+    path 为识别结果文件名时抛出 ValueError：导出的格式不同，覆盖后重新分配说话人、检索和缓存都会读错。
+    """
+    if path != "-" and is_result_path(path):
+        raise ValueError(f"导出路径与识别结果文件重名: {path}")
+    indices = select_segments(store, start, end, speakers)
+    exporter = TranscriptExporter(export_format, names, start, end, rebase, title)
+    if path == "-":
+        return exporter.write(sys.stdout, store, indices)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        return exporter.write(f, store, indices)
+
+
+def parse_speaker(value):
+    """--speaker 参数: "说话人N" 名称或从 0 开始的序号"""
+    try:
+        return parse_speaker_label(value if not value.isdigit() else int(value))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_name(value):
+    """--name 参数: 说话人=显示名，例如 说话人1=张三 或 0=张三"""
+    speaker, separator, name = value.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"格式应为 说话人=显示名: {value}")
+    return parse_speaker(speaker), name
+
+
+def main():
+    from recognize_speakers import load_segments
+
+    parser = argparse.ArgumentParser(description="导出转录结果为字幕或文本")
+    parser.add_argument("result", help="识别结果（.json / .jsonl / .segcol），或 Whisper 输出的语音片段 JSON")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="srt", help="导出格式")
+    parser.add_argument("--start", type=float, default=None, help="只导出该时间（秒）之后的片段")
+    parser.add_argument("--end", type=float, default=None, help="只导出该时间（秒）之前的片段")
+    parser.add_argument("--speaker", type=parse_speaker, action="append", default=[], metavar="说话人N",
+                        help="只导出该说话人的片段（可重复）")
+    parser.add_argument("--name", type=parse_name, action="append", default=[], metavar="说话人=显示名",
+                        help="说话人的显示名（可重复）")
+    parser.add_argument("--rebase", action="store_true", help="时间从 --start 开始计为 0 并截断到范围内")
+    parser.add_argument("--title", default=None, help="Markdown 标题，默认使用文件名")
+    parser.add_argument("--output", default=None, help="输出路径，默认为结果文件旁边的 {文件名}_转录导出.{格式}，- 表示标准输出")
+    args = parser.parse_args()
+
+    base = os.path.splitext(args.result)[0]
+    if base.endswith(RESULT_MARK):
+        base = base[:-len(RESULT_MARK)]
+    output = args.output or base + EXPORT_MARK + EXPORT_SUFFIXES[args.format]
+    if output != "-" and (os.path.abspath(output) == os.path.abspath(args.result) or is_result_path(output)):
+        parser.error(f"输出路径不能是识别结果文件: {output}")
+    store = load_segments(args.result)
+    title = args.title or os.path.basename(base)
+    count = export_transcript(store, output, args.format, args.start, args.end, args.speaker,
+                              dict(args.name), args.rebase, title)
+    if output != "-":
+        print(f"已导出 {count} 个片段到: {output}")
+
+
+if __name__ == "__main__":
+    main()
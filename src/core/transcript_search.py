@@ -0,0 +1,431 @@
+"""转录历史的全文检索：在所有识别结果中查找"谁在什么时候说了什么"
+
+索引是一个 SQLite 数据库，片段文本放在 FTS5 全文索引中。SQLite 自带的分词器不会切分中文，
+这里在写入和查询前自行切分：连续的中日韩文字切成重叠的二元组（"物质身体" -> 物质 质身 身体），
+每段末尾的字再单独作为一个词，其余文字按单词切分并转为小写。
+查询词按同样的方式切分后作为 FTS5 短语查询，相邻的二元组必须连续出现，等价于子串匹配；
+单个汉字结尾的查询用前缀查询匹配以该字开头的二元组（FTS5 另建单字前缀索引，
+"的"、"是" 这样的常用字不需要合并所有以它开头的二元组）。FTS5 表不保存内容，原文只在片段表中保存一份。
+
+识别器传入 search_index 时每个任务保存结果后立即写入索引；也可以用命令行增量导入已有的结果文件，
+文件大小和修改时间未变的结果会跳过。
+
+用法:
+    python transcript_search.py ingest 目录或结果文件 [...]
+    python transcript_search.py search 物质 [--speaker 说话人2] [--start 600 --end 1200] [--limit 20]
+    python transcript_search.py prune
+    python transcript_search.py optimize    # 大量导入后合并索引
+    python transcript_search.py stats
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import unicodedata
+from pathlib import Path
+from segment_store import SegmentStore, speaker_name, parse_speaker_label
+
+# 索引默认路径；与声纹库放在一起，不放在缓存目录中，避免被缓存淘汰删除
+DEFAULT_SEARCH_INDEX_PATH = os.environ.get(
+    "TINGYIN_SEARCH_INDEX", str(Path.home() / ".local" / "share" / "tingyin" / "transcripts.sqlite")
+)
+# 切分规则或表结构变化时递增，旧索引会被清空后重新导入
+SCHEMA_VERSION = 1
+# 识别结果文件名的后缀，导入目录时按此查找（见 speaker_recognizer.result_path）
+RESULT_PATTERNS = ("*_说话人识别结果.json", "*_说话人识别结果.jsonl", "*_说话人识别结果.segcol")
+# 摘要中匹配位置前后保留的字数
+SNIPPET_CONTEXT = 20
+
+# 中日韩文字：平假名/片假名、扩展 A、基本区、兼容汉字、韩文音节
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_RUNS = re.compile(f"([{_CJK}]+)|((?:(?![{_CJK}])[^\\W_])+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    audio TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    segments INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    speaker INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_file ON segments(file_id);
+CREATE TABLE IF NOT EXISTS speakers (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    label INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (file_id, label)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens, content='', prefix='1');
+"""
+
+
+def _runs(text):
+    """规范化（全角转半角、小写）后切成 (是否中日韩文字, 文字段) 列表"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return [(bool(cjk), cjk or word) for cjk, word in _RUNS.findall(text)]
+
+
+def _run_tokens(run):
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize(text):
+    """写入索引的词：中日韩文字的二元组加每段末尾的单字，其余为小写单词，以空格分隔"""
+    tokens = []
+    for cjk, run in _runs(text):
+        tokens.extend(_run_tokens(run) if cjk else [run])
+    return " ".join(tokens)
+
+
+def match_expression(query):
+    """把查询转换为 FTS5 MATCH 表达式，以空白分隔的多个词需要同时出现（AND）
+
+    每个词切分后为一个短语。词以中日韩文字结尾时不带末尾的单字（索引中该字后面可能还有文字），
+    末尾只有一个汉字时改为前缀查询。没有可检索的文字时抛出 ValueError。
+    """
+    phrases = []
+    for term in query.split():
+        runs = _runs(term)
+        if not runs:
+            continue
+        tokens = []
+        for cjk, run in runs[:-1]:
+            tokens.extend(_run_tokens(run) if cjk else [run])
+        cjk, run = runs[-1]
+        prefix = cjk and len(run) == 1
+        if cjk and not prefix:
+            tokens.extend(_run_tokens(run)[:-1])
+        else:
+            tokens.append(run)
+        phrases.append('"' + " ".join(tokens) + '"' + (" *" if prefix else ""))
+    if not phrases:
+        raise ValueError(f"查询中没有可检索的文字: {query}")
+    return " AND ".join(phrases)
+
+
+def snippet(text, query, context=SNIPPET_CONTEXT, marks=("[", "]")):
+    """匹配位置前后各 context 个字的摘要，匹配的部分用 marks 标出；找不到原样匹配时返回开头部分"""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    if len(normalized) != len(text):
+        text = normalized
+    spans = []
+    for term in query.split():
+        term = unicodedata.normalize("NFKC", term).lower()
+        position = normalized.find(term)
+        if position >= 0:
+            spans.append((position, position + len(term)))
+    if not spans:
+        return text[:2 * context] + ("…" if len(text) > 2 * context else "")
+    begin, end = min(spans)
+    left = max(begin - context, 0)
+    right = min(end + context, len(text))
+    return ("…" if left else "") + text[left:begin] + marks[0] + text[begin:end] + marks[1] + \
+        text[end:right] + ("…" if right < len(text) else "")
+
+
+def read_result(path):
+    """读取识别结果文件，返回 (SegmentStore, {说话人序号: 姓名})
+
+    姓名来自 json 结果中的 speakerProfiles（声纹库匹配到的已知说话人），.jsonl 和 .segcol 结果没有姓名。
+    """
+    if str(path).endswith(".segcol"):
+        return SegmentStore.read_columnar(path), {}
+    if str(path).endswith(".jsonl"):
+        return SegmentStore.read_jsonl(path), {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    segments = data.get("segments", [])
+    if segments and "speakerId" in segments[0]:
+        store = SegmentStore.from_groups(segments)
+    else:
+        store = SegmentStore.from_segments(segments)
+    return store, profile_names(data.get("speakerProfiles"))
+
+
+def profile_names(speaker_profiles):
+    """[{"speakerId": "说话人1", "name": "张三", ...}] -> {0: "张三"}"""
+    return {parse_speaker_label(item["speakerId"]): item["name"] for item in speaker_profiles or []}
+
+
+class TranscriptIndex:
+    """识别结果的全文索引
+
+    同一个实例可以在多个线程中使用（例如批量转录的说话人识别线程），写入时加锁。
+    数据库使用 WAL 模式，多个进程同时写入时等待对方提交。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_SEARCH_INDEX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            print(f"搜索索引版本 {version} 已过期，重新建立: {self.path}")
+            with self.connection:
+                for table in ("segments_fts", "speakers", "segments", "files"):
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _remove(self, file_id):
+        """删除一个文件的所有片段；FTS5 表不保存内容，删除时需要传入写入时的词"""
+        rows = self.connection.execute("SELECT id, text FROM segments WHERE file_id = ?", (file_id,)).fetchall()
+        self.connection.executemany(
+            "INSERT INTO segments_fts(segments_fts, rowid, tokens) VALUES('delete', ?, ?)",
+            ((rowid, tokenize(text)) for rowid, text in rows)
+        )
+        self.connection.execute("DELETE FROM segments WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM speakers WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def add(self, result_path, store, names=None, audio_path=None):
+        """写入（或替换）一个识别结果的全部片段，返回片段数
+
+        result_path 作为结果的标识，文件存在时记录其大小和修改时间，之后 ingest 会跳过未变化的文件。
+        """
+        result_path = os.path.abspath(result_path)
+        stat = os.stat(result_path) if os.path.exists(result_path) else None
+        duration = float(store.ends.max()) if len(store) else 0.0
+        with self._lock, self.connection:
+            row = self.connection.execute("SELECT id, audio FROM files WHERE path = ?", (result_path,)).fetchone()
+            if row is not None:
+                self._remove(row[0])
+            # 从文件重新导入时不知道音频路径，保留识别时记录的路径
+            audio = os.path.abspath(audio_path) if audio_path else (row[1] if row else None)
+            file_id = self.connection.execute(
+                "INSERT INTO files (path, audio, size, mtime_ns, duration, segments, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (result_path, audio, stat.st_size if stat else -1, stat.st_mtime_ns if stat else -1,
+                 duration, len(store), time.time())
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO speakers (file_id, label, name) VALUES (?, ?, ?)",
+                ((file_id, label, name) for label, name in (names or {}).items())
+            )
+            # 片段的 rowid 连续分配，FTS5 使用相同的 rowid
+            first = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM segments").fetchone()[0]
+            rowids = range(first, first + len(store))
+            self.connection.executemany(
+                "INSERT INTO segments (id, file_id, start, end, speaker, text) VALUES (?, ?, ?, ?, ?, ?)",
+                zip(rowids, [file_id] * len(store), store.starts.tolist(), store.ends.tolist(),
+                    store.labels.tolist(), store.texts)
+            )
+            self.connection.executemany(
+                "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)",
+                zip(rowids, map(tokenize, store.texts))
+            )
+        return len(store)
+
+    def is_current(self, result_path):
+        """索引中的记录与文件的大小和修改时间一致"""
+        stat = os.stat(result_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns FROM files WHERE path = ?", (os.path.abspath(result_path),)
+        ).fetchone()
+        return row is not None and tuple(row) == (stat.st_size, stat.st_mtime_ns)
+
+    def ingest(self, result_path, force=False):
+        """导入一个结果文件，未变化时跳过；返回导入的片段数，跳过时返回 None"""
+        if not force and self.is_current(result_path):
+            return None
+        store, names = read_result(result_path)
+        return self.add(result_path, store, names)
+
+    def ingest_paths(self, paths, force=False):
+        """导入文件或目录（递归查找识别结果），返回 (导入的文件数, 片段数, 跳过的文件数)"""
+        files, segments, skipped = 0, 0, 0
+        for path in paths:
+            path = Path(path)
+            candidates = [path] if path.is_file() else sorted(
+                result for pattern in RESULT_PATTERNS for result in path.rglob(pattern)
+            )
+            for candidate in candidates:
+                try:
+                    count = self.ingest(str(candidate), force)
+                except Exception as e:
+                    print(f"导入失败 {candidate}: {str(e)}")
+                    continue
+                if count is None:
+                    skipped += 1
+                else:
+                    files += 1
+                    segments += count
+        return files, segments, skipped
+
+    def prune(self):
+        """删除结果文件已不存在的记录，返回删除的文件数"""
+        rows = self.connection.execute("SELECT id, path FROM files").fetchall()
+        missing = [file_id for file_id, path in rows if not os.path.exists(path)]
+        with self._lock, self.connection:
+            for file_id in missing:
+                self._remove(file_id)
+        return len(missing)
+
+    def search(self, query=None, speaker=None, start=None, end=None, path=None, limit=20, rank=False):
+        """检索片段，返回 [{"file", "audio", "speaker", "start", "end", "text", "snippet"}]
+
+        query 为空时只按说话人和时间过滤。speaker 为 "说话人N"、序号或声纹库中的姓名；
+        start/end 为录音内的时间范围（秒），与之重叠的片段都会返回；path 为结果文件路径中包含的文字。
+        默认最近导入的结果在前（按 rowid 倒序，FTS5 可以直接按该顺序输出，LIMIT 不需要先取出全部匹配），
+        rank=True 时按 BM25 相关度排序，需要先给全部匹配打分，常用词在数千小时的索引中需要数百毫秒。
+        """
+        conditions, parameters = [], []
+        if query:
+            conditions.append("segments_fts MATCH ?")
+            parameters.append(match_expression(query))
+        if speaker is not None:
+            try:
+                label = parse_speaker_label(speaker if not str(speaker).isdigit() else int(speaker))
+                conditions.append("s.speaker = ?")
+                parameters.append(label)
+            except ValueError:
+                conditions.append("sp.name = ?")
+                parameters.append(speaker)
+        if start is not None:
+            conditions.append("s.end > ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("s.start < ?")
+            parameters.append(end)
+        if path:
+            conditions.append("instr(f.path, ?) > 0")
+            parameters.append(path)
+
+        if query:
+            source = "segments_fts JOIN segments s ON s.id = segments_fts.rowid"
+            order = "segments_fts.rank" if rank else "segments_fts.rowid DESC"
+        else:
+            source = "segments s"
+            order = "s.id DESC"
+        sql = (
+            "SELECT f.path, f.audio, s.speaker, sp.name, s.start, s.end, s.text "
+            f"FROM {source} JOIN files f ON f.id = s.file_id "
+            "LEFT JOIN speakers sp ON sp.file_id = s.file_id AND sp.label = s.speaker "
+            + ("WHERE " + " AND ".join(conditions) if conditions else "")
+            + f" ORDER BY {order} LIMIT ?"
+        )
+        rows = self.connection.execute(sql, parameters + [limit]).fetchall()
+        return [
+            {
+                "file": file,
+                "audio": audio,
+                "speaker": name or (speaker_name(label) if label >= 0 else None),
+                "start": segment_start,
+                "end": segment_end,
+                "text": text,
+                "snippet": snippet(text, query) if query else text
+            }
+            for file, audio, label, name, segment_start, segment_end, text in rows
+        ]
+
+    def optimize(self):
+        """把全文索引合并为一棵 b 树，大量导入后查询更快"""
+        with self._lock, self.connection:
+            self.connection.execute("INSERT INTO segments_fts(segments_fts) VALUES('optimize')")
+        self.connection.execute("VACUUM")
+
+    def stats(self):
+        files, segments, hours = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(segments), 0), COALESCE(SUM(duration), 0) / 3600 FROM files"
+        ).fetchone()
+        return {
+            "path": str(self.path),
+            "files": files,
+            "segments": segments,
+            "hours": round(hours, 2),
+            "sizeMb": round(self.path.stat().st_size / 1024 / 1024, 2)
+        }
+
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="转录历史全文检索")
+    parser.add_argument("--index", default=DEFAULT_SEARCH_INDEX_PATH, help="索引数据库路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="导入识别结果（文件或目录，目录递归查找）")
+    ingest_parser.add_argument("paths", nargs="+", help="识别结果文件（.json / .jsonl / .segcol）或目录")
+    ingest_parser.add_argument("--force", action="store_true", help="重新导入未变化的文件")
+
+    search_parser = commands.add_parser("search", help="检索片段")
+    search_parser.add_argument("query", nargs="?", default=None, help="查询文字，空白分隔的多个词需要同时出现")
+    search_parser.add_argument("--speaker", default=None, help="说话人：说话人N 或声纹库中的姓名")
+    search_parser.add_argument("--start", type=float, default=None, help="录音内的开始时间（秒）")
+    search_parser.add_argument("--end", type=float, default=None, help="录音内的结束时间（秒）")
+    search_parser.add_argument("--file", default=None, help="只检索路径中包含该文字的结果")
+    search_parser.add_argument("--limit", type=int, default=20, help="最多返回的片段数")
+    search_parser.add_argument("--rank", action="store_true", help="按相关度排序（默认最近导入的在前）")
+    search_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+
+    commands.add_parser("prune", help="删除结果文件已不存在的记录")
+    commands.add_parser("optimize", help="合并全文索引（大量导入后查询更快）")
+    commands.add_parser("stats", help="索引统计")
+    args = parser.parse_args()
+
+    with TranscriptIndex(args.index) as index:
+        if args.command == "ingest":
+            started = time.perf_counter()
+            files, segments, skipped = index.ingest_paths(args.paths, args.force)
+            print(f"导入 {files} 个结果（{segments} 个片段），跳过 {skipped} 个未变化的结果，"
+                  f"耗时 {time.perf_counter() - started:.1f} 秒")
+        elif args.command == "search":
+            if not args.query and args.speaker is None and args.file is None:
+                search_parser.error("需要查询文字、--speaker 或 --file")
+            started = time.perf_counter()
+            try:
+                results = index.search(args.query, args.speaker, args.start, args.end, args.file,
+                                       args.limit, args.rank)
+            except (ValueError, sqlite3.OperationalError) as e:
+                search_parser.error(str(e))
+            elapsed = (time.perf_counter() - started) * 1000
+            if args.json:
+                print(json.dumps(results, ensure_ascii=False))
+                return
+            for result in results:
+                print(f"{result['file']}\n  {result['speaker'] or '未知'} "
+                      f"[{format_time(result['start'])}-{format_time(result['end'])}] {result['snippet']}")
+            print(f"找到 {len(results)} 个片段（{elapsed:.1f} 毫秒）")
+        elif args.command == "prune":
+            print(f"删除了 {index.prune()} 个已不存在的结果")
+        elif args.command == "optimize":
+            started = time.perf_counter()
+            index.optimize()
+            print(f"索引已合并，耗时 {time.perf_counter() - started:.1f} 秒")
+        elif args.command == "stats":
+            print(json.dumps(index.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,291 @@
-import whisper
-from pathlib import Path
-import re
-from pydub import AudioSegment
+import sys
+import time
+import importlib
+import threading
+from types import SimpleNamespace
+from collections import OrderedDict
+from audio_io import decode_audio, stream_audio, SAMPLE_RATE
+from chunked_transcriber import transcribe_chunked, transcribe_chunked_stream, CHUNK_SECONDS
+from text_cleanup import clean_text, clean_segments
+from decoding_profiles import (
+    DEFAULT_PROFILE, resolve_profile, decode_options_for, uses_quantization, cache_options, load_model
+)
+import metrics
 
-class WhisperTranscriber:
+# SegmentProgressBar 依赖 whisper.transcribe 的内部实现（模块级 tqdm 和局部变量 all_segments），
+# 只在验证过的版本范围内替换进度条，其他版本转录完成后再逐个回调片段
+WHISPER_STREAMING_VERSIONS = ("20231117", "20250625")
+
+
+class SegmentProgressBar:
+    """替换 whisper 内部使用的 tqdm 进度条，每解码完一个窗口就回调新增的片段
+
+    whisper 没有逐片段的回调接口，但每个 30 秒窗口解码完成后都会更新一次进度条，
+    此时新片段已经追加到 whisper.transcribe 的局部变量 all_segments 中。
+    """
+    def __init__(self, on_segment, total=None, **kwargs):
+        from whisper.audio import HOP_LENGTH
+        self.on_segment = on_segment
+        # total 为梅尔帧数，换算成音频时长（秒）
+        self.duration = (total or 0) * HOP_LENGTH / SAMPLE_RATE
+        self.emitted = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def update(self, n=1):
+        segments = sys._getframe(1).f_locals.get("all_segments")
+        if segments is None:
+            # 调用方不是 whisper.transcribe（或内部实现已变化），片段留到转录完成后回调
+            return
+        # 就地清理新片段的文本，whisper 最终返回的结果中也是清理后的文本
+        new_segments = clean_segments(segments[self.emitted:])
+        for segment in new_segments:
+            self.on_segment(segment, self.duration)
+        self.emitted = len(segments)
+
+
+class StreamingProgressPatch:
+    """在流式转录期间替换 whisper.transcribe.tqdm
+
+    批量处理时多个线程共用 whisper 模块：替换后的 tqdm 只为登记了回调的线程创建 SegmentProgressBar，
+    其他线程仍使用原来的进度条。替换和恢复在锁内按引用计数进行，最后一个流式转录结束时恢复原样。
+    """
     def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = 0
+        self._original = None
+    
+    @staticmethod
+    def supported():
+        from whisper.version import __version__
+        low, high = WHISPER_STREAMING_VERSIONS
+        return low <= __version__ <= high
+    
+    def _tqdm(self, *args, **kwargs):
+        on_segment = getattr(self._local, "on_segment", None)
+        if on_segment is None:
+            return self._original.tqdm(*args, **kwargs)
+        # 每次调用只替换第一个进度条，与 whisper.transcribe 的调用一一对应
+        self._local.on_segment = None
+        return SegmentProgressBar(on_segment, kwargs.get("total"))
+    
+    def transcribe(self, model, audio, on_segment, **options):
+        """转录一次，期间当前线程的进度条回调 on_segment"""
+        whisper_module = importlib.import_module("whisper.transcribe")
+        with self._lock:
+            if self._active == 0:
+                self._original = whisper_module.tqdm
+                whisper_module.tqdm = SimpleNamespace(tqdm=self._tqdm)
+            self._active += 1
+        self._local.on_segment = on_segment
+        try:
+            return model.transcribe(audio, **options)
+        finally:
+            self._local.on_segment = None
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    whisper_module.tqdm = self._original
+                    self._original = None
+
+
+STREAMING_PATCH = StreamingProgressPatch()
+
+
+class WhisperTranscriber:
+    # 默认档位传给 model.transcribe 的解码参数，实例上的 decode_options 随 set_profile 切换
+    decode_options = decode_options_for(DEFAULT_PROFILE)
+    
+    def __init__(self, max_models=2, profile=DEFAULT_PROFILE):
         self.model = None
+        # 已加载的模型，按 (模型大小, 是否量化) 缓存，超过 max_models 时释放最久未使用的
+        self.models = OrderedDict()
+        self.max_models = max_models
+        # 后台预热和转录可能同时加载模型，加载过程串行执行
+        self._load_lock = threading.Lock()
+        self.set_profile(profile)
         print("初始化 WhisperTranscriber")
+    
+    def set_profile(self, profile):
+        """切换解码档位（fast / balanced / accurate），见 decoding_profiles.DECODING_PROFILES"""
+        self.profile = resolve_profile(profile)
+        self.decode_options = decode_options_for(self.profile)
+        self.quantize = uses_quantization(self.profile)
+    
+    def cache_options(self, chunked=False):
+        """当前档位下转录结果缓存键使用的参数"""
+        return cache_options(self.profile, chunked)
         
     def clean_text(self, text):
-        """对文本进行清理和优化"""
-        corrections = {
-            '的的': '的',
-            '了了': '了',
-            '吗吗': '吗',
-            '呢呢': '呢',
-            '嘛嘛': '嘛',
-            '啊啊': '啊',
-            '哦哦': '哦',
-            '额额': '额',
-        }
-        
-        for wrong, right in corrections.items():
-            text = text.replace(wrong, right)
-        
-        text = re.sub(r'([，。！？；：])\s*([，。！？；：])', r'\1', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        """对文本进行清理和优化，见 text_cleanup.clean_text"""
+        return clean_text(text)
     
     def prepare_audio(self, audio_path):
-        """准备音频文件"""
-        try:
-            audio = AudioSegment.from_file(audio_path)
-            if Path(audio_path).suffix.lower() != '.mp3':
-                temp_path = f"temp_{Path(audio_path).stem}.mp3"
-                audio.export(temp_path, format="mp3")
-                return temp_path
-            return audio_path
-        except Exception as e:
-            print(f"处理音频时发生错误: {str(e)}")
-            return audio_path
+        """准备音频：通过一条 ffmpeg 管道解码为 16kHz 单声道 float32 数组
+
+        whisper 可以直接转录该数组，说话人识别也复用同一份数据，不再经过 MP3 中转文件。
+        """
+        with metrics.stage("decode") as info:
+            audio = decode_audio(audio_path)
+            info["audioSeconds"] = round(len(audio) / SAMPLE_RATE, 2)
+        print(f"音频解码完成: {len(audio) / SAMPLE_RATE:.1f} 秒")
+        return audio
+    
+    def warmup(self, model_size="small"):
+        """在后台线程导入 whisper/torch 并加载当前档位的模型，返回该线程
+
+        预热期间调用 load_model 会等待预热完成后直接复用已加载的模型。
+        """
+        profile = self.profile
+        def run():
+            try:
+                with self._load_lock:
+                    self._load_model(model_size, profile)
+            except Exception as e:
+                print(f"预热模型失败: {str(e)}")
+        thread = threading.Thread(target=run, name="whisper-warmup", daemon=True)
+        thread.start()
+        return thread
+    
+    def load_model(self, model_size):
+        """加载模型，已加载过的模型直接复用；当前档位需要量化时加载量化版本"""
+        with self._load_lock:
+            self.model = self._load_model(model_size, self.profile)
+        return self.model
+    
+    def _load_model(self, model_size, profile):
+        quantize = uses_quantization(profile)
+        key = (model_size, quantize)
+        name = f"{model_size}{' (int8)' if quantize else ''}"
+        if key in self.models:
+            print(f"复用已加载的模型 {name}")
+            self.models.move_to_end(key)
+        else:
+            print(f"正在加载模型 {name}...")
+            with metrics.stage("load_model", model=model_size, quantized=quantize):
+                self.models[key] = load_model(model_size, profile)
+            while len(self.models) > self.max_models:
+                (evicted, quantized), _ = self.models.popitem(last=False)
+                print(f"释放模型 {evicted}{' (int8)' if quantized else ''}")
+        return self.models[key]
     
-    def transcribe(self, audio_path, model_size="small"):
-        """转录音频为文本"""
+    def _transcribe_streaming(self, audio, on_segment):
+        """转录的同时逐个回调已解码的片段: on_segment(segment, 音频时长)
+
+        whisper 版本不在 WHISPER_STREAMING_VERSIONS 范围内时不替换进度条，转录完成后再逐个回调。
+        """
+        emitted = []
+        def record(segment, duration):
+            emitted.append(segment)
+            on_segment(segment, duration)
+        
+        if STREAMING_PATCH.supported():
+            result = STREAMING_PATCH.transcribe(self.model, audio, record, **self.decode_options)
+        else:
+            print("当前 whisper 版本不支持逐片段回调，转录完成后再输出片段")
+            result = self.model.transcribe(audio, **self.decode_options)
+        # 进度条没有回调到的片段（不支持的版本，或最后一个窗口之后才追加的片段）在这里补上
+        remaining = clean_segments(result["segments"][len(emitted):])
+        duration = len(audio) / SAMPLE_RATE
+        for segment in remaining:
+            on_segment(segment, duration)
+        return result
+    
+    def _report_rtf(self, started, num_samples):
+        """实时率 RTF = 转录耗时 / 音频时长，小于 1 表示比实时快"""
+        elapsed = time.perf_counter() - started
+        duration = num_samples / SAMPLE_RATE
+        rtf = elapsed / duration if duration > 0 else 0.0
+        print(f"转录耗时 {elapsed:.1f} 秒，音频 {duration:.1f} 秒，实时率 RTF {rtf:.3f}（档位 {self.profile}）")
+        return round(rtf, 4)
+    
+    def transcribe(self, audio_path, model_size="small", on_segment=None, audio=None):
+        """转录音频为文本
+
+        传入 on_segment 时，每解码出一个片段就立即回调 on_segment(segment, 音频时长)。
+        audio 为已解码的音频数组，为空时从 audio_path 解码。
+        """
         print("正在处理音频...")
         try:
-            audio_file = self.prepare_audio(audio_path)
-            print(f"音频文件准备完成: {audio_file}")
-            
-            print(f"正在加载模型 {model_size}...")
-            self.model = whisper.load_model(model_size)
+            if audio is None:
+                audio = self.prepare_audio(audio_path)
             
-            print(f"正在转录文件: {audio_path}")
-            result = self.model.transcribe(
-                audio_file,
-                language="zh",
-                task="transcribe",
-                fp16=False,
-                verbose=True,
-                beam_size=5,
-                best_of=5,
-                temperature=0.0,
-                condition_on_previous_text=True,
-                initial_prompt="这是一段多人对话的中文音频。"
-            )
+            self.load_model(model_size)
             
-            # 清理临时文件
-            if audio_file.startswith("temp_"):
-                Path(audio_file).unlink(missing_ok=True)
+            print(f"正在转录文件: {audio_path}（解码档位: {self.profile}）")
+            started = time.perf_counter()
+            with metrics.stage("transcribe", model=model_size, profile=self.profile,
+                               audioSeconds=round(len(audio) / SAMPLE_RATE, 2)) as info:
+                if on_segment is None:
+                    result = self.model.transcribe(audio, **self.decode_options)
+                    clean_segments(result["segments"])
+                else:
+                    # 流式转录时片段在回调前已经清理过
+                    result = self._transcribe_streaming(audio, on_segment)
+                info["segments"] = len(result["segments"])
+                info["rtf"] = self._report_rtf(started, len(audio))
             
             return result["segments"]
         except Exception as e:
             print(f"转录音频时发生错误: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def transcribe_chunked(self, audio_path, model_size="small", num_workers=None, chunk_seconds=CHUNK_SECONDS,
+                           audio=None):
+        """分块并行转录：在静音处切分音频，多个进程各自加载模型并行转录后拼接"""
+        print("正在处理音频...")
+        try:
+            if audio is None:
+                audio = self.prepare_audio(audio_path)
+            print(f"正在分块转录文件: {audio_path}")
+            model = self.models.get((model_size, self.quantize))
+            started = time.perf_counter()
+            with metrics.stage("transcribe", model=model_size, profile=self.profile,
+                               audioSeconds=round(len(audio) / SAMPLE_RATE, 2), chunked=True) as info:
+                segments = transcribe_chunked(
+                    audio, model_size, self.decode_options, num_workers, chunk_seconds, model=model,
+                    profile=self.profile
+                )
+                clean_segments(segments)
+                info["segments"] = len(segments)
+                info["rtf"] = self._report_rtf(started, len(audio))
+            return segments
+        except Exception as e:
+            print(f"转录音频时发生错误: {str(e)}")
+            return []
+    
+    def transcribe_stream(self, audio_path, model_size="small", num_workers=None, chunk_seconds=CHUNK_SECONDS):
+        """流式分块转录：边从 ffmpeg 管道解码边切分转录，不在内存中保留整段音频
+
+        分块方式与 transcribe_chunked 相同，内存占用由 chunk_seconds 和进程数决定，与音频时长无关。
+        """
+        print(f"正在流式转录文件: {audio_path}")
+        try:
+            model = self.models.get((model_size, self.quantize))
+            num_samples = [0]
+            
+            def counted_blocks():
+                for block in stream_audio(audio_path):
+                    num_samples[0] += len(block)
+                    yield block
+            
+            started = time.perf_counter()
+            with metrics.stage("transcribe", model=model_size, profile=self.profile, chunked=True,
+                               streaming=True) as info:
+                segments = transcribe_chunked_stream(
+                    counted_blocks(), model_size, self.decode_options, num_workers, chunk_seconds, model=model,
+                    profile=self.profile
+                )
+                clean_segments(segments)
+                info["audioSeconds"] = round(num_samples[0] / SAMPLE_RATE, 2)
+                info["segments"] = len(segments)
+                info["rtf"] = self._report_rtf(started, num_samples[0])
+            return segments
+        except Exception as e:
+            print(f"转录音频时发生错误: {str(e)}")
+            return []
@@ -1,10 +1,22 @@
 // @ts-nocheck
 const electron = require('electron');
-const { app, BrowserWindow, ipcMain, Menu } = electron;
+const { app, BrowserWindow, ipcMain, Menu, dialog } = electron;
 require('@electron/remote/main').initialize();
 const path = require('path');
 const isDev = require('electron-is-dev');
-const { PythonShell } = require('python-shell');
+const { TranscriptionWorker } = require('./transcriptionWorker');
+
+// 常驻的转录进程，在多次转录请求间复用已加载的模型
+let transcriptionWorker = null;
+// 渲染进程保存的临时音频，保留到下一次转录以便重新分配说话人，退出时删除剩余的文件
+const tempFiles = new Set();
+
+function getTranscriptionWorker(pythonPath, scriptPath) {
+  if (!transcriptionWorker) {
+    transcriptionWorker = new TranscriptionWorker(pythonPath, scriptPath);
+  }
+  return transcriptionWorker;
+}
 
 function getPythonPath() {
   if (isDev) {
@@ -90,7 +102,7 @@ function createWindow() {
 }
 
 // 在 app.whenReady() 之前注册所有 IPC 处理程序
-ipcMain.handle('transcribe-audio', async (event, filePath) => {
+ipcMain.handle('transcribe-audio', async (event, filePath, numSpeakers = 2, modelSize = 'small', profile = 'accurate') => {
   console.log('收到转录请求:', filePath);
   try {
     // 检查文件路径
@@ -149,55 +161,85 @@ ipcMain.handle('transcribe-audio', async (event, filePath) => {
       console.log(`找到文件: ${file}`);
     }
 
-    const options: Options = {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      scriptPath: scriptPath,
-      args: [filePath]
-    };
-
-    console.log('Python 配置:', JSON.stringify(options, null, 2));
-
-    return new Promise((resolve, reject) => {
-      let output = '';
-      let errorOutput = '';
-      
-      console.log('启动 Python 进程...');
-      const pyshell = new PythonShell('transcribe.py', options);
-
-      pyshell.on('message', (message: string) => {
-        console.log('Python 输出:', message);
-        if (message.startsWith('PROGRESS:')) {
-          const progress = parseInt(message.split(':')[1]);
-          console.log('转录进度:', progress);
-          event.sender.send('transcription-progress', progress);
-        } else {
-          output += message + '\n';
-        }
-      });
+    const result = await getTranscriptionWorker(pythonPath, scriptPath).transcribe(filePath, numSpeakers, modelSize, profile, {
+      onProgress: (progress: number) => {
+        console.log('转录进度:', progress);
+        event.sender.send('transcription-progress', progress);
+      },
+      onLog: (message: string) => event.sender.send('transcription-log', message),
+      // 逐个转发已解码的片段和说话人标签，渲染进程可以边转录边显示
+      onSegment: (segment) => event.sender.send('transcription-segment', segment),
+      onSpeakers: (labels: string[]) => event.sender.send('transcription-speakers', labels),
+      onMetric: (metric) => {
+        console.log('阶段指标:', JSON.stringify(metric));
+        event.sender.send('transcription-metric', metric);
+      }
+    });
 
-      pyshell.on('error', (err: Error) => {
-        console.error('Python错误:', err);
-        reject(err);
-      });
+    console.log('转录完成');
+    return result;
+  } catch (error) {
+    console.error('转录错误:', error);
+    throw error;
+  }
+});
 
-      pyshell.on('close', (code: number) => {
-        console.log(`Python进程退出，退出码: ${code}`);
-      });
+// 用户修改部分片段的说话人后，只重新分配其余片段（特征取自缓存，不重新转录和聚类）
+ipcMain.handle('rediarize-speakers', async (event, filePath, segments, pinned) => {
+  try {
+    const pythonPath = isDev 
+      ? path.join(process.cwd(), 'venv/bin/python3')
+      : path.join(process.resourcesPath, 'venv/bin/python3');
+    const scriptPath = isDev 
+      ? path.join(__dirname, '../src/core')
+      : path.join(process.resourcesPath, 'app/core');
 
-      pyshell.end((err: Error | null) => {
-        if (err) {
-          console.error('转录失败:', err);
-          reject(err);
-          return;
-        }
-        console.log('转录完成');
-        resolve(output.trim());
-      });
+    return await getTranscriptionWorker(pythonPath, scriptPath).rediarize(path.resolve(filePath), segments, pinned, {
+      onLog: (message: string) => event.sender.send('transcription-log', message),
+      onMetric: (metric) => console.log('阶段指标:', JSON.stringify(metric))
     });
   } catch (error) {
-    console.error('转录错误:', error);
+    console.error('重新分配说话人失败:', error);
+    throw error;
+  }
+});
+
+// 波形索引文件名与 src/core/audio_index.py 的 index_path 一致：音频旁边的 {文件名}_波形索引.peaks
+function audioIndexPath(audioPath) {
+  const { dir, name } = path.parse(audioPath);
+  return path.join(dir, `${name}_波形索引.peaks`);
+}
+
+// 读取 Python 端写在识别结果旁边的波形索引，渲染进程把各列直接映射为类型化数组
+// 只接受本进程保存的临时音频，索引路径在主进程中推导，渲染进程不能借此读取任意文件
+ipcMain.handle('read-audio-index', async (event, audioPath) => {
+  try {
+    if (typeof audioPath !== 'string' || !tempFiles.has(audioPath)) {
+      throw new Error(`不是转录中的音频文件: ${audioPath}`);
+    }
+    return require('fs').readFileSync(audioIndexPath(audioPath));
+  } catch (error) {
+    console.error('读取波形索引失败:', error);
+    throw error;
+  }
+});
+
+// 打开已保存的识别结果（.json / .jsonl / .segcol），文件内容交给渲染进程按格式解析
+ipcMain.handle('open-result-file', async (event) => {
+  try {
+    const { canceled, filePaths } = await dialog.showOpenDialog({
+      title: '打开识别结果',
+      filters: [
+        { name: '识别结果', extensions: ['json', 'jsonl', 'segcol'] }
+      ],
+      properties: ['openFile']
+    });
+    if (canceled || !filePaths.length) {
+      return null;
+    }
+    return { path: filePaths[0], data: require('fs').readFileSync(filePaths[0]) };
+  } catch (error) {
+    console.error('打开识别结果失败:', error);
     throw error;
   }
 });
@@ -207,6 +249,7 @@ ipcMain.handle('save-temp-file', async (event, { buffer, filename }) => {
   try {
     const tempPath = path.join(app.getPath('temp'), filename);
     require('fs').writeFileSync(tempPath, Buffer.from(buffer));
+    tempFiles.add(tempPath);
     console.log('临时文件已保存:', tempPath);
     return tempPath;
   } catch (error) {
@@ -217,6 +260,7 @@ ipcMain.handle('save-temp-file', async (event, { buffer, filename }) => {
 
 ipcMain.handle('delete-temp-file', async (event, filepath) => {
   try {
+    tempFiles.delete(filepath);
     require('fs').unlinkSync(filepath);
     console.log('临时文件已删除:', filepath);
     return true;
@@ -245,6 +289,13 @@ app.whenReady().then(() => {
   });
 });
 
+app.on('will-quit', () => {
+  if (transcriptionWorker) {
+    transcriptionWorker.stop();
+  }
+  tempFiles.forEach(tempPath => require('fs').rmSync(tempPath, { force: true }));
+});
+
 app.on('window-all-closed', () => {
   if (process.platform !== 'darwin') {
     app.quit();
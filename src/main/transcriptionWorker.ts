@@ -0,0 +1,215 @@
+import { PythonShell, Options } from 'python-shell';
+import { DecodingProfile, TranscriptionData } from '../types/transcription';
+
+interface TranscriptionJob {
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+  onProgress: (progress: number) => void;
+  onLog: (message: string) => void;
+  onSegment: (segment: StreamedSegment) => void;
+  onSpeakers: (labels: string[]) => void;
+  onMetric: (metric: StageMetric) => void;
+}
+
+// Python 端以 METRIC: 行输出的阶段指标：耗时（秒）、CPU 时间（秒）和峰值内存（MB）
+export interface StageMetric {
+  id?: string;
+  stage: string;
+  wall: number;
+  cpu: number;
+  peakRssMb: number | null;
+  [key: string]: any;
+}
+
+// 转录过程中逐个推送的片段，index 为片段在最终结果中的序号
+export interface StreamedSegment {
+  index: number;
+  text: string;
+  start: number;
+  end: number;
+}
+
+interface TranscribeCallbacks {
+  onProgress?: (progress: number) => void;
+  onLog?: (message: string) => void;
+  onSegment?: (segment: StreamedSegment) => void;
+  onSpeakers?: (labels: string[]) => void;
+  onMetric?: (metric: StageMetric) => void;
+}
+
+// 常驻的 Python 转录进程：模型只加载一次，多次转录请求复用同一个进程
+export class TranscriptionWorker {
+  private pythonPath: string;
+  private scriptPath: string;
+  private shell: PythonShell | null = null;
+  private jobs = new Map<string, TranscriptionJob>();
+  private nextId = 1;
+
+  constructor(pythonPath: string, scriptPath: string) {
+    this.pythonPath = pythonPath;
+    this.scriptPath = scriptPath;
+  }
+
+  // 按需启动进程，进程退出后下次请求会重新启动
+  private start(): PythonShell {
+    if (this.shell) {
+      return this.shell;
+    }
+
+    const options: Options = {
+      mode: 'text',
+      pythonPath: this.pythonPath,
+      pythonOptions: ['-u'],
+      scriptPath: this.scriptPath,
+      args: ['--worker']
+    };
+    const shell = new PythonShell('transcribe.py', options);
+
+    shell.on('message', (message: string) => this.handleMessage(message));
+    shell.on('stderr', (message: string) => this.handleLog(message));
+
+    shell.on('error', (err: Error) => {
+      console.error('转录进程错误:', err);
+      this.failAll(err);
+    });
+
+    shell.on('close', () => {
+      console.log('转录进程已退出');
+      this.shell = null;
+      this.failAll(new Error('转录进程意外退出'));
+    });
+
+    this.shell = shell;
+    return shell;
+  }
+
+  private handleMessage(message: string) {
+    if (message.startsWith('METRIC:')) {
+      this.handleMetric(message);
+      return;
+    }
+    if (!message.startsWith('EVENT:')) {
+      this.handleLog(message);
+      return;
+    }
+
+    let event: any;
+    try {
+      event = JSON.parse(message.slice('EVENT:'.length));
+    } catch (err) {
+      console.error('无法解析转录事件:', message);
+      return;
+    }
+
+    const job = this.jobs.get(event.id);
+    if (!job) {
+      return;
+    }
+
+    switch (event.event) {
+      case 'progress':
+        job.onProgress(event.progress);
+        break;
+      case 'segment':
+        job.onSegment({ index: event.index, text: event.text, start: event.start, end: event.end });
+        break;
+      case 'speakers':
+        job.onSpeakers(event.labels);
+        break;
+      case 'result':
+        this.jobs.delete(event.id);
+        job.resolve(event.result);
+        break;
+      case 'error':
+        this.jobs.delete(event.id);
+        job.reject(new Error(event.message));
+        break;
+      default:
+        break;
+    }
+  }
+
+  private handleMetric(message: string) {
+    let metric: StageMetric;
+    try {
+      metric = JSON.parse(message.slice('METRIC:'.length));
+    } catch (err) {
+      console.error('无法解析性能指标:', message);
+      return;
+    }
+
+    const job = metric.id ? this.jobs.get(metric.id) : this.jobs.values().next().value;
+    if (job) {
+      job.onMetric(metric);
+    }
+  }
+
+  // 普通输出转发给当前正在处理的任务（任务按提交顺序依次执行）
+  private handleLog(message: string) {
+    console.log('Python 输出:', message);
+    const current = this.jobs.values().next().value;
+    if (current) {
+      current.onLog(message);
+    }
+  }
+
+  private failAll(err: Error) {
+    this.jobs.forEach(job => job.reject(err));
+    this.jobs.clear();
+  }
+
+  private submit(payload: Record<string, any>, callbacks: TranscribeCallbacks): Promise<any> {
+    const shell = this.start();
+    const id = String(this.nextId++);
+
+    return new Promise((resolve, reject) => {
+      this.jobs.set(id, {
+        resolve,
+        reject,
+        onProgress: callbacks.onProgress || (() => {}),
+        onLog: callbacks.onLog || (() => {}),
+        onSegment: callbacks.onSegment || (() => {}),
+        onSpeakers: callbacks.onSpeakers || (() => {}),
+        onMetric: callbacks.onMetric || (() => {})
+      });
+      shell.send(JSON.stringify({ id, ...payload }));
+    });
+  }
+
+  // profile 省略时使用 Python 端的默认档位
+  transcribe(
+    filePath: string,
+    numSpeakers: number,
+    modelSize: string,
+    profile?: DecodingProfile,
+    callbacks: TranscribeCallbacks = {}
+  ): Promise<any> {
+    return this.submit({
+      audio_path: filePath,
+      num_speakers: numSpeakers,
+      model_size: modelSize,
+      profile
+    }, callbacks);
+  }
+
+  // 用户修改说话人后只重新分配未固定的片段：pinned 为 { 片段序号: '说话人N' }，片段序号按 segments 展开后的顺序
+  rediarize(
+    filePath: string,
+    segments: TranscriptionData['segments'],
+    pinned: Record<number, string>,
+    callbacks: TranscribeCallbacks = {}
+  ): Promise<TranscriptionData> {
+    return this.submit({
+      type: 'rediarize',
+      audio_path: filePath,
+      segments,
+      pinned
+    }, callbacks);
+  }
+
+  stop() {
+    if (this.shell) {
+      this.shell.end(() => {});
+    }
+  }
+}
@@ -1,10 +1,14 @@
-import React, { useState, useRef } from 'react';
+import React, { useState, useRef, useEffect } from 'react';
 import { AudioUploader } from './components/AudioUploader';
 import { TranscriptionViewer } from './components/TranscriptionViewer';
 import { ProgressBar } from './components/ProgressBar';
 import { LogViewer } from './components/LogViewer';
 import { AudioPlayer } from './components/AudioPlayer';
 import { TranscriptionData } from '../types/transcription';
+import { AudioIndex } from './utils/audioIndex';
+import { loadResultFile } from './utils/segmentFiles';
+
+const { ipcRenderer } = window.require('electron');
 
 const App: React.FC = () => {
   const [transcription, setTranscription] = useState<TranscriptionData | null>(null);
@@ -14,6 +18,29 @@ const App: React.FC = () => {
   const [audioUrl, setAudioUrl] = useState<string>('');
   const audioRef = useRef<HTMLAudioElement>(null);
   const [currentTime, setCurrentTime] = useState(0);
+  const [audioIndex, setAudioIndex] = useState<AudioIndex | null>(null);
+  // 转录使用的音频文件路径，修改说话人后据此重新分配其余片段
+  const [audioPath, setAudioPath] = useState<string | null>(null);
+  const hasAudioIndex = Boolean(transcription?.audioIndex);
+
+  // 转录完成后读取波形索引（主进程按音频路径找到索引文件）；读取失败时只是不显示波形
+  useEffect(() => {
+    if (!hasAudioIndex || !audioPath) {
+      setAudioIndex(null);
+      return;
+    }
+    let cancelled = false;
+    ipcRenderer.invoke('read-audio-index', audioPath)
+      .then((data: Uint8Array) => {
+        if (!cancelled) {
+          setAudioIndex(new AudioIndex(data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength)));
+        }
+      })
+      .catch((error: Error) => console.error('读取波形索引失败:', error));
+    return () => {
+      cancelled = true;
+    };
+  }, [hasAudioIndex, audioPath]);
 
   const handleProgressUpdate = (value: number) => {
     setProgress(value);
@@ -25,12 +52,27 @@ const App: React.FC = () => {
 
   const handleAudioFile = (url: string) => {
     setAudioUrl(url);
+    setAudioPath(null);
   };
 
   const handleShowLogsChange = (show: boolean) => {
     setShowLogs(show);
   };
 
+  // 打开以前保存的识别结果，没有对应的音频，不能重新分配说话人
+  const handleOpenResult = async () => {
+    try {
+      const file: { path: string; data: Uint8Array } | null = await ipcRenderer.invoke('open-result-file');
+      if (file) {
+        setAudioPath(null);
+        setTranscription(loadResultFile(file.path, file.data));
+      }
+    } catch (error) {
+      console.error('打开识别结果失败:', error);
+      alert('打开识别结果失败: ' + (error instanceof Error ? error.message : '未知错误'));
+    }
+  };
+
   const handleSegmentClick = (startTime: number) => {
     if (audioRef.current) {
       audioRef.current.currentTime = startTime;
@@ -41,14 +83,21 @@ const App: React.FC = () => {
     <div className="app">
       <header>
         <h1>音频转录</h1>
+        <button type="button" className="open-result-button" onClick={handleOpenResult}>
+          打开识别结果
+        </button>
       </header>
       
       <main>
         <AudioUploader 
-          onTranscriptionComplete={(result) => setTranscription(result)}
+          onTranscriptionComplete={(result, path) => {
+            setTranscription(result);
+            setAudioPath(path);
+          }}
+          onTranscriptionUpdate={setTranscription}
           onProgressUpdate={setProgress}
           onLogUpdate={handleLogUpdate}
-          onAudioFile={setAudioUrl}
+          onAudioFile={handleAudioFile}
           showLogs={showLogs}
           onShowLogsChange={setShowLogs}
         />
@@ -57,6 +106,7 @@ const App: React.FC = () => {
             audioUrl={audioUrl} 
             ref={audioRef}
             onTimeUpdate={setCurrentTime}
+            audioIndex={audioIndex}
           />
         )}
         <ProgressBar progress={progress} />
@@ -65,6 +115,7 @@ const App: React.FC = () => {
           <TranscriptionViewer 
             content={transcription}
             onEdit={(newContent) => setTranscription(JSON.parse(newContent))}
+            audioPath={audioPath}
             onSegmentClick={handleSegmentClick}
             currentTime={currentTime}
           />
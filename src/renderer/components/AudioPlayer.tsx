@@ -1,16 +1,20 @@
-import React, { useState, useEffect, forwardRef, ForwardedRef } from 'react';
+import React, { useState, useEffect, useRef, forwardRef, ForwardedRef } from 'react';
+import { AudioIndex } from '../utils/audioIndex';
 
 interface Props {
   audioUrl: string;
   onTimeUpdate?: (currentTime: number) => void;
+  // Python 端生成的波形索引，有索引时绘制波形，不需要在渲染进程中解码音频
+  audioIndex?: AudioIndex | null;
 }
 
-export const AudioPlayer = forwardRef<HTMLAudioElement, Props>(({ audioUrl, onTimeUpdate }, ref: ForwardedRef<HTMLAudioElement>) => {
+export const AudioPlayer = forwardRef<HTMLAudioElement, Props>(({ audioUrl, onTimeUpdate, audioIndex }, ref: ForwardedRef<HTMLAudioElement>) => {
   const [isPlaying, setIsPlaying] = useState(false);
   const [currentTime, setCurrentTime] = useState(0);
   const [duration, setDuration] = useState(0);
   const [volume, setVolume] = useState(1);
   const [playbackRate, setPlaybackRate] = useState(1);
+  const waveformRef = useRef<HTMLCanvasElement>(null);
 
   // 定义可选的播放速度
   const playbackRates = [
@@ -36,6 +40,44 @@ export const AudioPlayer = forwardRef<HTMLAudioElement, Props>(({ audioUrl, onTi
     }
   }, [volume, playbackRate]);
 
+  // 按每个像素对应的时长选择峰值级别，每个像素取所覆盖的桶中的最小值和最大值，已播放部分高亮
+  useEffect(() => {
+    const canvas = waveformRef.current;
+    const total = audioIndex?.duration || duration;
+    if (!canvas || !audioIndex || total <= 0) {
+      return;
+    }
+
+    const width = canvas.clientWidth;
+    const height = canvas.clientHeight;
+    const ratio = window.devicePixelRatio || 1;
+    canvas.width = width * ratio;
+    canvas.height = height * ratio;
+    const context = canvas.getContext('2d');
+    if (!context || width === 0) {
+      return;
+    }
+    context.scale(ratio, ratio);
+
+    const secondsPerPixel = total / width;
+    const peaks = audioIndex.peaksFor(secondsPerPixel);
+    const bucketsPerPixel = secondsPerPixel / peaks.bucketSeconds;
+    const played = currentTime / total * width;
+    const middle = height / 2;
+    for (let x = 0; x < width; x++) {
+      const begin = Math.floor(x * bucketsPerPixel);
+      const end = Math.min(Math.max(begin + 1, Math.floor((x + 1) * bucketsPerPixel)), peaks.mins.length);
+      let low = 0;
+      let high = 0;
+      for (let i = begin; i < end; i++) {
+        low = Math.min(low, peaks.mins[i]);
+        high = Math.max(high, peaks.maxs[i]);
+      }
+      context.fillStyle = x < played ? '#007AFF' : '#c7c7cc';
+      context.fillRect(x, middle - high / peaks.scale * middle, 1, Math.max(1, (high - low) / peaks.scale * middle));
+    }
+  }, [audioIndex, currentTime, duration]);
+
   const formatTime = (time: number) => {
     const minutes = Math.floor(time / 60);
     const seconds = Math.floor(time % 60);
@@ -78,6 +120,17 @@ export const AudioPlayer = forwardRef<HTMLAudioElement, Props>(({ audioUrl, onTi
     }
   };
 
+  const handleWaveformClick = (e: React.MouseEvent<HTMLCanvasElement>) => {
+    const audio = getAudioElement();
+    const rect = e.currentTarget.getBoundingClientRect();
+    const total = audioIndex?.duration || duration;
+    if (audio && rect.width > 0) {
+      const time = (e.clientX - rect.left) / rect.width * total;
+      audio.currentTime = time;
+      setCurrentTime(time);
+    }
+  };
+
   const skip = (seconds: number) => {
     const audio = getAudioElement();
     if (audio) {
@@ -156,6 +209,10 @@ export const AudioPlayer = forwardRef<HTMLAudioElement, Props>(({ audioUrl, onTi
           </div>
         </div>
 
+        {audioIndex && (
+          <canvas ref={waveformRef} className="waveform" onClick={handleWaveformClick} />
+        )}
+
         <div className="time-control">
           <span className="time">{formatTime(currentTime)}</span>
           <input
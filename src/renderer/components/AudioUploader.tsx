@@ -1,10 +1,13 @@
-import React, { useCallback, useState, useEffect } from 'react';
+import React, { useCallback, useState, useEffect, useRef } from 'react';
 import { useDropzone } from 'react-dropzone';
-import { TranscriptionData } from '../../types/transcription';
+import { DecodingProfile, TranscriptionData } from '../../types/transcription';
+import { StreamedSegment, buildStreamingTranscription } from '../utils/streamingTranscription';
 const { ipcRenderer } = window.require('electron');
 
 interface Props {
-  onTranscriptionComplete: (result: TranscriptionData) => void;
+  // audioPath 为转录使用的临时音频文件，保留到下一次转录，修改说话人后重新分配时需要读取缓存的特征
+  onTranscriptionComplete: (result: TranscriptionData, audioPath: string) => void;
+  onTranscriptionUpdate?: (partial: TranscriptionData) => void;
   onProgressUpdate: (value: number) => void;
   onLogUpdate: (message: string) => void;
   onAudioFile: (url: string) => void;
@@ -14,6 +17,7 @@ interface Props {
 
 export const AudioUploader: React.FC<Props> = ({
   onTranscriptionComplete,
+  onTranscriptionUpdate,
   onProgressUpdate,
   onLogUpdate,
   onAudioFile,
@@ -24,6 +28,14 @@ export const AudioUploader: React.FC<Props> = ({
   const [error, setError] = useState<string | null>(null);
   const [numSpeakers, setNumSpeakers] = useState<number>(2);
   const [modelSize, setModelSize] = useState<string>("small");
+  const [profile, setProfile] = useState<DecodingProfile>("accurate");
+  // 转录过程中逐个收到的片段和说话人标签
+  const streamedSegments = useRef<StreamedSegment[]>([]);
+  const speakerLabels = useRef<string[]>([]);
+  // 转录完成后不再刷新预览，避免延后到下一帧的刷新覆盖最终结果
+  const isStreaming = useRef(false);
+  // 上一次转录的临时文件，开始新的转录时删除
+  const audioPath = useRef<string | null>(null);
 
   const modelOptions = {
     tiny: {
@@ -59,6 +71,17 @@ medium: 769M参数, 内存占用 ~5GB, 10分钟音频处理时间约8分钟
 large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
       适用场景: 追求最高准确率、专业场景使用`
 
+  const profileOptions: Record<DecodingProfile, string> = {
+    fast: "快速",
+    balanced: "均衡",
+    accurate: "精确"
+  };
+
+  const profileDescription = `解码速度说明:
+快速: 贪心解码, CPU 上使用 int8 量化模型, 速度最快, 准确率略有下降
+均衡: 贪心解码, 适合批量处理
+精确: beam search (beam=5), 速度较慢, 准确率最高`
+
 
   const handleSegmentClick = (startTime: number) => {
     // 处理音频片段点击
@@ -87,6 +110,13 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
         setIsProcessing(true);
         setError(null);
         onProgressUpdate(0);
+        streamedSegments.current = [];
+        speakerLabels.current = [];
+        isStreaming.current = true;
+        if (audioPath.current) {
+          await ipcRenderer.invoke('delete-temp-file', audioPath.current);
+          audioPath.current = null;
+        }
 
         // 将文件内容转换为 Buffer
         const arrayBuffer = await file.arrayBuffer();
@@ -96,6 +126,7 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
           buffer: Array.from(new Uint8Array(arrayBuffer)),
           filename: file.name
         });
+        audioPath.current = tempPath;
 
         console.log('文件信息:', {
           name: file.name,
@@ -105,29 +136,28 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
         });
 
         // 开始转录，传入说话人数量
-        const result = await ipcRenderer.invoke('transcribe-audio', tempPath, numSpeakers, modelSize);
+        const result = await ipcRenderer.invoke('transcribe-audio', tempPath, numSpeakers, modelSize, profile);
+        isStreaming.current = false;
         console.log('转录结果:', result);
         
         if (!result) {
           throw new Error('转录结果为空');
         }
 
-        // 清理临时文件
-        await ipcRenderer.invoke('delete-temp-file', tempPath);
-
-        handleTranscriptionComplete(result);
+        handleTranscriptionComplete(result, tempPath);
         onProgressUpdate(100);
       } catch (error) {
         console.error('处理错误:', error);
         setError(error instanceof Error ? error.message : '转录失败，请重试');
       } finally {
+        isStreaming.current = false;
         setIsProcessing(false);
       }
     } catch (error) {
       console.error('上传错误:', error);
       setError(error instanceof Error ? error.message : '转录失败，请重试');
     }
-  }, [onTranscriptionComplete, onProgressUpdate, onAudioFile, numSpeakers, modelSize]);
+  }, [onTranscriptionComplete, onProgressUpdate, onAudioFile, numSpeakers, modelSize, profile]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
@@ -158,6 +188,46 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
     };
   }, [onProgressUpdate]);
 
+  useEffect(() => {
+    // 边转录边显示：片段直接追加到数组中，每帧最多重建一次预览，
+    // 一个窗口解码出的一批片段只触发一次重建，不会每个片段都复制数组、重新分组
+    let frame: number | null = null;
+
+    const publish = () => {
+      frame = null;
+      if (onTranscriptionUpdate && isStreaming.current) {
+        onTranscriptionUpdate(buildStreamingTranscription(streamedSegments.current, speakerLabels.current));
+      }
+    };
+
+    const schedulePublish = () => {
+      if (frame === null) {
+        frame = requestAnimationFrame(publish);
+      }
+    };
+
+    const segmentHandler = (_, segment: StreamedSegment) => {
+      streamedSegments.current.push(segment);
+      schedulePublish();
+    };
+
+    const speakersHandler = (_, labels: string[]) => {
+      speakerLabels.current = labels;
+      schedulePublish();
+    };
+
+    ipcRenderer.on('transcription-segment', segmentHandler);
+    ipcRenderer.on('transcription-speakers', speakersHandler);
+
+    return () => {
+      if (frame !== null) {
+        cancelAnimationFrame(frame);
+      }
+      ipcRenderer.removeListener('transcription-segment', segmentHandler);
+      ipcRenderer.removeListener('transcription-speakers', speakersHandler);
+    };
+  }, [onTranscriptionUpdate]);
+
   useEffect(() => {
     // 添加日志监听
     const logHandler = (_, message) => {
@@ -190,13 +260,13 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
     input.click();
   };
 
-  const handleTranscriptionComplete = (result: string | TranscriptionData) => {
+  const handleTranscriptionComplete = (result: string | TranscriptionData, tempPath: string) => {
     try {
       const transcriptionData = typeof result === 'string' 
         ? JSON.parse(result) as TranscriptionData 
         : result;
       
-      onTranscriptionComplete(transcriptionData);  // 只通知父组件
+      onTranscriptionComplete(transcriptionData, tempPath);  // 只通知父组件
     } catch (error) {
       console.error('转录结果解析错误:', error);
       setError('转录结果格式错误，请重试');
@@ -214,6 +284,7 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
               onChange={(e) => setNumSpeakers(Number(e.target.value))}
               disabled={isProcessing}
             >
+              <option value={0}>自动</option>
               {Array.from({ length: 10 }, (_, i) => i + 1).map(num => (
                 <option key={num} value={num}>{num}</option>
               ))}
@@ -237,6 +308,24 @@ large: 1550M参数, 内存占用 ~10GB, 10分钟音频处理时间约15分钟
               ⓘ
             </span>
           </label>
+          <label className="model-select-container">
+            解码速度：
+            <select
+              value={profile}
+              onChange={(e) => setProfile(e.target.value as DecodingProfile)}
+              disabled={isProcessing}
+            >
+              {Object.entries(profileOptions).map(([key, name]) => (
+                <option key={key} value={key}>{name}</option>
+              ))}
+            </select>
+            <span 
+              className="info-icon" 
+              data-tooltip={profileDescription}
+            >
+              ⓘ
+            </span>
+          </label>
         </div>
 
         <div className="log-control">
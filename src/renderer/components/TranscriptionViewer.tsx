@@ -1,5 +1,7 @@
-import React, { useState, useCallback, useEffect } from 'react';
+import React, { useState, useCallback, useEffect, useRef } from 'react';
 import { TranscriptionData } from '../../types/transcription';
+import { applySpeakerCandidate } from '../utils/streamingTranscription';
+import { UNKNOWN_SPEAKER } from '../utils/segmentFiles';
 const { ipcRenderer } = window.require('electron');
 
 interface Segment {
@@ -24,13 +26,16 @@ interface Props {
   onEdit: (text: string) => void;
   onSegmentClick?: (startTime: number) => void;
   currentTime?: number;
+  // 转录使用的音频文件，有值时修改说话人后重新分配其余片段
+  audioPath?: string | null;
 }
 
 export const TranscriptionViewer: React.FC<Props> = ({ 
   content, 
   onEdit,
   onSegmentClick,
-  currentTime = 0
+  currentTime = 0,
+  audioPath = null
 }) => {
   const [isEditing, setIsEditing] = useState(false);
   const [editingContent, setEditingContent] = useState<TranscriptionData>(content);
@@ -41,6 +46,20 @@ export const TranscriptionViewer: React.FC<Props> = ({
   const [modifyAll, setModifyAll] = useState(false);
   const [history, setHistory] = useState<EditHistory[]>([{ content, timestamp: Date.now() }]);
   const [currentIndex, setCurrentIndex] = useState(0);
+  // 用户指定过说话人的片段（按全部片段的顺序编号）-> 说话人，换了音频文件后清空
+  const pinnedSegments = useRef<Record<number, string>>({});
+  // 每次本地修改、发起重新分配或换了音频文件时递增，重新分配的结果返回时编号已变就丢弃
+  const editVersion = useRef(0);
+
+  useEffect(() => {
+    pinnedSegments.current = {};
+    editVersion.current += 1;
+  }, [audioPath]);
+
+  const applyLocalEdit = useCallback((newContent: TranscriptionData) => {
+    editVersion.current += 1;
+    setEditingContent(newContent);
+  }, []);
 
   // 当 content 改变时更新编辑内容和历史记录
   useEffect(() => {
@@ -258,6 +277,7 @@ export const TranscriptionViewer: React.FC<Props> = ({
   ) => {
     if (typeof editingContent !== 'string' && isEditing) {
       const newContent = {
+        ...editingContent,
         segments: editingContent.segments.map(speaker => {
           if (speaker.speakerId === speakerId) {
             return {
@@ -274,7 +294,7 @@ export const TranscriptionViewer: React.FC<Props> = ({
       };
 
       // 更新编辑内容
-      setEditingContent(newContent);
+      applyLocalEdit(newContent);
       
       // 如果不是正在输入状态，则记录历史
       if (!isInputting) {
@@ -327,17 +347,19 @@ export const TranscriptionViewer: React.FC<Props> = ({
                   e.preventDefault();
                   const newSpeakerId = e.currentTarget.textContent?.trim();
                   if (newSpeakerId) {
+                    const changed = changedGroups(index, modifyAll, originalSpeakerId);
                     const newContent = {
                       ...editingContent,
                       segments: editingContent.segments.map((segment, i) => 
-                        (i === index || (modifyAll && segment.speakerId === originalSpeakerId))
+                        changed.includes(i)
                           ? { ...segment, speakerId: newSpeakerId }
                           : segment
                       )
                     };
-                    setEditingContent(newContent);
+                    applyLocalEdit(newContent);
                     onEdit(JSON.stringify(newContent));
                     setEditingSpeakerId(null);
+                    rediarize(newContent, changed, newSpeakerId);
                   }
                 } else if (e.key === 'Escape') {
                   setEditingSpeakerId(null);
@@ -433,23 +455,68 @@ export const TranscriptionViewer: React.FC<Props> = ({
           i === index ? { ...segment, speakerId: '' } : segment
         )
       };
-      setEditingContent(newContent);
+      applyLocalEdit(newContent);
       return;
     }
 
+    const changed = changedGroups(index, modifyAll, originalSpeakerId);
     const newContent = {
       ...editingContent,
       segments: editingContent.segments.map((segment, i) => 
-        (i === index || (modifyAll && segment.speakerId === originalSpeakerId))
+        changed.includes(i)
           ? { ...segment, speakerId: newSpeakerId }
           : segment
       )
     };
 
-    setEditingContent(newContent);
+    applyLocalEdit(newContent);
     onEdit(JSON.stringify(newContent));
     setEditingSpeakerId(null);
     setModifyAll(false);
+    rediarize(newContent, changed, newSpeakerId);
+  };
+
+  // 本次修改说话人的分组：当前分组，勾选"修改所有"时还包括原说话人的所有分组
+  const changedGroups = (index: number, modifyAll: boolean, originalSpeakerId: string) =>
+    editingContent.segments
+      .map((segment, i) => (i === index || (modifyAll && segment.speakerId === originalSpeakerId)) ? i : -1)
+      .filter(i => i >= 0);
+
+  // 把修改过的分组中的片段固定为新说话人，其余片段由 Python 端按缓存的特征重新分配给最近的说话人
+  // 只有全部说话人都是 "说话人N"（或未知说话人）时才能重新分配，自定义名称只修改界面显示
+  const rediarize = async (newContent: TranscriptionData, changed: number[], speakerId: string) => {
+    const speakerPattern = /^说话人\d+$/;
+    if (!audioPath || !speakerPattern.test(speakerId) || !newContent.segments.every(
+      segment => speakerPattern.test(segment.speakerId) || segment.speakerId === UNKNOWN_SPEAKER
+    )) {
+      return;
+    }
+
+    let offset = 0;
+    newContent.segments.forEach((segment, i) => {
+      if (changed.includes(i)) {
+        segment.segments.forEach((_, j) => {
+          pinnedSegments.current[offset + j] = speakerId;
+        });
+      }
+      offset += segment.segments.length;
+    });
+
+    const version = ++editVersion.current;
+    try {
+      const result: TranscriptionData = await ipcRenderer.invoke(
+        'rediarize-speakers', audioPath, newContent.segments, pinnedSegments.current
+      );
+      // 等待期间又有修改或新的重新分配请求，这次的结果基于旧内容，覆盖会丢掉新的修改
+      if (version !== editVersion.current) {
+        return;
+      }
+      const rediarized = { ...newContent, segments: result.segments, rediarization: result.rediarization };
+      setEditingContent(rediarized);
+      onEdit(JSON.stringify(rediarized));
+    } catch (error) {
+      console.error('重新分配说话人失败:', error);
+    }
   };
 
   const handleNewSpeaker = (index: number) => {
@@ -462,7 +529,7 @@ export const TranscriptionViewer: React.FC<Props> = ({
       )
     };
 
-    setEditingContent(newContent);
+    applyLocalEdit(newContent);
     onEdit(JSON.stringify(newContent));
     setEditingSpeakerId(null);
     setNewSpeakerInput('');
@@ -497,30 +564,49 @@ export const TranscriptionViewer: React.FC<Props> = ({
       ];
       setHistory(newHistory);
       setCurrentIndex(newHistory.length - 1);
-      setEditingContent(newContent);
+      applyLocalEdit(newContent);
       onEdit(JSON.stringify(newContent));
     }
-  }, [history, currentIndex, onEdit, isEditing]);
+  }, [history, currentIndex, onEdit, isEditing, applyLocalEdit]);
 
   const handleUndo = useCallback(() => {
     if (currentIndex > 0) {
       const newIndex = currentIndex - 1;
       const previousContent = history[newIndex].content;
       setCurrentIndex(newIndex);
-      setEditingContent(previousContent);
+      applyLocalEdit(previousContent);
       onEdit(JSON.stringify(previousContent));
     }
-  }, [currentIndex, history, onEdit]);
+  }, [currentIndex, history, onEdit, applyLocalEdit]);
 
   const handleRedo = useCallback(() => {
     if (currentIndex < history.length - 1) {
       const newIndex = currentIndex + 1;
       const nextContent = history[newIndex].content;
       setCurrentIndex(newIndex);
-      setEditingContent(nextContent);
+      applyLocalEdit(nextContent);
       onEdit(JSON.stringify(nextContent));
     }
-  }, [currentIndex, history, onEdit]);
+  }, [currentIndex, history, onEdit, applyLocalEdit]);
+
+  // 识别结果中带标签的候选说话人数，可以直接切换而不用重新识别
+  const speakerCandidates = editingContent.speakerEstimate?.candidates.filter(candidate => candidate.labels) || [];
+
+  const handleSpeakerCountChange = (numSpeakers: number) => {
+    const newContent = applySpeakerCandidate(editingContent, numSpeakers);
+    if (newContent === editingContent) {
+      alert('片段已被修改，无法切换说话人数');
+      return;
+    }
+    const newHistory = [
+      ...history.slice(0, currentIndex + 1),
+      { content: newContent, timestamp: Date.now() }
+    ];
+    setHistory(newHistory);
+    setCurrentIndex(newHistory.length - 1);
+    applyLocalEdit(newContent);
+    onEdit(JSON.stringify(newContent));
+  };
 
   const handleExport = async () => {
     try {
@@ -563,6 +649,22 @@ export const TranscriptionViewer: React.FC<Props> = ({
       <div className="header">
         <h2>转录结果</h2>
         <div className="header-controls">
+          {speakerCandidates.length > 1 && (
+            <label className="speaker-count-select">
+              说话人数：
+              <select
+                value={editingContent.speakerEstimate!.numSpeakers}
+                onChange={(e) => handleSpeakerCountChange(Number(e.target.value))}
+              >
+                {speakerCandidates.map(candidate => (
+                  <option key={candidate.numSpeakers} value={candidate.numSpeakers}>
+                    {candidate.numSpeakers}
+                    {candidate.numSpeakers === editingContent.speakerEstimate!.suggested ? '（建议）' : ''}
+                  </option>
+                ))}
+              </select>
+            </label>
+          )}
           <button 
             onClick={toggleEdit} 
             className={`edit-button ${isEditing ? 'active' : ''}`}
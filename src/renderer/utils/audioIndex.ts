@@ -0,0 +1,55 @@
+import { ColumnLayout, readColumnFile } from './columnFile';
+
+// 与 src/core/audio_index.py 的波形索引文件对应
+const INDEX_MAGIC = [0x54, 0x59, 0x50, 0x4b, 0x53, 0x00, 0x00, 0x01];
+
+interface PeakLevel {
+  samplesPerBucket: number;
+  buckets: number;
+}
+
+interface AudioIndexHeader {
+  format: string;
+  version: number;
+  sampleRate: number;
+  samples: number;
+  duration: number;
+  bits: 8 | 16;
+  levels: PeakLevel[];
+  columns: Record<string, ColumnLayout>;
+}
+
+// 某一级峰值，mins/maxs 为量化后的整数，除以 scale 得到 [-1, 1] 的采样值
+export interface Peaks {
+  bucketSeconds: number;
+  mins: Int8Array | Int16Array;
+  maxs: Int8Array | Int16Array;
+  scale: number;
+}
+
+// 波形峰值索引：各列直接映射为类型化数组，绘制波形时不需要解码音频
+// 传入的 ArrayBuffer 必须从文件开头对齐（Node Buffer 需要先按 byteOffset 切出独立的 ArrayBuffer）
+export class AudioIndex {
+  readonly duration: number;
+  private levels: Peaks[];
+
+  constructor(buffer: ArrayBuffer) {
+    const { header, dataStart } = readColumnFile<AudioIndexHeader>(buffer, INDEX_MAGIC, '波形索引文件');
+    const column = (name: string) => dataStart + header.columns[name].offset;
+    const PeakArray = header.bits === 16 ? Int16Array : Int8Array;
+
+    this.duration = header.duration;
+    this.levels = header.levels.map(level => ({
+      bucketSeconds: level.samplesPerBucket / header.sampleRate,
+      mins: new PeakArray(buffer, column(`min${level.samplesPerBucket}`), level.buckets),
+      maxs: new PeakArray(buffer, column(`max${level.samplesPerBucket}`), level.buckets),
+      scale: 2 ** (header.bits - 1) - 1
+    }));
+  }
+
+  // 每个桶不窄于 bucketSeconds 的最细一级，例如按画布宽度每像素对应的秒数选择
+  peaksFor(bucketSeconds: number): Peaks {
+    const level = this.levels.find(candidate => candidate.bucketSeconds >= bucketSeconds);
+    return level || this.levels[this.levels.length - 1];
+  }
+}
@@ -0,0 +1,26 @@
+// 列存储文件的公共布局，片段结果（segmentFiles.ts）和波形索引（audioIndex.ts）共用
+export interface ColumnLayout {
+  offset: number;
+  dtype: string;
+  bytes: number;
+}
+
+// 读取 src/core/segment_store.py 中 write_column_file 的布局：8 字节标识 | uint32 文件头长度 | JSON 文件头 | 各列数据
+// 返回文件头和数据区在 buffer 中的起点，文件头的 columns 给出每列相对数据区起点的偏移
+export const readColumnFile = <T extends { columns: Record<string, ColumnLayout> }>(
+  buffer: ArrayBuffer,
+  magic: number[],
+  description: string
+): { header: T; dataStart: number } => {
+  const bytes = new Uint8Array(buffer);
+  magic.forEach((value, index) => {
+    if (bytes[index] !== value) {
+      throw new Error(`不是${description}`);
+    }
+  });
+
+  const headerLength = new DataView(buffer).getUint32(magic.length, true);
+  const headerStart = magic.length + 4;
+  const header: T = JSON.parse(new TextDecoder('utf-8').decode(bytes.subarray(headerStart, headerStart + headerLength)));
+  return { header, dataStart: headerStart + headerLength };
+};
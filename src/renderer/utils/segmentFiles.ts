@@ -0,0 +1,128 @@
+import { Segment, TranscriptionData } from '../../types/transcription';
+import { ColumnLayout, readColumnFile } from './columnFile';
+
+// 与 src/core/segment_store.py 的输出格式对应
+const COLUMNAR_MAGIC = [0x54, 0x59, 0x53, 0x45, 0x47, 0x00, 0x00, 0x01];
+
+interface SegmentFileHeader {
+  format: string;
+  version: number;
+  count: number;
+  speakers: string[];
+}
+
+interface ColumnarHeader extends SegmentFileHeader {
+  columns: Record<'start' | 'end' | 'label' | 'textOffsets' | 'text', ColumnLayout>;
+}
+
+// 与 segment_store.speaker_name 一致：标签 -1 为未识别的说话人
+export const UNKNOWN_SPEAKER = '未知说话人';
+const speakerName = (label: number) => label < 0 ? UNKNOWN_SPEAKER : `说话人${label + 1}`;
+
+// 把带说话人序号的片段按连续的说话人分组
+const groupSegments = (
+  count: number,
+  segmentAt: (index: number) => Segment,
+  labelAt: (index: number) => number,
+  begin = 0,
+  end = count
+): TranscriptionData => {
+  const groups: TranscriptionData['segments'] = [];
+  let previous: number | null = null;
+
+  for (let i = Math.max(begin, 0); i < Math.min(end, count); i++) {
+    const segment = segmentAt(i);
+    const label = labelAt(i);
+    if (label === previous && groups.length) {
+      groups[groups.length - 1].segments.push(segment);
+    } else {
+      groups.push({ speakerId: speakerName(label), startTime: segment.start, segments: [segment] });
+      previous = label;
+    }
+  }
+
+  return { segments: groups };
+};
+
+// JSON Lines 格式：第一行为文件头，之后每行 [开始, 结束, 说话人序号, 文本]
+export const parseSegmentLines = (content: string): TranscriptionData => {
+  const lines = content.split('\n').filter(line => line.trim());
+  const rows: [number, number, number, string][] = lines.slice(1).map(line => JSON.parse(line));
+  return groupSegments(
+    rows.length,
+    index => ({ start: rows[index][0], end: rows[index][1], text: rows[index][3] }),
+    index => rows[index][2]
+  );
+};
+
+// 二进制列存储：起止时间和标签直接映射为类型化数组，文本在访问时才解码
+// 传入的 ArrayBuffer 必须从文件开头对齐（Node Buffer 需要先按 byteOffset 切出独立的 ArrayBuffer）
+export class SegmentColumns {
+  readonly length: number;
+  readonly speakers: string[];
+  private starts: Float64Array;
+  private ends: Float64Array;
+  private labels: Int32Array;
+  private textOffsets: Uint32Array;
+  private textBytes: Uint8Array;
+  private decoder = new TextDecoder('utf-8');
+
+  constructor(buffer: ArrayBuffer) {
+    const { header, dataStart } = readColumnFile<ColumnarHeader>(buffer, COLUMNAR_MAGIC, '片段列存储文件');
+    const { columns } = header;
+
+    this.length = header.count;
+    this.speakers = header.speakers;
+    this.starts = new Float64Array(buffer, dataStart + columns.start.offset, this.length);
+    this.ends = new Float64Array(buffer, dataStart + columns.end.offset, this.length);
+    this.labels = new Int32Array(buffer, dataStart + columns.label.offset, this.length);
+    this.textOffsets = new Uint32Array(buffer, dataStart + columns.textOffsets.offset, this.length + 1);
+    this.textBytes = new Uint8Array(buffer, dataStart + columns.text.offset, columns.text.bytes);
+  }
+
+  text(index: number): string {
+    return this.decoder.decode(this.textBytes.subarray(this.textOffsets[index], this.textOffsets[index + 1]));
+  }
+
+  segment(index: number): Segment {
+    return { start: this.starts[index], end: this.ends[index], text: this.text(index) };
+  }
+
+  label(index: number): number {
+    return this.labels[index];
+  }
+
+  // 按时间查找第一个结束时间晚于 time 的片段（二分查找）
+  indexAt(time: number): number {
+    let low = 0;
+    let high = this.length;
+    while (low < high) {
+      const middle = (low + high) >> 1;
+      if (this.ends[middle] <= time) {
+        low = middle + 1;
+      } else {
+        high = middle;
+      }
+    }
+    return low;
+  }
+
+  // 只解码 [begin, end) 范围内的片段，长录音可以按可见区域分批加载
+  toTranscriptionData(begin = 0, end = this.length): TranscriptionData {
+    return groupSegments(this.length, index => this.segment(index), index => this.label(index), begin, end);
+  }
+}
+
+// 按扩展名读取识别结果文件：.json 与界面使用的结构相同，.jsonl 和 .segcol 为 segment_store.py 的紧凑格式
+// 列存储的文本在分组时才逐个解码，不需要先把整个文件转成字符串
+export const loadResultFile = (path: string, data: Uint8Array): TranscriptionData => {
+  if (path.endsWith('.segcol')) {
+    const buffer = data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength);
+    return new SegmentColumns(buffer).toTranscriptionData();
+  }
+  const content = new TextDecoder('utf-8').decode(data);
+  if (path.endsWith('.jsonl')) {
+    return parseSegmentLines(content);
+  }
+  return JSON.parse(content) as TranscriptionData;
+};
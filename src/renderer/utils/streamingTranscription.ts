@@ -0,0 +1,55 @@
+import { Segment, TranscriptionData } from '../../types/transcription';
+
+// 说话人标签还没有返回时使用的占位名称
+export const PENDING_SPEAKER = '识别中';
+
+export interface StreamedSegment extends Segment {
+  index: number;
+}
+
+// 把逐个推送的片段和说话人标签组装成 TranscriptionData，连续相同说话人的片段合并为一组
+export const buildStreamingTranscription = (
+  segments: StreamedSegment[],
+  labels: string[]
+): TranscriptionData => {
+  const groups: TranscriptionData['segments'] = [];
+
+  segments.forEach(segment => {
+    const speakerId = labels[segment.index] || PENDING_SPEAKER;
+    const last = groups[groups.length - 1];
+    const item = { text: segment.text, start: segment.start, end: segment.end };
+
+    if (last && last.speakerId === speakerId) {
+      last.segments.push(item);
+    } else {
+      groups.push({ speakerId, startTime: segment.start, segments: [item] });
+    }
+  });
+
+  return { segments: groups };
+};
+
+// 切换到另一个候选说话人数：直接使用识别时保存的标签重新分组，不需要重新运行识别
+// 候选没有保存标签、或片段数量与候选标签不一致（例如已经手动编辑过）时返回原数据
+export const applySpeakerCandidate = (
+  data: TranscriptionData,
+  numSpeakers: number
+): TranscriptionData => {
+  const labels = data.speakerEstimate?.candidates.find(item => item.numSpeakers === numSpeakers)?.labels;
+  const segments = data.segments.reduce<Segment[]>((all, group) => all.concat(group.segments), []);
+  if (!labels || labels.length !== segments.length) {
+    return data;
+  }
+
+  const regrouped = buildStreamingTranscription(
+    segments.map((segment, index) => ({ ...segment, index })),
+    labels.map(label => `说话人${label + 1}`)
+  );
+  // 声纹匹配和重新分配的统计对应原来的标签，切换后不再适用
+  const { speakerProfiles, rediarization, ...rest } = data;
+  return {
+    ...rest,
+    segments: regrouped.segments,
+    speakerEstimate: { ...data.speakerEstimate!, numSpeakers }
+  };
+};
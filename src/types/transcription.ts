@@ -1,3 +1,6 @@
+// Whisper 解码档位：fast 为贪心解码 + CPU 上 int8 量化，balanced 为贪心解码，accurate 为 beam search
+export type DecodingProfile = 'fast' | 'balanced' | 'accurate';
+
 export interface Segment {
   text: string;
   start: number;
@@ -10,6 +13,44 @@ export interface SpeakerSegment {
   segments: Segment[];
 }
 
+// 某个候选说话人数的聚类结果，labels 按片段顺序给出说话人序号（从 0 开始）
+// 只有选定说话人数前后的候选带 labels，其余只有得分
+export interface SpeakerCandidate {
+  numSpeakers: number;
+  silhouette: number | null;
+  bic: number | null;
+  labels?: number[];
+}
+
+// 指定了说话人数时不做估计：suggested 为指定的数量，candidates 为空
+export interface SpeakerEstimate {
+  numSpeakers: number;
+  suggested: number;
+  criterion: string;
+  method: string;
+  candidates: SpeakerCandidate[];
+}
+
+// 用户固定部分片段后重新分配的统计：固定的片段数、标签发生变化的片段数和剩余的说话人数
+export interface Rediarization {
+  pinned: number;
+  changed: number;
+  numSpeakers: number;
+}
+
+// 与声纹库匹配到的已知说话人，similarity 为余弦相似度
+export interface SpeakerProfileMatch {
+  speakerId: string;
+  name: string;
+  similarity: number;
+}
+
 export interface TranscriptionData {
   segments: SpeakerSegment[];
+  speakerEstimate?: SpeakerEstimate;
+  speakerProfiles?: SpeakerProfileMatch[];
+  rediarization?: Rediarization;
+  // 识别结果旁边的波形峰值索引文件路径（见 src/core/audio_index.py）
+  // 界面只据此判断是否有索引，读取时由主进程按音频路径推导索引文件，不使用这里的路径
+  audioIndex?: string;
 } 
\ No newline at end of file